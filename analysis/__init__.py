@@ -0,0 +1,4 @@
+from analysis.capture_diff import CaptureArrays, CaptureDiff, DiffCandidate, diff_captures
+from analysis.signal_statistics import SignalStatistics, IdSignalStatistics
+from analysis.timing_statistics import TimingSummary, summarize, histogram, format_statistics
+from analysis.response_correlation import ResponseCorrelator
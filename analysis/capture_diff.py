@@ -0,0 +1,190 @@
+#####################################################################################
+# CanBadger Capture Diff                                                            #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# differential analysis of two captures: a baseline without and an action capture with the interesting event
+# (e.g. a button press). frames are converted to numpy arrays once, all per-id statistics are computed vectorized
+# on id-sorted arrays, so minutes of traffic are compared in milliseconds
+
+from collections import namedtuple
+
+import numpy as np
+
+from datatypes.can_frame import CanFrame
+
+# summary of one id in the diff, higher score means a more likely candidate for the action
+DiffCandidate = namedtuple('DiffCandidate', ['frame_id', 'score', 'is_new', 'baseline_count', 'action_count',
+                                             'changed_bytes', 'new_values', 'flip_rate_delta'])
+
+
+# column representation of a capture, all arrays share the frame order of the capture
+class CaptureArrays:
+    def __init__(self, frame_ids: np.ndarray, timestamps: np.ndarray, lengths: np.ndarray, payloads: np.ndarray):
+        self.frame_ids = frame_ids
+        self.timestamps = timestamps
+        self.lengths = lengths
+        self.payloads = payloads  # frames x width bytes, padded with zeros behind the frame length
+
+    @classmethod
+    def from_frames(cls, frames: [CanFrame], width: int = 8):
+        frames = list(frames)
+        frame_ids = np.fromiter((f.frame_id for f in frames), dtype=np.uint32, count=len(frames))
+        timestamps = np.fromiter((f.timestamp for f in frames), dtype=np.uint32, count=len(frames))
+        lengths = np.fromiter((f.data_length for f in frames), dtype=np.uint8, count=len(frames))
+        if len(frames) > 0:
+            width = max(width, int(lengths.max()))
+        raw = b''.join(bytes(f.frame_payload).ljust(width, b'\x00') for f in frames)
+        payloads = np.frombuffer(raw, dtype=np.uint8).reshape(len(frames), width)
+        return cls(frame_ids, timestamps, lengths, payloads)
+
+    def __len__(self):
+        return len(self.frame_ids)
+
+    @property
+    def width(self) -> int:
+        return self.payloads.shape[1]
+
+    # returns a copy with the payloads widened to the given number of bytes
+    def widened(self, width: int):
+        if width <= self.width:
+            return self
+        payloads = np.zeros((len(self), width), dtype=np.uint8)
+        payloads[:, :self.width] = self.payloads
+        return CaptureArrays(self.frame_ids, self.timestamps, self.lengths, payloads)
+
+
+# bits of every byte value, msb first, used to turn histograms of xor values into bit flip counts
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).astype(np.int64)
+
+
+# per-id statistics of one capture, rows are ordered like ids
+# everything is counted with one bincount over (id, byte position, value) keys instead of looping over ids
+class IdStatistics:
+    def __init__(self, capture: CaptureArrays):
+        # a stable sort keeps the capture order inside every id
+        order = np.argsort(capture.frame_ids, kind='stable')
+        frame_ids = capture.frame_ids[order]
+        payloads = capture.payloads[order]
+        lengths = capture.lengths[order]
+
+        self.ids, self.counts = np.unique(frame_ids, return_counts=True)
+        groups = np.repeat(np.arange(len(self.ids), dtype=np.int64), self.counts)
+        width = capture.width
+        bins = len(self.ids) * width * 256
+        # key of the first value of every byte position of every frame
+        base = (groups[:, np.newaxis] * width + np.arange(width)[np.newaxis, :]) * 256
+
+        # which values were seen at which byte position, bytes behind the frame length do not count
+        valid = np.arange(width)[np.newaxis, :] < lengths[:, np.newaxis]
+        keys = (base + payloads)[valid]
+        self.byte_values = (np.bincount(keys, minlength=bins) > 0).reshape(len(self.ids), width, 256)
+
+        # bit flips between consecutive frames of the same id: histogram the xor of both payloads
+        # and multiply with the bits of every value
+        same_id = frame_ids[1:] == frame_ids[:-1]
+        changes = (payloads[1:] ^ payloads[:-1])[same_id]
+        histogram = np.bincount((base[1:][same_id] + changes).ravel(), minlength=bins)
+        self.flip_counts = (histogram.reshape(-1, 256) @ BYTE_BITS).reshape(len(self.ids), width * 8)
+        pairs = np.maximum(self.counts - 1, 1)
+        self.flip_rates = self.flip_counts / pairs[:, np.newaxis]
+
+    def row_of(self, frame_ids: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.ids, frame_ids)
+
+
+class CaptureDiff:
+    # weights of the parts of the score, an id that only shows up in the action capture always ranks first
+    new_id_score = 1000.0
+    new_value_score = 1.0
+    flip_rate_score = 10.0
+
+    def __init__(self, baseline: CaptureArrays, action: CaptureArrays, min_count: int = 1):
+        width = max(baseline.width, action.width)
+        self.baseline = IdStatistics(baseline.widened(width))
+        self.action = IdStatistics(action.widened(width))
+        self.min_count = min_count  # ids seen less often in the action capture are ignored
+
+        self.new_ids = np.setdiff1d(self.action.ids, self.baseline.ids)
+        self.missing_ids = np.setdiff1d(self.baseline.ids, self.action.ids)
+        self.common_ids = np.intersect1d(self.baseline.ids, self.action.ids)
+
+        baseline_rows = self.baseline.row_of(self.common_ids)
+        action_rows = self.action.row_of(self.common_ids)
+
+        # values that show up in the action capture but never in the baseline, per id and byte position
+        self.new_values = self.action.byte_values[action_rows] & ~self.baseline.byte_values[baseline_rows]
+        self.new_value_counts = self.new_values.sum(axis=2)
+        # bits that flip more often while the action happens
+        self.flip_rate_delta = self.action.flip_rates[action_rows] - self.baseline.flip_rates[baseline_rows]
+
+    @classmethod
+    def from_frames(cls, baseline: [CanFrame], action: [CanFrame], min_count: int = 1):
+        return cls(CaptureArrays.from_frames(baseline), CaptureArrays.from_frames(action), min_count=min_count)
+
+    # ids whose set of values changed in at least one byte position
+    def changed_ids(self) -> np.ndarray:
+        return self.common_ids[self.new_value_counts.sum(axis=1) > 0]
+
+    # returns the per-bit flip rates of an id in baseline and action capture, msb of byte 0 first
+    def flip_rates(self, frame_id: int) -> (np.ndarray, np.ndarray):
+        rates = []
+        for statistics in (self.baseline, self.action):
+            row = statistics.row_of(np.array([frame_id]))[0]
+            if row < len(statistics.ids) and statistics.ids[row] == frame_id:
+                rates.append(statistics.flip_rates[row])
+            else:
+                rates.append(np.zeros(statistics.flip_rates.shape[1]))
+        return rates[0], rates[1]
+
+    # returns the ids ordered by how likely they are related to the action, ids without any change are left out
+    def ranked_candidates(self, limit: int = None) -> [DiffCandidate]:
+        candidates = []
+
+        new_rows = self.action.row_of(self.new_ids)
+        for frame_id, row in zip(self.new_ids, new_rows):
+            count = int(self.action.counts[row])
+            if count < self.min_count:
+                continue
+            candidates.append(DiffCandidate(int(frame_id), self.new_id_score + count, True, 0, count,
+                                            np.nonzero(self.action.byte_values[row].any(axis=1))[0].tolist(),
+                                            int(self.action.byte_values[row].sum()), 0.0))
+
+        rate_increase = np.clip(self.flip_rate_delta, 0, None).sum(axis=1)
+        scores = self.new_value_score * self.new_value_counts.sum(axis=1) + self.flip_rate_score * rate_increase
+        baseline_rows = self.baseline.row_of(self.common_ids)
+        action_rows = self.action.row_of(self.common_ids)
+        for i in np.nonzero(scores > 0)[0]:
+            count = int(self.action.counts[action_rows[i]])
+            if count < self.min_count:
+                continue
+            candidates.append(DiffCandidate(int(self.common_ids[i]), float(scores[i]), False,
+                                            int(self.baseline.counts[baseline_rows[i]]), count,
+                                            np.nonzero(self.new_value_counts[i])[0].tolist(),
+                                            int(self.new_value_counts[i].sum()), float(rate_increase[i])))
+
+        candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+        return candidates if limit is None else candidates[:limit]
+
+
+# convenience wrapper, compares two lists of frames and returns the ranked candidates
+def diff_captures(baseline: [CanFrame], action: [CanFrame], min_count: int = 1, limit: int = None) -> [DiffCandidate]:
+    return CaptureDiff.from_frames(baseline, action, min_count=min_count).ranked_candidates(limit)
@@ -0,0 +1,139 @@
+#####################################################################################
+# CanBadger Response Correlation                                                    #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# measures how fast an ecu reacts to injected frames
+# stimuli are the frames that were replayed, they are recognized in the log by id (and optionally payload)
+# the first frame on every response id after a stimulus gives one latency sample, per stimulus and response id
+# timestamps are taken from the log on both sides, so host and network delays do not distort the result
+# stimuli can be added from a replay worker thread while the gui thread adds the logged frames
+
+from collections import deque
+import threading
+
+from datatypes.can_frame import CanFrame
+from analysis.timing_statistics import summarize, histogram, format_statistics
+
+# canbadger timestamps are 32 bit microseconds and wrap around
+TIMESTAMP_WRAP = 1 << 32
+
+
+def stimulus_label(key) -> str:
+    frame_id, payload = key
+    if payload is None:
+        return "{:X}".format(frame_id)
+    return "{:X}#{}".format(frame_id, bytes(payload).hex().upper())
+
+
+class ResponseCorrelator:
+    def __init__(self, response_ids: [int], window: int = 1000000):
+        self.response_ids = set(response_ids)
+        self.window = window  # responses later than this many microseconds after a stimulus are not matched
+
+        self.stimuli = set()  # (frame id, payload) of the injected frames
+        self.stimulus_ids = set()  # ids whose frames are stimuli regardless of the payload
+
+        # stimuli waiting for responses: [timestamp, key, response ids still missing]
+        self.pending = deque()
+        self.latencies = dict()  # (stimulus key, response id) -> [latency in microseconds]
+        self.stimulus_count = dict()  # stimulus key -> number of times it was seen in the log
+        self.unanswered = dict()  # stimulus key -> number of stimuli without any response
+        self.lock = threading.RLock()
+
+    # register an injected frame, without payload every frame with that id counts as stimulus
+    def add_stimulus(self, frame_id: int, payload: bytes = None):
+        with self.lock:
+            if payload is None:
+                self.stimulus_ids.add(frame_id)
+            else:
+                self.stimuli.add((frame_id, bytes(payload)))
+
+    def stimulus_key(self, frame: CanFrame):
+        if frame.frame_id in self.stimulus_ids:
+            return frame.frame_id, None
+        key = (frame.frame_id, bytes(frame.frame_payload))
+        if key in self.stimuli:
+            return key
+        return None
+
+    def add_frame(self, frame: CanFrame):
+        with self.lock:
+            self._add_frame(frame)
+
+    def _add_frame(self, frame: CanFrame):
+        timestamp = frame.timestamp
+        self.expire(timestamp)
+
+        if frame.frame_id in self.response_ids:
+            for entry in self.pending:
+                if frame.frame_id in entry[2]:
+                    entry[2].discard(frame.frame_id)
+                    latency = (timestamp - entry[0]) % TIMESTAMP_WRAP
+                    self.latencies.setdefault((entry[1], frame.frame_id), []).append(latency)
+            # stimuli with all responses seen are done
+            while self.pending and not self.pending[0][2]:
+                self.pending.popleft()
+
+        key = self.stimulus_key(frame)
+        if key is not None:
+            self.stimulus_count[key] = self.stimulus_count.get(key, 0) + 1
+            self.pending.append([timestamp, key, set(self.response_ids)])
+
+    def add_frames(self, frames: [CanFrame]):
+        with self.lock:
+            for frame in frames:
+                self._add_frame(frame)
+
+    # drop stimuli whose response window is over
+    def expire(self, timestamp: int = None):
+        while self.pending and (timestamp is None or (timestamp - self.pending[0][0]) % TIMESTAMP_WRAP > self.window):
+            entry = self.pending.popleft()
+            if len(entry[2]) == len(self.response_ids):
+                self.unanswered[entry[1]] = self.unanswered.get(entry[1], 0) + 1
+
+    # call after the last frame, counts the stimuli still waiting as unanswered
+    def finish(self):
+        with self.lock:
+            self.expire()
+
+    def summaries(self) -> dict:
+        with self.lock:
+            return {key: summarize(values) for key, values in self.latencies.items()}
+
+    def histograms(self, bins: int = 40) -> dict:
+        with self.lock:
+            return {key: histogram(values, bins) for key, values in self.latencies.items()}
+
+    # text report with latency statistics and histogram buckets in milliseconds per stimulus and response id
+    def report(self, bins: int = 40) -> str:
+        with self.lock:
+            lines = []
+            for key in sorted(self.stimulus_count, key=lambda k: (k[0], k[1] or b'')):
+                lines.append("Stimulus {}: seen {} times, {} without response".format(
+                    stimulus_label(key), self.stimulus_count[key], self.unanswered.get(key, 0)))
+                for response_id in sorted(self.response_ids):
+                    values = [latency / 1000 for latency in self.latencies.get((key, response_id), [])]
+                    ns, edges = histogram(values, bins)
+                    lines.append(format_statistics(values, "{} -> {:X} latency [ms]".format(stimulus_label(key),
+                                                                                             response_id),
+                                                   ns=ns, bins=edges))
+            return "\n".join(lines)
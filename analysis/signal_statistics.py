@@ -0,0 +1,164 @@
+#####################################################################################
+# CanBadger Signal Statistics                                                       #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# running per-id statistics of the bus, updated with every frame in constant time
+# nothing is rescanned, so the overview stays cheap no matter how long the log gets
+
+from datatypes.can_frame import CanFrame
+
+# canbadger timestamps are 32 bit microseconds and wrap around
+TIMESTAMP_WRAP = 1 << 32
+
+
+# statistics of a single id
+class IdSignalStatistics:
+    __slots__ = ['frame_id', 'count', 'first_timestamp', 'last_timestamp', 'period_mean', 'period_m2',
+                 'period_min', 'period_max', 'dlc_min', 'dlc_max', 'byte_min', 'byte_max', 'byte_seen',
+                 'bit_changes', 'last_payload']
+
+    def __init__(self, frame_id: int):
+        self.frame_id = frame_id
+        self.count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+        # period between two frames, mean and variance are kept with welford's algorithm
+        self.period_mean = 0.0
+        self.period_m2 = 0.0
+        self.period_min = None
+        self.period_max = None
+
+        self.dlc_min = None
+        self.dlc_max = None
+
+        # per byte position: smallest and biggest value, seen values as a 256 bit mask
+        self.byte_min = []
+        self.byte_max = []
+        self.byte_seen = []
+        # per bit (msb of byte 0 first): how often it changed between two consecutive frames
+        self.bit_changes = []
+        self.last_payload = None
+
+    def add_frame(self, frame: CanFrame):
+        timestamp = frame.timestamp
+        if self.count > 0:
+            period = timestamp - self.last_timestamp
+            if period < 0:
+                period += TIMESTAMP_WRAP
+            periods = self.count  # number of periods including this one
+            delta = period - self.period_mean
+            self.period_mean += delta / periods
+            self.period_m2 += delta * (period - self.period_mean)
+            if self.period_min is None or period < self.period_min:
+                self.period_min = period
+            if self.period_max is None or period > self.period_max:
+                self.period_max = period
+        else:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.count += 1
+
+        length = frame.data_length
+        if self.dlc_min is None or length < self.dlc_min:
+            self.dlc_min = length
+        if self.dlc_max is None or length > self.dlc_max:
+            self.dlc_max = length
+
+        payload = frame.frame_payload
+        while len(self.byte_min) < length:
+            self.byte_min.append(0xFF)
+            self.byte_max.append(0)
+            self.byte_seen.append(0)
+            self.bit_changes.extend([0] * 8)
+
+        last = self.last_payload
+        for position in range(length):
+            value = payload[position]
+            if value < self.byte_min[position]:
+                self.byte_min[position] = value
+            if value > self.byte_max[position]:
+                self.byte_max[position] = value
+            self.byte_seen[position] |= 1 << value
+
+            if last is not None and position < len(last):
+                changed = value ^ last[position]
+                # only visit the bits that changed
+                while changed:
+                    bit = changed.bit_length() - 1
+                    self.bit_changes[position * 8 + 7 - bit] += 1
+                    changed ^= 1 << bit
+        self.last_payload = payload
+
+    # mean period in microseconds, None until two frames were seen
+    def period(self) -> float:
+        return self.period_mean if self.count > 1 else None
+
+    # standard deviation of the period in microseconds
+    def jitter(self) -> float:
+        if self.count < 2:
+            return None
+        return (self.period_m2 / (self.count - 1)) ** 0.5
+
+    # number of distinct values per byte position
+    def byte_distinct(self) -> [int]:
+        return [bin(seen).count('1') for seen in self.byte_seen]
+
+    # positions of the bytes that took more than one value
+    def changing_bytes(self) -> [int]:
+        return [position for position, seen in enumerate(self.byte_seen) if seen & (seen - 1)]
+
+    # how often each bit changed relative to the number of frame pairs
+    def bit_change_rates(self) -> [float]:
+        pairs = max(self.count - 1, 1)
+        return [changes / pairs for changes in self.bit_changes]
+
+
+class SignalStatistics:
+    def __init__(self):
+        self.ids = dict()  # frame id -> IdSignalStatistics
+        self.order = []  # ids in order of their first appearance
+        self.frame_count = 0
+
+    def add_frame(self, frame: CanFrame):
+        statistics = self.ids.get(frame.frame_id)
+        if statistics is None:
+            statistics = IdSignalStatistics(frame.frame_id)
+            self.ids[frame.frame_id] = statistics
+            self.order.append(frame.frame_id)
+        statistics.add_frame(frame)
+        self.frame_count += 1
+
+    def add_frames(self, frames: [CanFrame]):
+        for frame in frames:
+            self.add_frame(frame)
+
+    def get(self, frame_id: int) -> IdSignalStatistics:
+        return self.ids.get(frame_id)
+
+    def clear(self):
+        self.ids = dict()
+        self.order = []
+        self.frame_count = 0
+
+    def __len__(self):
+        return len(self.order)
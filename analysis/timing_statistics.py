@@ -0,0 +1,89 @@
+#####################################################################################
+# CanBadger Timing Statistics                                                       #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# statistics for timing measurements (delays, latencies, jitter), shared by the replay reports,
+# the response correlation and the timing test scripts
+
+from collections import namedtuple
+import statistics
+
+TimingSummary = namedtuple('TimingSummary', ['count', 'mean', 'median', 'stdev', 'minimum', 'maximum', 'p99'])
+
+
+def percentile(ordered: [float], share: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def summarize(values: [float]) -> TimingSummary:
+    if not values:
+        return TimingSummary(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    ordered = sorted(values)
+    return TimingSummary(len(ordered), statistics.mean(ordered), statistics.median(ordered),
+                         statistics.pstdev(ordered), ordered[0], ordered[-1], percentile(ordered, 0.99))
+
+
+# counts per bucket and the bucket edges (one more than buckets), like numpy/matplotlib histograms
+def histogram(values: [float], bins: int = 40) -> ([int], [float]):
+    if not values:
+        return [], []
+    low = min(values)
+    high = max(values)
+    if high == low:
+        high = low + 1
+    width = (high - low) / bins
+    counts = [0] * bins
+    for value in values:
+        counts[min(bins - 1, int((value - low) / width))] += 1
+    return counts, [low + i * width for i in range(bins + 1)]
+
+
+# text report of median/mean, the biggest buckets and the outermost buckets of a histogram
+def format_statistics(values: [float], name: str, ns: [int] = None, bins: [float] = None) -> str:
+    lines = ["", "{} stats:".format(name), "-----------------------"]
+    if not values:
+        lines.append("No values measured.")
+        return "\n".join(lines)
+
+    mean = statistics.mean(values)
+    lines.append("Median: {}".format(statistics.median(values)))
+    lines.append("Mean: {}".format(mean))
+
+    if ns is not None and bins is not None and len(ns) > 0:
+        # biggest buckets
+        biggest = [i for i, j in enumerate(ns) if j == max(ns)]
+        lines.append("")
+        lines.append("Biggest bucket(s) for {} (measured {} times):".format(name, len(values)))
+        for i in biggest:
+            lines.append("{:.0f} in {:.3f}-{:.3f}".format(ns[i], bins[i], bins[i + 1]))
+
+        # outliers
+        bucket_indices = [i for i, j in enumerate(ns) if j > 0]
+        leftmost = bucket_indices[0]
+        rightmost = bucket_indices[-1]
+        lines.append("Outliers: {:.0f}  in {:.3f}-{:.3f} (> {:.3f} from mean) || "
+                     "{:.0f} in {:.3f}-{:.3f} (> {:.3f} from mean)".format(
+                         ns[leftmost], bins[leftmost], bins[leftmost + 1], mean - bins[leftmost + 1],
+                         ns[rightmost], bins[rightmost], bins[rightmost + 1], bins[rightmost] - mean))
+    return "\n".join(lines)
@@ -0,0 +1,7 @@
+from capture.capture_format import frame_to_row, row_to_frame, CSV_CAPTURE_ENDING
+from capture.capture_index import CaptureIndex, read_capture_frames, write_indexed_capture, parse_capture_query, \
+    index_path_for
+from capture.block_capture import BlockCaptureWriter, BlockCaptureReader, BlockCodec, write_block_capture, \
+    read_block_capture_frames, BLOCK_CAPTURE_ENDING
+from capture.capture_io import read_capture, write_capture, is_block_capture, CAPTURE_FILE_FILTER
+from capture.capture_recorder import CaptureRecorder, FsyncPolicy
@@ -0,0 +1,271 @@
+#####################################################################################
+# CanBadger Block Capture                                                           #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# block compressed capture storage
+# frames are grouped by id into blocks, every block is compressed on its own (zlib or lzma from the stdlib)
+# a table at the end of the file lists all blocks with id, frame count and timestamp range, so any block can be
+# read without touching the others. every block also carries its own header, so the table can be rebuilt by
+# scanning the blocks if the file was not closed properly (e.g. after a crash)
+#
+# layout: file header | block header + compressed records ... | block table | trailer
+
+from collections import namedtuple
+from enum import IntEnum
+import heapq
+import lzma
+import os
+import struct
+import zlib
+
+from datatypes.can_frame import CanFrame, CanFormat
+
+BLOCK_CAPTURE_ENDING = '.cbz'
+BLOCK_CAPTURE_MAGIC = b'CBBLK\x01'
+BLOCK_TABLE_MAGIC = b'CBBEND'
+
+# magic, codec
+file_header = struct.Struct('<6sB')
+# compressed length, frame id, frame count, sequence number of the first frame, min timestamp, max timestamp
+block_header = struct.Struct('<IIIIII')
+# block offset in the file + block header
+table_entry = struct.Struct('<Q' + block_header.format[1:])
+# table offset, block count, magic
+trailer = struct.Struct('<QI6s')
+# sequence number, timestamp, interface, format, length, interface speed (payload follows)
+frame_record = struct.Struct('<IIBBBI')
+
+
+class BlockCodec(IntEnum):
+    ZLIB = 0
+    LZMA = 1
+
+
+BlockInfo = namedtuple('BlockInfo', ['offset', 'length', 'frame_id', 'count', 'first_seq', 'min_ts', 'max_ts'])
+
+
+def compress_block(codec: BlockCodec, data: bytes, level: int = None) -> bytes:
+    if codec == BlockCodec.ZLIB:
+        return zlib.compress(data, 6 if level is None else level)
+    return lzma.compress(data, preset=6 if level is None else level)
+
+
+def decompress_block(codec: BlockCodec, data: bytes) -> bytes:
+    if codec == BlockCodec.ZLIB:
+        return zlib.decompress(data)
+    return lzma.decompress(data)
+
+
+# collects frames per id and writes them as compressed blocks
+class BlockCaptureWriter:
+    def __init__(self, path: str, codec: BlockCodec = BlockCodec.ZLIB, block_frames: int = 4096,
+                 max_pending_frames: int = 65536, level: int = None):
+        self.path = path
+        self.codec = BlockCodec(codec)
+        self.level = level
+        self.block_frames = block_frames  # a block is written once an id has this many frames buffered
+        self.max_pending_frames = max_pending_frames  # all buffers are written if more frames are pending
+
+        self.file = open(path, 'wb')
+        self.file.write(file_header.pack(BLOCK_CAPTURE_MAGIC, self.codec))
+        self.offset = file_header.size
+
+        self.blocks = []
+        self.frame_count = 0
+        self.pending_frames = 0
+        self._pending = dict()  # frame id -> [records bytearray, count, first seq, min ts, max ts]
+
+    def add_frame(self, frame: CanFrame):
+        pending = self._pending.get(frame.frame_id)
+        if pending is None:
+            pending = [bytearray(), 0, self.frame_count, frame.timestamp, frame.timestamp]
+            self._pending[frame.frame_id] = pending
+
+        pending[0] += frame_record.pack(self.frame_count, frame.timestamp, frame.interface_number,
+                                        frame.frame_format.value, frame.data_length, frame.interface_speed)
+        pending[0] += frame.frame_payload
+        pending[1] += 1
+        if frame.timestamp < pending[3]:
+            pending[3] = frame.timestamp
+        if frame.timestamp > pending[4]:
+            pending[4] = frame.timestamp
+
+        self.frame_count += 1
+        self.pending_frames += 1
+
+        if pending[1] >= self.block_frames:
+            self._write_block(frame.frame_id)
+        elif self.pending_frames >= self.max_pending_frames:
+            self.flush()
+
+    # write all buffered frames as blocks
+    def flush(self):
+        for frame_id in list(self._pending.keys()):
+            self._write_block(frame_id)
+        self.file.flush()
+
+    # flush, append the block table and close the file
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        table_offset = self.offset
+        for block in self.blocks:
+            self.file.write(table_entry.pack(*block))
+        self.file.write(trailer.pack(table_offset, len(self.blocks), BLOCK_TABLE_MAGIC))
+        self.file.close()
+        self.file = None
+
+    def _write_block(self, frame_id: int):
+        records, count, first_seq, min_ts, max_ts = self._pending.pop(frame_id)
+        data = compress_block(self.codec, bytes(records), self.level)
+        self.file.write(block_header.pack(len(data), frame_id, count, first_seq, min_ts, max_ts))
+        self.file.write(data)
+        self.blocks.append(BlockInfo(self.offset, len(data), frame_id, count, first_seq, min_ts, max_ts))
+        self.offset += block_header.size + len(data)
+        self.pending_frames -= count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class BlockCaptureReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+
+        magic, codec = file_header.unpack(self.file.read(file_header.size))
+        if magic != BLOCK_CAPTURE_MAGIC:
+            raise ValueError("{} is not a block capture!".format(path))
+        self.codec = BlockCodec(codec)
+
+        self.blocks = self._read_table()
+        if self.blocks is None:
+            self.blocks = self._scan_blocks()
+
+        self.frame_count = sum(block.count for block in self.blocks)
+
+    # reads the block table from the end of the file, returns None if it is missing
+    def _read_table(self) -> [BlockInfo]:
+        size = os.path.getsize(self.path)
+        if size < file_header.size + trailer.size:
+            return None
+        self.file.seek(size - trailer.size)
+        table_offset, block_count, magic = trailer.unpack(self.file.read(trailer.size))
+        if magic != BLOCK_TABLE_MAGIC or table_offset + block_count * table_entry.size + trailer.size != size:
+            return None
+
+        self.file.seek(table_offset)
+        table = self.file.read(block_count * table_entry.size)
+        return [BlockInfo(*entry) for entry in table_entry.iter_unpack(table)]
+
+    # rebuilds the block table from the block headers, stops at the first incomplete block
+    def _scan_blocks(self) -> [BlockInfo]:
+        blocks = []
+        offset = file_header.size
+        size = os.path.getsize(self.path)
+        while offset + block_header.size <= size:
+            self.file.seek(offset)
+            header = block_header.unpack(self.file.read(block_header.size))
+            if offset + block_header.size + header[0] > size:
+                break
+            blocks.append(BlockInfo(offset, *header))
+            offset += block_header.size + header[0]
+        return blocks
+
+    def close(self):
+        self.file.close()
+
+    def ids(self) -> [int]:
+        return sorted(set(block.frame_id for block in self.blocks))
+
+    # returns the numbers of the blocks that may contain frames matching the query
+    def query_blocks(self, ids: [int] = None, start: int = None, end: int = None) -> [int]:
+        id_set = None if ids is None else set(ids)
+        low = 0 if start is None else start
+        high = 0xFFFFFFFF if end is None else end
+        return [i for i, block in enumerate(self.blocks)
+                if (id_set is None or block.frame_id in id_set) and block.max_ts >= low and block.min_ts <= high]
+
+    # returns (sequence number, CanFrame) tuples for all frames of a block
+    def read_block(self, number: int) -> [(int, CanFrame)]:
+        block = self.blocks[number]
+        self.file.seek(block.offset + block_header.size)
+        data = decompress_block(self.codec, self.file.read(block.length))
+
+        frames = []
+        position = 0
+        for _ in range(block.count):
+            seq, timestamp, interface, frame_format, length, speed = frame_record.unpack_from(data, position)
+            position += frame_record.size
+            payload = data[position:position + length]
+            position += length
+            frames.append((seq, CanFrame(interface, CanFormat(frame_format), timestamp, block.frame_id, speed, length,
+                                         payload)))
+        return frames
+
+    # returns the frames matching the ids and time range in capture order
+    # blocks are only decompressed once the merge reaches their first frame, keeping memory bounded
+    def iter_frames(self, ids: [int] = None, start: int = None, end: int = None):
+        low = 0 if start is None else start
+        high = 0xFFFFFFFF if end is None else end
+
+        waiting = sorted(self.query_blocks(ids, start, end), key=lambda b: self.blocks[b].first_seq, reverse=True)
+        heap = []
+        while heap or waiting:
+            # open all blocks that start before the next frame we would return
+            while waiting and (not heap or self.blocks[waiting[-1]].first_seq <= heap[0][0]):
+                frames = iter(self.read_block(waiting.pop()))
+                seq, frame = next(frames)
+                heapq.heappush(heap, (seq, id(frames), frame, frames))
+
+            seq, _, frame, frames = heapq.heappop(heap)
+            following = next(frames, None)
+            if following is not None:
+                heapq.heappush(heap, (following[0], id(frames), following[1], frames))
+
+            if low <= frame.timestamp <= high:
+                yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# writes frames into a new block capture
+def write_block_capture(path: str, frames: [CanFrame], codec: BlockCodec = BlockCodec.ZLIB,
+                        block_frames: int = 4096) -> int:
+    with BlockCaptureWriter(path, codec=codec, block_frames=block_frames) as writer:
+        for frame in frames:
+            writer.add_frame(frame)
+        return writer.frame_count
+
+
+# returns the frames of a block capture matching the ids and time range, in capture order
+def read_block_capture_frames(path: str, ids: [int] = None, start: int = None, end: int = None):
+    with BlockCaptureReader(path) as reader:
+        yield from reader.iter_frames(ids, start, end)
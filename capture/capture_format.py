@@ -0,0 +1,41 @@
+#####################################################################################
+# CanBadger Capture Format                                                          #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# helpers to convert CanFrames to and from the rows of the csv capture format
+# this is the format the can logger saves to and restores from, the recorder writes the same rows
+
+from datatypes.can_frame import CanFrame, CanFormat
+
+CSV_CAPTURE_ENDING = '.csv'
+
+
+# returns the csv row for a frame
+# timestamp, interface, format, speed, id, length, payload bytes...
+def frame_to_row(frame: CanFrame) -> list:
+    return frame.list_representation()
+
+
+# builds a CanFrame from a csv row as written by frame_to_row
+def row_to_frame(row: [str]) -> CanFrame:
+    return CanFrame(int(row[1].strip()[3:]), CanFormat[row[2].strip()], int(row[0]), int(row[4], 0),
+                    int(row[3]), int(row[5]), bytes([int(x, 0) for x in row[6:]]))
@@ -0,0 +1,259 @@
+#####################################################################################
+# CanBadger Capture Index                                                           #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# seekable index sidecar for csv captures
+# frames are grouped into blocks of block_size consecutive rows, for every block we keep its byte offset in the
+# capture and its timestamp range (coarse time checkpoints), for every id the list of blocks it occurs in
+# (posting lists). queries for a time range and/or an id subset then only read the blocks that can match
+
+from array import array
+import csv
+import io
+import os
+import struct
+import sys
+
+from datatypes.can_frame import CanFrame
+from capture.capture_format import frame_to_row, row_to_frame
+
+INDEX_FILE_ENDING = '.idx'
+INDEX_MAGIC = b'CBIDX\x01'
+
+# magic, block size, frame count, block count, id count, size of the indexed capture
+index_header = struct.Struct('<6sIQIIQ')
+posting_header = struct.Struct('<II')
+
+
+# the index is stored little endian, arrays are swapped on big endian machines
+def _write_array(outfile, values: array):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    outfile.write(values.tobytes())
+
+
+def _read_array(infile, typecode: str, count: int) -> array:
+    values = array(typecode)
+    values.frombytes(infile.read(count * values.itemsize))
+    if len(values) != count:
+        raise ValueError("Capture index is truncated!")
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+# returns the path of the index sidecar belonging to a capture
+def index_path_for(capture_path: str) -> str:
+    return capture_path + INDEX_FILE_ENDING
+
+
+class CaptureIndex:
+    def __init__(self, block_size: int = 1024):
+        self.block_size = block_size
+        self.frame_count = 0
+        self.capture_size = 0
+        self.block_offsets = array('Q')
+        self.block_min_ts = array('I')
+        self.block_max_ts = array('I')
+        self.postings = dict()  # frame id -> array of block numbers the id occurs in
+
+    # register the next frame of the capture, frames have to be added in file order
+    def add(self, frame_id: int, timestamp: int, offset: int):
+        block = self.frame_count // self.block_size
+        if block == len(self.block_offsets):
+            self.block_offsets.append(offset)
+            self.block_min_ts.append(timestamp)
+            self.block_max_ts.append(timestamp)
+        else:
+            if timestamp < self.block_min_ts[block]:
+                self.block_min_ts[block] = timestamp
+            if timestamp > self.block_max_ts[block]:
+                self.block_max_ts[block] = timestamp
+
+        blocks = self.postings.get(frame_id)
+        if blocks is None:
+            self.postings[frame_id] = array('I', [block])
+        elif blocks[-1] != block:
+            blocks.append(block)
+
+        self.frame_count += 1
+
+    def block_count(self) -> int:
+        return len(self.block_offsets)
+
+    def ids(self) -> [int]:
+        return sorted(self.postings.keys())
+
+    # returns the sorted block numbers that may contain frames matching the query
+    # ids=None matches all ids, start/end=None leave the time range open
+    def query_blocks(self, ids: [int] = None, start: int = None, end: int = None) -> [int]:
+        if ids is None:
+            candidates = range(self.block_count())
+        else:
+            merged = set()
+            for frame_id in ids:
+                merged.update(self.postings.get(frame_id, ()))
+            candidates = sorted(merged)
+
+        if start is None and end is None:
+            return list(candidates)
+
+        low = 0 if start is None else start
+        high = 0xFFFFFFFF if end is None else end
+        return [b for b in candidates if self.block_max_ts[b] >= low and self.block_min_ts[b] <= high]
+
+    # returns (offset, end offset) byte ranges to read for the given blocks, adjacent blocks are merged
+    def block_ranges(self, blocks: [int]) -> [(int, int)]:
+        ranges = []
+        for block in blocks:
+            begin = self.block_offsets[block]
+            end = self.block_offsets[block + 1] if block + 1 < self.block_count() else self.capture_size
+            if ranges and ranges[-1][1] == begin:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((begin, end))
+        return ranges
+
+    def save(self, path: str):
+        with open(path, 'wb') as outfile:
+            outfile.write(index_header.pack(INDEX_MAGIC, self.block_size, self.frame_count, self.block_count(),
+                                            len(self.postings), self.capture_size))
+            _write_array(outfile, self.block_offsets)
+            _write_array(outfile, self.block_min_ts)
+            _write_array(outfile, self.block_max_ts)
+            for frame_id in self.ids():
+                blocks = self.postings[frame_id]
+                outfile.write(posting_header.pack(frame_id, len(blocks)))
+                _write_array(outfile, blocks)
+
+    @classmethod
+    def load(cls, path: str) -> 'CaptureIndex':
+        with open(path, 'rb') as infile:
+            magic, block_size, frame_count, block_count, id_count, capture_size = \
+                index_header.unpack(infile.read(index_header.size))
+            if magic != INDEX_MAGIC:
+                raise ValueError("{} is not a capture index!".format(path))
+
+            index = cls(block_size)
+            index.frame_count = frame_count
+            index.capture_size = capture_size
+            index.block_offsets = _read_array(infile, 'Q', block_count)
+            index.block_min_ts = _read_array(infile, 'I', block_count)
+            index.block_max_ts = _read_array(infile, 'I', block_count)
+            for _ in range(id_count):
+                frame_id, count = posting_header.unpack(infile.read(posting_header.size))
+                index.postings[frame_id] = _read_array(infile, 'I', count)
+        return index
+
+    # builds the index by scanning a csv capture once
+    @classmethod
+    def build(cls, capture_path: str, block_size: int = 1024) -> 'CaptureIndex':
+        index = cls(block_size)
+        offset = 0
+        with open(capture_path, 'rb') as infile:
+            for line in infile:
+                fields = line.split(b',', 5)
+                if len(fields) > 5:
+                    index.add(int(fields[4], 0), int(fields[0]), offset)
+                offset += len(line)
+        index.capture_size = offset
+        return index
+
+    # loads the sidecar of a capture, (re)builds and saves it if it is missing or outdated
+    @classmethod
+    def for_capture(cls, capture_path: str) -> 'CaptureIndex':
+        sidecar = index_path_for(capture_path)
+        if os.path.exists(sidecar):
+            try:
+                index = cls.load(sidecar)
+                if index.capture_size == os.path.getsize(capture_path):
+                    return index
+            except (ValueError, struct.error):
+                pass  # broken sidecar, build a new one
+
+        index = cls.build(capture_path)
+        index.save(sidecar)
+        return index
+
+
+# returns the frames of a csv capture matching the ids and time range, in file order
+# the index sidecar is used (and created if needed) to only read the blocks that can contain matches
+def read_capture_frames(capture_path: str, ids: [int] = None, start: int = None, end: int = None,
+                        index: CaptureIndex = None):
+    if index is None:
+        index = CaptureIndex.for_capture(capture_path)
+
+    id_set = None if ids is None else set(ids)
+    low = 0 if start is None else start
+    high = 0xFFFFFFFF if end is None else end
+
+    with open(capture_path, 'rb') as infile:
+        for begin, stop in index.block_ranges(index.query_blocks(ids, start, end)):
+            infile.seek(begin)
+            text = infile.read(stop - begin).decode('ascii')
+            for row in csv.reader(io.StringIO(text)):
+                if not row:
+                    continue
+                frame = row_to_frame(row)
+                if id_set is not None and frame.frame_id not in id_set:
+                    continue
+                if frame.timestamp < low or frame.timestamp > high:
+                    continue
+                yield frame
+
+
+# writes frames as a csv capture and creates its index sidecar in the same pass
+def write_indexed_capture(capture_path: str, frames: [CanFrame], block_size: int = 1024) -> CaptureIndex:
+    index = CaptureIndex(block_size)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    offset = 0
+    with open(capture_path, 'wb') as outfile:
+        for frame in frames:
+            writer.writerow(frame_to_row(frame))
+            line = buffer.getvalue().encode('ascii')
+            buffer.seek(0)
+            buffer.truncate()
+            index.add(frame.frame_id, frame.timestamp, offset)
+            outfile.write(line)
+            offset += len(line)
+    index.capture_size = offset
+    index.save(index_path_for(capture_path))
+    return index
+
+
+# parses a query like "3e9, 1a0 @ 1830000-1850000" into ([0x3e9, 0x1a0], 1830000, 1850000)
+# both parts are optional, ids are hex, an open end of the range is left empty ("@ 1830000-")
+def parse_capture_query(text: str) -> ([int], int, int):
+    id_part, _, range_part = text.partition('@')
+
+    ids = [int(x, 16) for x in id_part.replace(',', ' ').split()]
+    ids = ids if ids else None
+
+    start = end = None
+    range_part = range_part.strip()
+    if range_part:
+        low, _, high = range_part.partition('-')
+        start = int(low) if low.strip() else None
+        end = int(high) if high.strip() else None
+    return ids, start, end
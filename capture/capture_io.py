@@ -0,0 +1,52 @@
+#####################################################################################
+# CanBadger Capture IO                                                              #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# reading and writing captures independent of their storage format
+# the format is chosen by file ending: .csv for plain (indexed) csv, .cbz for block compressed captures
+
+from datatypes.can_frame import CanFrame
+from capture.capture_format import CSV_CAPTURE_ENDING
+from capture.capture_index import read_capture_frames, write_indexed_capture
+from capture.block_capture import BLOCK_CAPTURE_ENDING, BlockCodec, read_block_capture_frames, write_block_capture
+
+# file dialog filter for all capture formats we can read
+CAPTURE_FILE_FILTER = "Captures (*{} *{});;CSV (*{});;Compressed (*{})".format(
+    CSV_CAPTURE_ENDING, BLOCK_CAPTURE_ENDING, CSV_CAPTURE_ENDING, BLOCK_CAPTURE_ENDING)
+
+
+def is_block_capture(path: str) -> bool:
+    return path.lower().endswith(BLOCK_CAPTURE_ENDING)
+
+
+# returns the frames of a capture matching the ids and time range, in capture order
+def read_capture(path: str, ids: [int] = None, start: int = None, end: int = None):
+    if is_block_capture(path):
+        return read_block_capture_frames(path, ids=ids, start=start, end=end)
+    return read_capture_frames(path, ids=ids, start=start, end=end)
+
+
+# writes frames into a capture, returns the number of frames written
+def write_capture(path: str, frames: [CanFrame], codec: BlockCodec = BlockCodec.ZLIB) -> int:
+    if is_block_capture(path):
+        return write_block_capture(path, frames, codec=codec)
+    return write_indexed_capture(path, frames).frame_count
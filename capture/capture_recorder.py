@@ -0,0 +1,247 @@
+#####################################################################################
+# CanBadger Capture Recorder                                                        #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# writes frames from the ingest path to disk continuously, independent of the GUI model
+# frames are buffered in memory and flushed in chunks, capture files are rotated by size or age
+# so long unattended captures survive a crash of the application with at most one flush interval lost
+# with a compression codec set, block compressed captures are written instead of csv (no index sidecar needed)
+
+from enum import Enum
+import csv
+import io
+import os
+import time
+
+from datatypes.can_frame import CanFrame
+from capture.capture_format import frame_to_row, CSV_CAPTURE_ENDING
+from capture.capture_index import CaptureIndex, index_path_for
+from capture.block_capture import BlockCaptureWriter, BlockCodec, BLOCK_CAPTURE_ENDING
+
+
+# decides when the recorder asks the OS to put written data onto the disk
+class FsyncPolicy(Enum):
+    NEVER = 0  # leave it to the OS
+    ON_ROTATE = 1  # sync when a capture file is finished
+    ON_FLUSH = 2  # sync after every buffer flush, safest but slowest
+    INTERVAL = 3  # sync at most every fsync_interval seconds
+
+
+class CaptureRecorder:
+    def __init__(self, directory: str, prefix: str = "capture", max_file_size: int = 64 * 1024 * 1024,
+                 max_file_duration: float = None, buffer_size: int = 64 * 1024, flush_interval: float = 1.0,
+                 fsync_policy: FsyncPolicy = FsyncPolicy.INTERVAL, fsync_interval: float = 5.0,
+                 write_index: bool = True, compression: BlockCodec = None):
+        self.directory = directory
+        self.prefix = prefix
+
+        # rotation limits, a new file is started when one of them is hit (None disables the limit)
+        self.max_file_size = max_file_size
+        self.max_file_duration = max_file_duration
+
+        # buffered bytes are written when buffer_size is exceeded or flush_interval seconds have passed
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+
+        # build the index sidecar while writing, so finished files can be queried without a scan
+        self.write_index = write_index
+
+        # codec for block compressed captures, None writes plain csv
+        self.compression = compression
+
+        self.recording = False
+        self.current_path = None
+        self.finished_files = []  # paths of all capture files that have been closed
+        self.file_number = 0
+        self.frames_written = 0
+        self.bytes_written = 0
+
+        self._file = None
+        self._file_size = 0
+        self._file_opened = 0.0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._last_flush = 0.0
+        self._last_sync = 0.0
+        self._index = None
+        self._block_writer = None
+
+    def start(self):
+        if self.recording:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.recording = True
+        self._open_next_file()
+
+    def stop(self):
+        if not self.recording:
+            return
+        self._close_current_file()
+        self.recording = False
+
+    def record_frame(self, frame: CanFrame):
+        if not self.recording:
+            return
+
+        if self._block_writer is not None:
+            self._block_writer.add_frame(frame)
+            self.frames_written += 1
+            # the block writer buffers on its own and writes a block once an id has enough frames
+            if self._block_writer.offset != self._file_size:
+                self._after_block_write()
+                if self.max_file_size is not None and self._file_size >= self.max_file_size:
+                    self._rotate()
+            return
+
+        if self._index is not None:
+            # rows are ascii, so the buffer position is the byte offset behind what is already in the file
+            self._index.add(frame.frame_id, frame.timestamp, self._file_size + self._buffer.tell())
+        self._writer.writerow(frame_to_row(frame))
+        self.frames_written += 1
+
+        if self._buffer.tell() >= self.buffer_size:
+            self.flush()
+
+    def record_frames(self, frames: [CanFrame]):
+        for frame in frames:
+            self.record_frame(frame)
+
+    # call this periodically, flushes and rotates on time even when no frames are coming in
+    def poll(self):
+        if not self.recording:
+            return
+
+        now = time.monotonic()
+        if self._block_writer is not None and self._block_writer.pending_frames > 0 and \
+                now - self._last_flush >= self.flush_interval:
+            self.flush()
+        elif self._buffer.tell() > 0 and now - self._last_flush >= self.flush_interval:
+            self.flush()
+        elif self.max_file_duration is not None and now - self._file_opened >= self.max_file_duration:
+            self._rotate()
+
+    # write the buffered rows to the current file and rotate it if one of the limits is reached
+    def flush(self):
+        if self._file is None:
+            return
+
+        if self._block_writer is not None:
+            self._block_writer.flush()
+            self._after_block_write()
+        else:
+            data = self._buffer.getvalue().encode('ascii')
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+            if data:
+                self._file.write(data)
+                self._file.flush()
+                self._file_size += len(data)
+                self.bytes_written += len(data)
+
+        now = time.monotonic()
+        self._last_flush = now
+        if self.fsync_policy == FsyncPolicy.ON_FLUSH or \
+                (self.fsync_policy == FsyncPolicy.INTERVAL and now - self._last_sync >= self.fsync_interval):
+            self._sync()
+
+        if self.max_file_size is not None and self._file_size >= self.max_file_size:
+            self._rotate()
+        elif self.max_file_duration is not None and now - self._file_opened >= self.max_file_duration:
+            self._rotate()
+
+    # account for the blocks the block writer has put into the file
+    def _after_block_write(self):
+        self.bytes_written += self._block_writer.offset - self._file_size
+        self._file_size = self._block_writer.offset
+
+    def _rotate(self):
+        self._close_current_file()
+        self._open_next_file()
+
+    def _open_next_file(self):
+        self.file_number += 1
+        ending = CSV_CAPTURE_ENDING if self.compression is None else BLOCK_CAPTURE_ENDING
+        filename = "{}_{}_{:04d}{}".format(self.prefix, time.strftime("%Y%m%d_%H%M%S"), self.file_number, ending)
+        self.current_path = os.path.join(self.directory, filename)
+        self._file_opened = time.monotonic()
+        self._last_flush = self._file_opened
+
+        if self.compression is not None:
+            self._block_writer = BlockCaptureWriter(self.current_path, codec=self.compression)
+            self._file = self._block_writer.file
+            self._file_size = 0
+            self._after_block_write()
+            return
+
+        self._file = open(self.current_path, 'wb')
+        self._file_size = 0
+        if self.write_index:
+            self._index = CaptureIndex()
+
+    def _close_current_file(self):
+        if self._file is None:
+            return
+
+        if self._block_writer is not None:
+            # write the remaining blocks and the block table, sync before closing
+            self._block_writer.flush()
+            self._after_block_write()
+            if self.fsync_policy != FsyncPolicy.NEVER:
+                self._sync()
+            self._block_writer.close()
+            self.bytes_written += os.path.getsize(self.current_path) - self._file_size
+            self._block_writer = None
+            self._file = None
+            self.finished_files.append(self.current_path)
+            self.current_path = None
+            return
+
+        # flush without the rotation checks, then close the file
+        data = self._buffer.getvalue().encode('ascii')
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        if data:
+            self._file.write(data)
+            self._file_size += len(data)
+            self.bytes_written += len(data)
+        self._file.flush()
+
+        if self.fsync_policy != FsyncPolicy.NEVER:
+            self._sync()
+
+        self._file.close()
+        self._file = None
+
+        if self._index is not None:
+            self._index.capture_size = self._file_size
+            self._index.save(index_path_for(self.current_path))
+            self._index = None
+        self.finished_files.append(self.current_path)
+        self.current_path = None
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
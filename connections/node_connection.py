@@ -86,6 +86,10 @@ class NodeConnection(QObject):
         # send command to CANBadger
         self.canbadger.start()
 
+    # logging connections are kept open while their node is not selected
+    def isCapturing(self) -> bool:
+        return self.logging
+
     def stopCurrentAction(self):
         if self.logging:
             self.logging = False
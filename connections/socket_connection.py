@@ -63,6 +63,10 @@ class SocketCanConnection(QObject):
                                                   message_queue=self.data_queue)
             self.logger_process.start()
 
+    # logging connections are kept open while their node is not selected
+    def isCapturing(self) -> bool:
+        return self.logger_process is not None
+
     def stopCurrentAction(self):
         if self.logger_process is not None:
             self.command_queue.put("kys")
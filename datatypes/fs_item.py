@@ -33,12 +33,27 @@ class FS_Item:
         self.dir = is_dir
 
         self.children = []
+        self.children_by_name = dict()  # name -> child, for lookups without scanning the children
         self.parent_item = parent
+        self.row_number = 0  # position in the children of the parent, kept up to date by the parent
+
+        # the full path is fixed once the item is created, so build it once from the parent
+        if parent is None:
+            self.path = "/"
+        elif len(parent.path) > 1:
+            self.path = parent.path + "/" + name
+        else:
+            self.path = parent.path + name
+
+        self.fetched = 0  # children already shown by the model, the rest is inserted when the view asks for them
+        self.generation = 0  # listing in which the item was last seen, to find removed entries on a refresh
 
     # append a child (will only work for directories)
     def append_child(self, child):
         if self.dir:
+            child.row_number = len(self.children)
             self.children.append(child)
+            self.children_by_name[child.name] = child
 
     # get number of children
     def child_count(self) -> int:
@@ -71,29 +86,45 @@ class FS_Item:
 
         return self.children[row]
 
+    def child_by_name(self, name: str) -> 'FS_Item':
+        return self.children_by_name.get(name)
+
     # removes all children of this item
     def remove_children(self):
         self.children = []
+        self.children_by_name = dict()
+        self.fetched = 0
 
     # removes children in given row
     def remove_child(self, row: int):
-        del self.children[row]
+        child = self.children.pop(row)
+        del self.children_by_name[child.name]
+        if row < self.fetched:
+            self.fetched -= 1
+        for following in self.children[row:]:
+            following.row_number -= 1
+
+    # removes count children starting at row, renumber must be called once all rows are removed
+    def remove_rows(self, row: int, count: int):
+        for child in self.children[row:row + count]:
+            del self.children_by_name[child.name]
+        del self.children[row:row + count]
+        self.fetched -= max(0, min(self.fetched, row + count) - row)
+
+    def renumber(self):
+        for row, child in enumerate(self.children):
+            child.row_number = row
 
     # returns this items row number aka its number in the children of its parent
     def row(self) -> int:
-        if self.parent_item is None:
-            return 0
+        return self.row_number
 
-        return self.parent_item.children.index(self)
-
-    # gets the full path to this item by building it from parent names
+    # gets the full path to this item
     def get_filepath(self) -> str:
-        if self.parent_item is None:
-            return "/"
-
-        parent_path = self.parent_item.get_filepath()
-        if len(parent_path) > 1:
-            return parent_path + "/" + self.name
-        else:
-            return parent_path + self.name
+        return self.path
 
+    # this item and everything below it
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
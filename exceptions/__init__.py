@@ -1,2 +1,4 @@
 from exceptions.pointerless_index_exception import PointerlessIndexException
 from exceptions.unhandled_ethernet_message_exception import UnhandledEthernetMessageException
+from exceptions.invalid_rule_exception import InvalidRuleException
+from exceptions.uds_exception import UdsNegativeResponseException, UdsTimeoutException
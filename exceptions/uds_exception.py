@@ -0,0 +1,41 @@
+#####################################################################################
+# CanBadger UDS Exceptions                                                          #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# set on the futures of the uds client when an ecu answers negatively or does not answer in time
+
+
+class UdsNegativeResponseException(Exception):
+    def __init__(self, sid: int, nrc: int, reason: str):
+        self.sid = sid
+        self.nrc = nrc
+        self.reason = reason
+        self.message = f"Request {sid:#04x} failed: Code {nrc:#04x}, Reason: {reason}"
+        super().__init__(self.message)
+
+
+class UdsTimeoutException(TimeoutError):
+    def __init__(self, sid: int, timeout: float):
+        self.sid = sid
+        self.timeout = timeout
+        self.message = f"Request {sid:#04x} got no response within {timeout:.3f}s."
+        super().__init__(self.message)
@@ -21,21 +21,28 @@
 # THE SOFTWARE.                                                                     #
 #####################################################################################
 
-from PySide2.QtWidgets import QAbstractItemView, QFileDialog
+from PySide2.QtWidgets import QAbstractItemView, QFileDialog, QCheckBox, QPushButton, QInputDialog, QTableView
 import json
 
 from models.can_logger_item_model import *
 from helpers.can_parser import *
 from models.can_logger_sort_model import *
+from models.signal_statistics_model import SignalStatisticsModel
 from delegates.frame_delegate import *
 from helpers import *
 from libcanbadger import EthernetMessage, EthernetMessageType
 from exceptions import UnhandledEthernetMessageException
+from capture import CaptureRecorder, row_to_frame, read_capture, write_capture, is_block_capture, \
+    parse_capture_query, CAPTURE_FILE_FILTER, CSV_CAPTURE_ENDING
+from analysis import CaptureDiff
 from queue import Empty
 import csv
 
 
 class CanLogger(QObject):
+    # frames parsed in one poll of the data queue, e.g. for the replay response correlation
+    framesLogged = Signal(list)
+
     def __init__(self, mainwindow, nodehandler):
         super(CanLogger, self).__init__()
         self.mainwindow = mainwindow
@@ -49,11 +56,28 @@ class CanLogger(QObject):
         self.stopped = False
         self.data_timer = QTimer(self)
         self.scroll_timer = QTimer(self)
-        self.current_node_connection = None
+        # every node logs into its own model, nodes that are not selected keep logging in the background
+        self.logging_nodes = dict()  # node id -> node of every logging node
+        self.node_models = dict()  # node id -> CanLoggerItemModel
         self.can_parser = CanParser()
         self.countSortProxy = CanLoggerSortModel(self.mainwindow)
         self.mainwindow.canLogView.setSortingEnabled(True)
 
+        # frames are written to disk continuously while logging if a record directory is chosen
+        self.recorders = dict()  # node id -> CaptureRecorder
+        self.record_directory = None
+        self.recordToDiskCheckbox = None
+
+        # number of ranked ids the baseline diff puts into the id filter
+        self.diff_candidate_limit = 10
+
+        # per id overview of the running statistics of the current model
+        self.statisticsModel = SignalStatisticsModel()
+        self.statisticsSortProxy = QSortFilterProxyModel(self)
+        self.statisticsSortProxy.setSortRole(Qt.UserRole)
+        self.statisticsSortProxy.setSourceModel(self.statisticsModel)
+        self.statisticsView = None
+
     def connect_signals(self):
         self.mainwindow.startCanLoggerBtn.clicked.connect(self.onStartCanLogger)
         self.mainwindow.canLogView.sendToReplay.connect(self.mainwindow.replayHandler.onAddReplayFrame)
@@ -66,6 +90,8 @@ class CanLogger(QObject):
         self.mainwindow.filterFramesByIdLineEdit.textEdited.connect(self.filterFrames)
         self.mainwindow.filterFramesAfterNSpinBox.valueChanged.connect(self.filterFrames)
         self.mainwindow.selectedNodeChanged.connect(self.onSelectedNodeChanged)
+        self.nodehandler.nodeDisconnected.connect(self.onNodeDisconnected)
+        self.nodehandler.nodeDisappeared.connect(self.onNodeDisappeared)
         self.mainwindow.mainInitDone.connect(self.setup_gui)
         self.mainwindow.saveCanLogBtn.clicked.connect(self.onSaveFramesToFile)
         self.mainwindow.restoreCanLogBtn.clicked.connect(self.onReloadLogFromFile)
@@ -76,12 +102,28 @@ class CanLogger(QObject):
 
     @Slot()
     def retrieve_data(self):
-        if self.current_node_connection is None:
-            return
+        selected = self.mainwindow.selectedNode
+        for node_id, node in list(self.logging_nodes.items()):
+            frames = self.drainQueue(node["connection"], self.node_models[node_id], self.recorders.get(node_id))
+            if frames and selected is not None and selected["id"] == node_id:
+                self.framesLogged.emit(frames)
+
+        # let the recorders flush and rotate on time
+        for recorder in self.recorders.values():
+            recorder.poll()
+
+        self.statisticsModel.refresh()
 
+        # call filters to have them updated
+        if self.countSortProxy.filteringEnabled and self.countSortProxy.compactFilter:
+            self.filterFrames()
+
+    # move the frames received by a connection into its model and recorder
+    def drainQueue(self, connection, model, recorder):
+        frames = []
         while True:
             try:
-                ethMsg = self.current_node_connection.data_queue.get_nowait()
+                ethMsg = connection.data_queue.get_nowait()
                 self.cnt += 1
 
                 if type(ethMsg) == EthernetMessage:
@@ -93,19 +135,44 @@ class CanLogger(QObject):
                     # data is tuple comping from socketCan, construct new CanFrame from it
                     (can_id, timestamp, data_len, data) = ethMsg
                     frame = self.can_parser.constructCanFrame(can_id, data_len, data, timestamp=timestamp)
-                self.model.add_frame(QModelIndex(), frame)
+                if recorder is not None:
+                    recorder.record_frame(frame)
+                model.add_frame(QModelIndex(), frame)
+                frames.append(frame)
             except Empty:
                 break
-
-        # call filters to have them updated
-        if self.countSortProxy.filteringEnabled and self.countSortProxy.compactFilter:
-            self.filterFrames()
+        return frames
 
     @Slot()
     def setup_gui(self):
         self.mainwindow.canLogView.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.mainwindow.canLogView.setSelectionMode(QAbstractItemView.SingleSelection)
 
+        # checkbox to enable continuous recording to disk
+        self.recordToDiskCheckbox = QCheckBox("Record to Disk", self.mainwindow)
+        self.mainwindow.logButtonsLayout.insertWidget(0, self.recordToDiskCheckbox)
+        self.recordToDiskCheckbox.stateChanged.connect(self.onRecordToDiskChanged)
+
+        # button to load only part of a saved capture, using its index
+        self.loadCanLogRangeBtn = QPushButton("Load Range", self.mainwindow)
+        self.mainwindow.logButtonsLayout.insertWidget(
+            self.mainwindow.logButtonsLayout.indexOf(self.mainwindow.restoreCanLogBtn) + 1, self.loadCanLogRangeBtn)
+        self.loadCanLogRangeBtn.clicked.connect(self.onLoadLogRangeFromFile)
+
+        # button to compare the current log against a baseline capture
+        self.diffCanLogBtn = QPushButton("Diff vs Baseline", self.mainwindow)
+        self.mainwindow.logButtonsLayout.insertWidget(
+            self.mainwindow.logButtonsLayout.indexOf(self.loadCanLogRangeBtn) + 1, self.diffCanLogBtn)
+        self.diffCanLogBtn.clicked.connect(self.onDiffAgainstBaseline)
+
+        # tab with the per id statistics overview
+        self.statisticsView = QTableView(self.mainwindow)
+        self.statisticsView.setModel(self.statisticsSortProxy)
+        self.statisticsView.setSortingEnabled(True)
+        self.statisticsView.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.statisticsView.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.mainwindow.tabWidget.addTab(self.statisticsView, "ID Statistics")
+
     @Slot()
     def filterFrames(self):
         if self.model is None:
@@ -126,25 +193,28 @@ class CanLogger(QObject):
         else:
             # node['connection'].newDataMessage.connect(self.onNewData)
             node['connection'].runCanlogger()
-            self.mainwindow.startCanLoggerBtn.clicked.disconnect()
-            self.mainwindow.startCanLoggerBtn.clicked.connect(self.onStopCanLogger)
-            self.mainwindow.startCanLoggerBtn.setText("Stop")
-            self.current_node_connection = node['connection']
-            self.data_timer.start(100)  # check for data every 100ms
+            self.logging_nodes[node["id"]] = node
+            self.updateStartButton(node)
+            self.startRecorder(node)
+            if not self.data_timer.isActive():
+                self.data_timer.start(100)  # check for data every 100ms
 
         self.scroll_timer.start(100)
 
     @Slot()
     def onStopCanLogger(self):
-        self.data_timer.stop()
+        node = self.mainwindow.selectedNode
+        logging_node = self.logging_nodes.pop(node["id"], None) if node is not None else None
+        if not self.logging_nodes:
+            self.data_timer.stop()
         self.scroll_timer.stop()
         self.cnt = 0
         self.stopped = True
         # gracefullyDisconnectSignal(self.mainwindow.selectedNode['connection'].newDataMessage)
-        self.current_node_connection.stopCurrentAction()
-        self.mainwindow.startCanLoggerBtn.clicked.disconnect()
-        self.mainwindow.startCanLoggerBtn.clicked.connect(self.onStartCanLogger)
-        self.mainwindow.startCanLoggerBtn.setText("Start")
+        if logging_node is not None:
+            self.stopRecorder(logging_node)
+            logging_node["connection"].stopCurrentAction()
+        self.updateStartButton(node)
         self.countSortProxy.filteringEnabled = True
         self.countSortProxy.setDynamicSortFilter(True)
         self.mainwindow.canLogView.resizeColumnToContents(2)
@@ -193,6 +263,59 @@ class CanLogger(QObject):
             self.countSortProxy.highlightMode = False
         self.countSortProxy.invalidate()
 
+    @Slot(int)
+    def onRecordToDiskChanged(self, state):
+        if state == 2:
+            directory = QFileDialog.getExistingDirectory(self.mainwindow, 'Record CAN frames to', '.')
+            if not directory:
+                self.recordToDiskCheckbox.setCheckState(Qt.Unchecked)
+                return
+            self.record_directory = directory
+            # start right away for the nodes that are already logging
+            for node in self.logging_nodes.values():
+                self.startRecorder(node)
+        else:
+            self.record_directory = None
+            for node in list(self.logging_nodes.values()):
+                self.stopRecorder(node)
+
+    # the start button stops the logger of the selected node while it is logging
+    def updateStartButton(self, node):
+        gracefullyDisconnectSignal(self.mainwindow.startCanLoggerBtn.clicked)
+        if node is not None and node["id"] in self.logging_nodes:
+            self.mainwindow.startCanLoggerBtn.clicked.connect(self.onStopCanLogger)
+            self.mainwindow.startCanLoggerBtn.setText("Stop")
+        else:
+            self.mainwindow.startCanLoggerBtn.clicked.connect(self.onStartCanLogger)
+            self.mainwindow.startCanLoggerBtn.setText("Start Logging")
+
+    # a node that is gone can not log anymore, its frames stay on display until another node is selected
+    @Slot(dict)
+    def onNodeDisconnected(self, node):
+        self.node_models.pop(node["id"], None)
+        if self.logging_nodes.pop(node["id"], None) is None:
+            return
+        self.stopRecorder(node)
+        if not self.logging_nodes:
+            self.data_timer.stop()
+
+    @Slot(dict)
+    def onNodeDisappeared(self, node):
+        self.node_models.pop(node["id"], None)
+
+    # every logging node records into its own files, named after the node
+    def startRecorder(self, node):
+        if self.record_directory is None or node["id"] in self.recorders:
+            return
+        recorder = CaptureRecorder(self.record_directory, prefix="capture_" + node["id"])
+        recorder.start()
+        self.recorders[node["id"]] = recorder
+
+    def stopRecorder(self, node):
+        recorder = self.recorders.pop(node["id"], None)
+        if recorder is not None:
+            recorder.stop()
+
     # reset the view when when already displayed rows need to be filtered out
     @Slot(int)
     def resetView(self, row):
@@ -218,66 +341,111 @@ class CanLogger(QObject):
         else:
             self.scroll_timer.stop()
 
+    # show the frames of the selected node, nodes that are logging keep filling their own model
     @Slot(object, dict)
     def onSelectedNodeChanged(self, previous, current):
         if current is not None:
-            if previous is not None:
-                if "canlogger" not in previous:
-                    previous["canlogger"] = {}
-                previous["canlogger"]["model"] = self.model
-            if "canlogger" not in current:
-                current["canlogger"] = {}
-                current["canlogger"]["model"] = CanLoggerItemModel(self.mainwindow.canLogView)
-            self.model = current["canlogger"]["model"]
-            self.countSortProxy = CanLoggerSortModel(self.mainwindow)
-            self.countSortProxy.setSourceModel(self.model)
-            self.mainwindow.canLogView.setModel(self.countSortProxy)
-            self.mainwindow.canLogView.setSortingEnabled(True)
+            model = self.node_models.get(current["id"])
+            if model is None:
+                self.renewModel()
+            else:
+                self.showModel(model)
+            self.updateStartButton(current)
             self.mainwindow.filterFramesByNewFramesAfterCheckbox.setCheckState(Qt.Unchecked)
             self.filterFrames()
 
     @Slot()
     def onSaveFramesToFile(self):
-        filename = QFileDialog.getSaveFileName(self.mainwindow, 'Save CAN frames', '.', "*.csv")
-        if len(filename) < 1:
+        filename = QFileDialog.getSaveFileName(self.mainwindow, 'Save CAN frames', '.', CAPTURE_FILE_FILTER)
+        if len(filename) < 1 or filename[0] == '':
             return
 
-        # stringify all the frames
-        frames = self.model.get_frame_list()
+        frames = self.model.get_frames()
 
         filename = filename[0]
-        # check for correct file ending
-        if not filename.endswith('.csv'):
+        # check for correct file ending, compressed captures keep theirs
+        if not filename.endswith(CSV_CAPTURE_ENDING) and not is_block_capture(filename):
             if filename.rfind('.') == -1:
-                filename += '.csv'
+                filename += CSV_CAPTURE_ENDING
             else:
-                filename = filename[:filename.rfind('.')] + '.csv'
+                filename = filename[:filename.rfind('.')] + CSV_CAPTURE_ENDING
 
-        with open(filename, 'w', newline='') as outfile:
-            writer = csv.writer(outfile)
-            writer.writerows(frames)
+        # csv captures get an index sidecar, compressed captures carry their own block table
+        write_capture(filename, frames)
 
     @Slot()
     def onReloadLogFromFile(self):
-        filename = QFileDialog.getOpenFileName(self.mainwindow, 'Load Log File', '.', "*.csv")
-        if len(filename) < 1:
+        filename = QFileDialog.getOpenFileName(self.mainwindow, 'Load Log File', '.', CAPTURE_FILE_FILTER)
+        if len(filename) < 1 or filename[0] == '':
             return
 
-        self.renewModel()
+        self.renewModel(loaded=True)
+
+        if is_block_capture(filename[0]):
+            self.model.add_frames(QModelIndex(), read_capture(filename[0]))
+        else:
+            with open(filename[0], newline='') as infile:
+                reader = csv.reader(infile)
+                for row in reader:
+                    self.model.add_frame(QModelIndex(), row_to_frame(row))
+        self.statisticsModel.refresh()
+
+    # load only the frames of a saved capture that match an id subset and/or a time range
+    @Slot()
+    def onLoadLogRangeFromFile(self):
+        filename = QFileDialog.getOpenFileName(self.mainwindow, 'Load Log File', '.', CAPTURE_FILE_FILTER)
+        if len(filename) < 1 or filename[0] == '':
+            return
+
+        query, ok = QInputDialog.getText(self.mainwindow, 'Load Range',
+                                         'IDs (hex) @ time range, e.g. "3e9, 1a0 @ 1830000-1850000":')
+        if not ok:
+            return
+        try:
+            ids, start, end = parse_capture_query(query)
+        except ValueError:
+            return
+
+        self.renewModel(loaded=True)
+        self.model.add_frames(QModelIndex(), read_capture(filename[0], ids=ids, start=start, end=end))
+        self.statisticsModel.refresh()
+
+    # compare the current log (recorded while doing the action) with a baseline capture without the action
+    # the ids that most likely belong to the action are put into the id filter
+    @Slot()
+    def onDiffAgainstBaseline(self):
+        if self.model is None:
+            return
+
+        filename = QFileDialog.getOpenFileName(self.mainwindow, 'Load Baseline Capture', '.', CAPTURE_FILE_FILTER)
+        if len(filename) < 1 or filename[0] == '':
+            return
+
+        diff = CaptureDiff.from_frames(read_capture(filename[0]), self.model.get_frames())
+        candidates = diff.ranked_candidates(limit=self.diff_candidate_limit)
+        if not candidates:
+            self.mainwindow.statusbar.showMessage("No differences to the baseline found.")
+            return
+
+        self.mainwindow.filterFramesByIdLineEdit.setText(
+            ", ".join("{:X}".format(candidate.frame_id) for candidate in candidates))
+        self.mainwindow.statusbar.showMessage("Diff: {} new ids, {} ids with new values, best candidate {:X}.".format(
+            len(diff.new_ids), len(diff.changed_ids()), candidates[0].frame_id))
+        self.filterFrames()
+
+    # get a new model to hold the data of the selected node and reconnect view and sorting
+    # a loaded capture does not replace the model of a node that is logging, its live frames keep going there
+    def renewModel(self, loaded=False):
+        model = CanLoggerItemModel(self.mainwindow.canLogView)
+        model.resetRow.connect(self.resetView)
+        node = self.mainwindow.selectedNode
+        if node is not None and not (loaded and node["id"] in self.logging_nodes):
+            self.node_models[node["id"]] = model
+        self.showModel(model)
 
-        with open(filename[0], newline='') as infile:
-            reader = csv.reader(infile)
-            for row in reader:
-                frame = self.can_parser.constructCanFrame(int(row[4], 0), int(row[5]),
-                                                          bytes([int(x, 0) for x in row[6:]]),
-                                                          timestamp=int(row[0]), speed=int(row[3]),
-                                                          interface=int(row[1].strip()[3:]))
-                self.model.add_frame(QModelIndex(), frame)
-
-    # get a new model to hold the data and reconnect view and sorting
-    def renewModel(self):
-        self.model = CanLoggerItemModel(self.mainwindow.canLogView)
-        self.model.resetRow.connect(self.resetView)
+    def showModel(self, model):
+        self.model = model
+        self.statisticsModel.setStatistics(self.model.statistics)
         self.countSortProxy.filteringEnabled = True
         self.countSortProxy.setSourceModel(self.model)
         self.mainwindow.canLogView.setModel(self.countSortProxy)
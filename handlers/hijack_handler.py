@@ -48,6 +48,7 @@ class HijackHandler(QObject):
 
     def connect_signals(self):
         self.mainwindow.selectedNodeChanged.connect(self.onSelectedNodeChanged)
+        self.nodehandler.nodeConnected.connect(self.onNodeConnected)
 
     def setup_ui(self):
         pass
@@ -62,12 +63,20 @@ class HijackHandler(QObject):
 
     @Slot(object,object)
     def onSelectedNodeChanged(self, prev_node, node):
-        #self.selected_node = node
-        if node is not None:
-            self.setEnableUi(True)
-            self.selected_node = node["connection"]
+        # the selection changes before the node is connected, a node seen for the first time has no connection yet
+        # and an old one may be closed, the ui stays disabled until onNodeConnected brings the open connection
+        connection = node.get("connection") if node is not None else None
+        if connection is not None and connection.isConnected:
+            self.selected_node = connection
         else:
-            self.setEnableUi(False)
+            self.selected_node = None
+        self.setEnableUi(self.selected_node is not None)
+
+    @Slot(dict)
+    def onNodeConnected(self, node):
+        selected = self.mainwindow.selectedNode
+        if selected is not None and node["id"] == selected["id"]:
+            self.onSelectedNodeChanged(None, node)
 
 
     @Slot()
@@ -21,25 +21,23 @@
 # THE SOFTWARE.                                                                     #
 #####################################################################################
 
-from PySide2.QtWidgets import QAbstractItemView, QFileDialog, QToolTip
-from bitstring import *
+from PySide2.QtWidgets import QAbstractItemView, QFileDialog, QToolTip, QHBoxLayout, QLabel, QLineEdit, QPushButton
 from copy import *
 
 from libcanbadger import EthernetMessage, EthernetMessageType, ActionType
 from models.mitm_table_model import *
 from helpers import *
 from canbadger import StatusBits
-import os
+from mitm import MitmGateway, MitmRule, RULE_TYPES, COND_TYPES, compile_rows, read_rule_file, simulate_frames, \
+    analyze_rules
+from exceptions import InvalidRuleException
+from capture import read_capture, write_capture, is_block_capture, CAPTURE_FILE_FILTER, CSV_CAPTURE_ENDING
 
 
 class MITMHandler(QObject):
 
-    rule_types = ["Swap Payload", "Swap Specific Bytes", "Add fixed Value to specific bytes",
-                  "Substract fixed Value from specific bytes", "Multiply specific bytes", "Divide specific bytes",
-                  "Increase specific bytes by fixed percentage", "Decrease specific bytes by fixed percentage",
-                  "Drop Frame"]
-    cond_types = ["Entire payload matches", "Specific bytes match",
-                  "Specific bytes are greater", "Specific bytes are less"]
+    rule_types = RULE_TYPES
+    cond_types = COND_TYPES
 
     def __init__(self, mainwindow, nodehandler):
         super(MITMHandler, self).__init__()
@@ -51,6 +49,15 @@ class MITMHandler(QObject):
         self.max2ndCondChars = 8
         self.rules_to_send = []
         self.rules_sent_counter = 0
+        self.rules_acked_counter = 0
+        # rules are sent one per message, up to rule_window of them before waiting for the ACKs
+        # 1 waits for every ACK before sending the next rule
+        self.rule_window = 8
+
+        # host side mitm between two socketcan interfaces, running the rules of the table
+        self.gateway = None
+        self.gatewayPollTimer = QTimer(self)
+        self.gatewayPollTimer.timeout.connect(self.checkGateway)
 
     # SETUP FUNCTIONS
 
@@ -85,6 +92,35 @@ class MITMHandler(QObject):
         for cond_type in MITMHandler.cond_types:
             self.mainwindow.ruleCondComboBox.addItem(cond_type)
 
+        # offline check of the rules on a recorded capture
+        self.simulateRulesBtn = QPushButton("Simulate on Capture", self.mainwindow)
+        self.simulateRulesBtn.setToolTip("Apply the rules of the table to a capture file and save the result.")
+        self.simulateRulesBtn.clicked.connect(self.onSimulateRules)
+        self.mainwindow.MITMTopLayout.insertWidget(
+            self.mainwindow.MITMTopLayout.indexOf(self.mainwindow.MITMFileButton) + 1, self.simulateRulesBtn)
+        self.checkRulesBtn = QPushButton("Check Rules", self.mainwindow)
+        self.checkRulesBtn.setToolTip("Find unreachable, shadowed and overlapping rules.")
+        self.checkRulesBtn.clicked.connect(self.onCheckRules)
+        self.mainwindow.MITMTopLayout.insertWidget(
+            self.mainwindow.MITMTopLayout.indexOf(self.simulateRulesBtn) + 1, self.checkRulesBtn)
+
+        # host gateway controls, placed above the start button
+        self.gatewayLayout = QHBoxLayout()
+        self.gatewayLayout.addWidget(QLabel("Host MITM between", self.mainwindow))
+        self.gatewayInterfaceALineEdit = QLineEdit(self.mainwindow)
+        self.gatewayInterfaceALineEdit.setPlaceholderText("e.g. can0")
+        self.gatewayLayout.addWidget(self.gatewayInterfaceALineEdit)
+        self.gatewayLayout.addWidget(QLabel("and", self.mainwindow))
+        self.gatewayInterfaceBLineEdit = QLineEdit(self.mainwindow)
+        self.gatewayInterfaceBLineEdit.setPlaceholderText("e.g. can1")
+        self.gatewayLayout.addWidget(self.gatewayInterfaceBLineEdit)
+        self.gatewayBtn = QPushButton("Start Host MITM", self.mainwindow)
+        self.gatewayBtn.setToolTip("Bridge two SocketCAN interfaces on this machine and apply the rules of the table.")
+        self.gatewayBtn.clicked.connect(self.onStartGateway)
+        self.gatewayLayout.addWidget(self.gatewayBtn)
+        self.mainwindow.verticalLayout_7.insertLayout(
+            self.mainwindow.verticalLayout_7.indexOf(self.mainwindow.startMITMButton), self.gatewayLayout)
+
     # ON TAB CHANGE
 
     # check if working with rule files on the SD is available
@@ -137,37 +173,17 @@ class MITMHandler(QObject):
         if filename is None or filename[0] == '':
             return
 
-        with open(filename[0], 'r') as infile:
-            rules = infile.readlines()
-            if len(rules) < 1:
-                return
+        rules = read_rule_file(filename[0])
+        if len(rules) < 1:
+            return
 
         # remove current model entries
         self.model.clear()
 
-        # parse each rule from txt format into model
         for rule in rules:
-            values = rule.split(',')
-            if len(values) != 19:
-                continue  # invalid rule entry
-
-            # extract payloads and id directly
-            target_id = values[1]
-            condition_payload = ''.join(values[2:10])
-            argument_payload = ''.join(values[11:])
-
-            # values[0] is 4 chars representing 2byte, first byte for the condition mask, 2nd byte for condition type
-            condition = self.cond_types[int(values[0][2:], 16)]
-            # get the binary representation of the mask as string, mask is saved flipped
-            condition_mask = format(int(values[0][:2], 16), '08b')[::-1]
+            self.model.addRule(rule.to_row())
 
-            # values[10] is representing 2byte, 1st byte for argument mask, 2nd byte for rule type
-            rule_type = self.rule_types[int(values[10][2:], 16)]
-            # get the binary representation of the mask as string, mask is saved flipped
-            argument_mask = format(int(values[10][:2], 16), '08b')[::-1]
-
-            self.model.addRule([rule_type, condition, target_id, condition_payload, condition_mask, argument_payload,
-                                argument_mask])
+        self.analyzeRules(rules)
 
     @Slot()
     def onSaveRulesToFile(self):
@@ -196,15 +212,10 @@ class MITMHandler(QObject):
         # check for entered filename, and check length, filetype etc.
         filename = self.getRuleFileName()
 
-        temp_filepath = 'tmp_rules.txt'
-        if len(formatted_rules) > 0:
-            with open(temp_filepath, 'w+') as file:
-                file.writelines(formatted_rules)
-
-        # call the sd handler to upload the rule file
+        # call the sd handler to upload the rule file, the rules are sent from memory
         self.mainwindow.sdHandler.upload_result.connect(self.displayRuleSaveResult)
-        self.mainwindow.sdHandler.onUploadFile(filename, local_filename=temp_filepath, sd_path='/MITM')
-        os.remove(temp_filepath)
+        self.mainwindow.sdHandler.onUploadFile(filename, sd_path='/MITM',
+                                               data=''.join(formatted_rules).encode('ascii'))
 
     # get the content of the filename line edit, but check for .txt ending, non emptyness and max length
     def getRuleFileName(self):
@@ -223,39 +234,25 @@ class MITMHandler(QObject):
         self.mainwindow.ruleNameLineEdit.setText(filename)
         return filename
 
+    # the rules of the table in the badgers line format, empty if a rule is invalid
     def getFormattedRules(self):
-        rules = self.model.getRules()
-        formatted_rules = []
-        for rule in rules:
-            # crazily format the rule string
-            rule_str = str()
-            condition_type = str(self.cond_types.index(rule[1]))
-            condition_mask = BitArray(8)
-            condition_mask.set(True, [i for i, ltr in enumerate(str(rule[4])) if ltr == '1'])
-            condition_mask.reverse()
-            rule_str += str(condition_mask)[2:] + '0' + str(condition_type) + ','
-            # rule_str += str(condition_mask)[2:] + str(condition_type) + ','
-            rule_str += str(rule[2]) + ',' if rule[2] != "" else "0,"
-            cond_pl_string = ''
-            for i in range(0, 16, 2):
-                if i + 1 > len(rule[3]):
-                    cond_pl_string += '00,'  # pad with 0s
-                else:
-                    cond_pl_string += str(rule[3][i]) + str(rule[3][i + 1]) + ','
-            rule_str += cond_pl_string
-            action_mask = BitArray(8)
-            action_mask.set(True, [i for i, ltr in enumerate(str(rule[6])) if ltr == '1'])
-            action_mask.reverse()
-            rule_str += str(action_mask)[2:] + '0' + str(self.rule_types.index(rule[0])) + ','
-            action_pl_string = ''
-            for i in range(0, 16, 2):
-                if i + 1 > len(rule[5]):
-                    action_pl_string += '00,'  # pad with 0s
-                else:
-                    action_pl_string += str(rule[5][i]) + str(rule[5][i + 1]) + ','
-            rule_str += action_pl_string[:-1]
-            formatted_rules.append(rule_str + '\n')
-        return formatted_rules
+        compiled = self.compileRules()
+        if compiled is None:
+            return []
+        return [line + '\n' for line in compiled.lines()]
+
+    # validate and deduplicate the rules of the table, reports problems in the status bar
+    def compileRules(self):
+        try:
+            compiled = compile_rows(self.model.getRules())
+        except InvalidRuleException as e:
+            self.mainwindow.statusbar.showMessage("Invalid MITM rule: {}".format(e))
+            return None
+        for warning in compiled.warnings:
+            self.mainwindow.onUpdateDebugLog(warning)
+        if compiled.duplicates > 0:
+            self.mainwindow.statusbar.showMessage("Left out {} duplicate rules.".format(compiled.duplicates))
+        return compiled
 
     # MITM START / STOP
 
@@ -266,6 +263,15 @@ class MITMHandler(QObject):
         if node is None:
             return
 
+        # compile the rules before anything is sent, so invalid rules do not end up on the badger
+        compiled = self.compileRules()
+        if compiled is None:
+            buttonFeedback(False, self.mainwindow.startMITMButton)
+            return
+        self.rules_to_send = compiled.messages()
+        self.rules_sent_counter = 0
+        self.rules_acked_counter = 0
+
         # switch button functionality
         self.mainwindow.MITMFileButton.setText("Stop")
         gracefullyDisconnectSignal(self.mainwindow.MITMFileButton.clicked)
@@ -284,31 +290,24 @@ class MITMHandler(QObject):
         # send command
         connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.RECEIVE_RULES, 0, b''))
 
-    def sendNextRule(self):
+    # fill the window of unanswered ADD_RULE messages, ACKs come back in send order
+    def sendNextRules(self):
         node = self.mainwindow.selectedNode
         if node is None:
             return
         connection = node['connection']
 
-        # check that the parsed rules are available
+        # nothing to transfer, start right away
         if not self.rules_to_send:
-            self.rules_to_send = self.getFormattedRules()
-
-        # select rule by counter as payload
-        payload = self.rules_to_send[self.rules_sent_counter].encode('ascii')[:-1] + '\0'.encode('ascii')
-        self.rules_sent_counter += 1
-
-        # if all rules are sent, formatted rules can be discarded
-        if self.rules_sent_counter >= len(self.rules_to_send):
-            self.rules_sent_counter = 0
-            self.rules_to_send = []
-
-            # reconnect ack callback
-            gracefullyDisconnectSignal(connection.ackReceived)
-            connection.ackReceived.connect(self.onAllRulesTransmitted)
+            self.onAllRulesTransmitted()
+            return
 
-        # send rule previously selected
-        connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.ADD_RULE, len(payload), payload))
+        while self.rules_sent_counter < len(self.rules_to_send) and \
+                self.rules_sent_counter - self.rules_acked_counter < self.rule_window:
+            payload = self.rules_to_send[self.rules_sent_counter]
+            self.rules_sent_counter += 1
+            connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.ADD_RULE,
+                                                           len(payload), payload))
 
     # start MITM mode from rulefile
     @Slot()
@@ -361,6 +360,97 @@ class MITMHandler(QObject):
         gracefullyDisconnectSignal(self.mainwindow.startMITMButton.clicked)
         self.mainwindow.startMITMButton.clicked.connect(self.onStartTransmittingRules)
 
+    @Slot()
+    def onCheckRules(self):
+        rules = []
+        for row, values in enumerate(self.model.getRules()):
+            try:
+                rules.append(MitmRule.from_row(values))
+            except ValueError as e:
+                self.mainwindow.statusbar.showMessage("Invalid MITM rule: Rule {}: {}".format(row + 1, e))
+                return
+        self.analyzeRules(rules)
+
+    # report conflicting rules in the debug log, the first line of the summary in the status bar
+    def analyzeRules(self, rules):
+        analysis = analyze_rules(rules)
+        summary = analysis.summary()
+        self.mainwindow.onUpdateDebugLog(summary)
+        self.mainwindow.statusbar.showMessage(summary.split("\n")[0])
+
+    # run the rules of the table over a capture and save what would leave the badger
+    @Slot()
+    def onSimulateRules(self):
+        compiled = self.compileRules()
+        if compiled is None:
+            return
+        filename = QFileDialog.getOpenFileName(self.mainwindow, 'Open capture to simulate on', '.',
+                                               CAPTURE_FILE_FILTER)
+        if filename is None or filename[0] == '':
+            return
+
+        result = simulate_frames(compiled.to_table(), read_capture(filename[0]))
+        self.mainwindow.onUpdateDebugLog(result.summary())
+        self.mainwindow.statusbar.showMessage("{} of {} frames modified, {} dropped.".format(
+            result.modified_count(), len(result), result.dropped_count()))
+
+        filename = QFileDialog.getSaveFileName(self.mainwindow, 'Save simulated capture', '.', CAPTURE_FILE_FILTER)
+        if filename is None or filename[0] == '':
+            return
+        filename = filename[0]
+        if not filename.endswith(CSV_CAPTURE_ENDING) and not is_block_capture(filename):
+            filename += CSV_CAPTURE_ENDING
+        write_capture(filename, result.frames())
+
+    # HOST GATEWAY
+
+    @Slot()
+    def onStartGateway(self):
+        if self.gateway is not None and self.gateway.is_alive():
+            return
+        interface_a = self.gatewayInterfaceALineEdit.text().strip()
+        interface_b = self.gatewayInterfaceBLineEdit.text().strip()
+        if not interface_a or not interface_b or interface_a == interface_b:
+            self.mainwindow.statusbar.showMessage("Enter two different SocketCAN interfaces for the host MITM.")
+            return
+
+        compiled = self.compileRules()
+        if compiled is None:
+            return
+        rules = compiled.to_table()
+
+        self.gateway = MitmGateway(interface_a, interface_b, rules)
+        self.gateway.start()
+        self.gatewayPollTimer.start(500)
+
+        self.gatewayBtn.setText("Stop Host MITM")
+        gracefullyDisconnectSignal(self.gatewayBtn.clicked)
+        self.gatewayBtn.clicked.connect(self.onStopGateway)
+        self.mainwindow.statusbar.showMessage("Host MITM running with {} rules.".format(len(rules)))
+
+    @Slot()
+    def onStopGateway(self):
+        if self.gateway is not None:
+            self.gateway.stop()
+            self.gateway.join(1)
+
+    # show the counters while the gateway runs, reset the button once it is stopped or failed
+    @Slot()
+    def checkGateway(self):
+        if self.gateway is None:
+            self.gatewayPollTimer.stop()
+            return
+        self.mainwindow.statusbar.showMessage(self.gateway.summary())
+        if self.gateway.is_alive():
+            return
+
+        self.gatewayPollTimer.stop()
+        self.mainwindow.onUpdateDebugLog(self.gateway.summary())
+        buttonFeedback(self.gateway.error is None, self.gatewayBtn)
+        self.gatewayBtn.setText("Start Host MITM")
+        gracefullyDisconnectSignal(self.gatewayBtn.clicked)
+        self.gatewayBtn.clicked.connect(self.onStartGateway)
+
     # mitm start from rulefile was successful
     @Slot()
     def onMITMFileAck(self):
@@ -395,10 +485,19 @@ class MITMHandler(QObject):
         buttonFeedback(False, self.mainwindow.startMITMButton)
         self.onStopMitm()
 
-    # canbadger is ready to receive next rule
+    # the first ACK answers RECEIVE_RULES, every following one retires the oldest ADD_RULE
     @Slot()
     def onRuleReceiveACK(self):
-        self.sendNextRule()
+        if self.rules_sent_counter > 0:
+            self.rules_acked_counter += 1
+            if self.rules_acked_counter >= len(self.rules_to_send):
+                # all rules are stored, formatted rules can be discarded
+                self.rules_to_send = []
+                self.rules_sent_counter = 0
+                self.rules_acked_counter = 0
+                self.onAllRulesTransmitted()
+                return
+        self.sendNextRules()
 
     # all rules have been received by the canbadger
     @Slot()
@@ -23,11 +23,17 @@
 
 from connections.node_connection import *
 from connections import SocketCanConnection
-from helpers import buttonFeedback
+from helpers import buttonFeedback, DeadlineQueue, ConnectionPool
 from PySide2.QtCore import QMutex, QTimer
 from PySide2.QtNetwork import QUdpSocket, QHostAddress
 import datetime
 
+# seconds without a beacon until a node is dropped
+VISIBLE_TIMEOUT = 6
+CONNECTED_TIMEOUT = 10
+
+# seconds a connection stays open while its node is not selected and not logging
+IDLE_TIMEOUT = 300
 
 # handle discovery and connection of nodes
 class NodeHandler(QObject):
@@ -48,6 +54,16 @@ class NodeHandler(QObject):
         self.nodeListMutex = QMutex()
         self.mainwindow = mainwindow
 
+        # liveness deadlines of visible and connected nodes, keyed by (dict, id)
+        # the timer only fires when the earliest one is due
+        self.deadlines = DeadlineQueue()
+        self.disconnectTimer = None  # created in the thread of the handler
+        self.socketCanInterfaces = set()  # present socket can interfaces, reported by the interface monitor
+
+        # connections of nodes that are not selected stay open, switching back to them only changes the view
+        self.pool = ConnectionPool(idle_timeout=IDLE_TIMEOUT)
+        self.poolTimer = None
+
     @Slot()
     def onRun(self):
         # multithreading hack to prevent threading sigsev conditions
@@ -63,11 +79,18 @@ class NodeHandler(QObject):
         self.udpSocket.bind(13370, QUdpSocket.ReuseAddressHint)
         self.udpSocket.readyRead.connect(self.onSocketReadyRead)
 
-        # check every second
+        # armed for the next liveness deadline only
         self.disconnectTimer = QTimer(self)
+        self.disconnectTimer.setSingleShot(True)
         self.disconnectTimer.moveToThread(self.thread())
         self.disconnectTimer.timeout.connect(self.onDisconnectTimerFire)
-        self.disconnectTimer.start(100)
+        self.armDisconnectTimer()
+
+        # armed for the next idle deadline of a parked connection
+        self.poolTimer = QTimer(self)
+        self.poolTimer.setSingleShot(True)
+        self.poolTimer.moveToThread(self.thread())
+        self.poolTimer.timeout.connect(self.onPoolTimerFire)
 
 
     @Slot()
@@ -86,13 +109,7 @@ class NodeHandler(QObject):
                 self.visibleNodes[device_id] = device
                 self.newNodeDiscovered.emit(device)
                 print(f"discovered {device_id}")
-            # update timestamps for known visible/connected devices
-            if device_id in self.visibleNodes.keys():
-                self.visibleNodes[device_id]["last_seen"] = now
-                self.nodeAliveMessage.emit(self.visibleNodes[device_id])
-            if device_id in self.connectedNodes.keys():
-                self.connectedNodes[device_id]["last_seen"] = now
-                self.nodeAliveMessage.emit(self.connectedNodes[device_id])
+            self.nodeSeen(device_id, now)
             self.nodeListMutex.unlock()
 
     @Slot(str)
@@ -100,46 +117,83 @@ class NodeHandler(QObject):
         now = datetime.datetime.now()
         device = {"id": vcan, "version": "socket_can", "ip": None, "last_seen": now}
         self.nodeListMutex.lock()
+        self.socketCanInterfaces.add(vcan)
         if (vcan not in self.connectedNodes.keys()) and \
                 (vcan not in self.visibleNodes.keys()):
             self.visibleNodes[vcan] = device
             self.newNodeDiscovered.emit(device)
-        if vcan in self.visibleNodes.keys():
-            self.visibleNodes[vcan]["last_seen"] = now
-            self.nodeAliveMessage.emit(self.visibleNodes[vcan])
-        if vcan in self.connectedNodes.keys():
-            self.connectedNodes[vcan]["last_seen"] = now
-            self.nodeAliveMessage.emit(self.connectedNodes[vcan])
+        # interfaces send no beacons, they stay until they are removed
         self.nodeListMutex.unlock()
 
+    @Slot(str)
+    def onSocketCanRemoved(self, vcan):
+        self.nodeListMutex.lock()
+        self.socketCanInterfaces.discard(vcan)
+        visible = self.visibleNodes.pop(vcan, None)
+        connected = self.connectedNodes.pop(vcan, None)
+        self.pool.remove(vcan)
+        self.nodeListMutex.unlock()
+        if visible is not None:
+            self.nodeDisappeared.emit(visible)
+        if connected is not None:
+            self.nodeDisconnected.emit(connected)
+            if connected["connection"].isConnected:
+                connected["connection"].resetConnection()
+
+    # update timestamps and deadlines for known visible/connected devices, call with the mutex locked
+    def nodeSeen(self, id, now):
+        if id in self.visibleNodes.keys():
+            self.visibleNodes[id]["last_seen"] = now
+            self.setDeadline(("visible", id), VISIBLE_TIMEOUT)
+            self.nodeAliveMessage.emit(self.visibleNodes[id])
+        if id in self.connectedNodes.keys():
+            self.connectedNodes[id]["last_seen"] = now
+            self.setDeadline(("connected", id), CONNECTED_TIMEOUT)
+            self.nodeAliveMessage.emit(self.connectedNodes[id])
+
+    def setDeadline(self, key, timeout):
+        if self.deadlines.touch(key, timeout) or \
+                (self.disconnectTimer is not None and not self.disconnectTimer.isActive()):
+            self.armDisconnectTimer()
+
+    # let the timer fire when the earliest deadline is due
+    def armDisconnectTimer(self):
+        if self.disconnectTimer is None:
+            return
+        remaining = self.deadlines.time_to_next()
+        if remaining is None:
+            self.disconnectTimer.stop()
+            return
+        # a few ms late, so the deadline has passed when the timer fires
+        self.disconnectTimer.start(int(remaining * 1000) + 5)
 
     @Slot()
     def onDisconnectTimerFire(self):
-        now = datetime.datetime.now()
         self.nodeListMutex.lock()
-        ids_to_delete = []
-        for id, node in self.visibleNodes.items():
-            # check time difference
-            if (now - node["last_seen"]) > datetime.timedelta(seconds=6):
-                ids_to_delete.append(id)
+        for kind, id in self.deadlines.pop_expired():
+            if kind == "visible" and id in self.visibleNodes:
+                node = self.visibleNodes.pop(id)
                 self.nodeDisappeared.emit(node)
-        for id in ids_to_delete:
-            del self.visibleNodes[id]
-        ids_to_delete = []
-        for id, node in self.connectedNodes.items():
-            # check time difference
-            if (now - node["last_seen"]) > datetime.timedelta(seconds=10):
-                ids_to_delete.append(id)
+            elif kind == "connected" and id in self.connectedNodes:
+                node = self.connectedNodes[id]
+                self.pool.remove(id)
                 self.nodeDisconnected.emit(node)
-        for id in ids_to_delete:
-            # check for running connection process
-            if self.connectedNodes[id]["connection"].isConnected:
-                self.connectedNodes[id]["connection"].resetConnection()
-            del self.connectedNodes[id]
+                # check for running connection process
+                if node["connection"].isConnected:
+                    node["connection"].resetConnection()
+                del self.connectedNodes[id]
+        self.armDisconnectTimer()
         self.nodeListMutex.unlock()
 
     @Slot(dict)
     def onConnectToNode(self, node):
+        # a pooled connection is still open, only the view changes
+        pooled = self.pool.activate(node["id"])
+        if pooled is not None:
+            print(f"Node handler reusing connection to {node['id']}.")
+            self.nodeConnected.emit(pooled)
+            return
+
         print(f"Node handler creating connection to {node['id']}.")
         if ("connection" not in node.keys() or node["connection"] is None) and node["ip"] is not None:
             # start a connection to a canbadger
@@ -170,11 +224,38 @@ class NodeHandler(QObject):
         self.nodeListMutex.lock()
         if node["id"] in self.visibleNodes.keys():
             del self.visibleNodes[node["id"]]
+        self.deadlines.remove(("visible", node["id"]))
         self.connectedNodes[node["id"]] = node
+        self.pool.add(node)
+        if node["version"] != "socket_can":
+            self.setDeadline(("connected", node["id"]), CONNECTED_TIMEOUT)
         self.nodeListMutex.unlock()
         self.nodeConnected.emit(node)
         node_connection.nodeDisconnected.connect(self.onDisconnectNode)
 
+    # the node is not selected anymore, keep its connection open until it is idle for too long
+    @Slot(dict)
+    def onParkNode(self, node):
+        if not self.pool.park(node["id"]):
+            self.onDisconnectNode(node)
+            return
+        self.armPoolTimer()
+
+    def armPoolTimer(self):
+        remaining = self.pool.time_to_next()
+        if remaining is None:
+            self.poolTimer.stop()
+            return
+        self.poolTimer.start(int(remaining * 1000) + 5)
+
+    # close the parked connections that were idle for too long, logging ones stay open
+    @Slot()
+    def onPoolTimerFire(self):
+        for node in self.pool.expired(is_busy=lambda node: node["connection"].isCapturing()):
+            print(f"Closing idle connection to {node['id']}.")
+            self.onDisconnectNode(node)
+        self.armPoolTimer()
+
     @Slot()
     def onConnectionFailed(self):
         # signal red
@@ -191,14 +272,21 @@ class NodeHandler(QObject):
             pass
 
         # delete the node from dicts
+        self.pool.remove(node["id"])
         self.nodeListMutex.lock()
         if node["id"] in self.connectedNodes:
             del self.connectedNodes[node["id"]]
         if node["id"] in self.visibleNodes:
             del self.visibleNodes[node["id"]]
+        self.deadlines.remove(("visible", node["id"]))
+        self.deadlines.remove(("connected", node["id"]))
         self.nodeListMutex.unlock()
         self.nodeDisconnected.emit(node)
 
+        # an interface that is still there can be selected again
+        if node["version"] == "socket_can" and node["id"] in self.socketCanInterfaces:
+            self.onSocketCanDiscovered(node["id"])
+
     @Slot(str, str)
     def onIDChange(self, old, new):
         self.nodeListMutex.lock()
@@ -208,11 +296,15 @@ class NodeHandler(QObject):
         if old in self.visibleNodes:
             self.visibleNodes[new] = self.visibleNodes[old]
             del self.visibleNodes[old]
+        self.deadlines.rename(("visible", old), ("visible", new))
+        self.deadlines.rename(("connected", old), ("connected", new))
+        self.pool.rename(old, new)
         self.nodeListMutex.unlock()
 
 
     @Slot()
     def onExiting(self):
         self.disconnectTimer.stop()
+        self.poolTimer.stop()
         self.udpSocket.close()
         self.cleanupDone.emit()
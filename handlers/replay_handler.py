@@ -21,14 +21,19 @@
 # THE SOFTWARE.                                                                     #
 #####################################################################################
 
-from PySide2.QtWidgets import QAbstractItemView
-from PySide2.QtCore import QModelIndex, Qt, QItemSelectionModel
+from PySide2.QtWidgets import QAbstractItemView, QPushButton, QFileDialog, QInputDialog, QHBoxLayout, QLabel, \
+    QSpinBox, QCheckBox, QDoubleSpinBox, QComboBox, QLineEdit
+from PySide2.QtCore import QModelIndex, Qt, QItemSelectionModel, QTimer
 import time
 
 from connections.node_connection import *
 from helpers import *
 from models import CanLoggerTableModel
 from libcanbadger import EthernetMessageType, ActionType
+from capture import read_capture, parse_capture_query, CAPTURE_FILE_FILTER
+from analysis import ResponseCorrelator
+from replay import ReplayWindow, ReplayScheduler, ReplaySource, SocketCanReplayer, BcmCyclicSender, \
+    format_socketcan_frame, parse_socketcan_frame, Pacer, PacingMode, parse_replay_command
 
 
 class ReplayHandler(QObject):
@@ -39,7 +44,47 @@ class ReplayHandler(QObject):
         self.model = CanLoggerTableModel(self.mainwindow.replayFramesTableView)
         self.currentRowModelIndex = None
         self.selectionModel = None
-        self.replayList = None
+        self.replaySource = None
+
+        # replay commands are pipelined, up to window_size commands are sent before waiting for an ACK
+        self.window_size = 32
+        self.replayWindow = None
+        self.replayConnection = None
+
+        # a command without answer after replay_timeout is sent once more, then it is given up
+        self.replay_timeout = 1000  # ms
+        self.replay_retries = 1
+        self.replayExpiryTimer = QTimer(self)
+        self.replayExpiryTimer.setSingleShot(True)
+        self.replayExpiryTimer.timeout.connect(self.onReplayExpired)
+
+        # optionally frames are sent with the gaps they had in the capture, scaled by the speed factor
+        self.timed_replay = False
+        self.replay_speed = 1.0
+        self.replayScheduler = None  # ReplayScheduler for original timing or Pacer, None is unpaced
+        self.nextDue = None
+
+        # pacing if the original timing is not used, the value is frames/s, bus load % or burst size by mode
+        self.pacing_mode = PacingMode.NONE
+        self.pacing_value = 1000.0
+        self.burst_gap = 10.0  # ms
+        self.replayTimer = QTimer(self)
+        self.replayTimer.setSingleShot(True)
+        self.replayTimer.setTimerType(Qt.PreciseTimer)
+        self.replayTimer.timeout.connect(self.sendNextReplay)
+
+        # socketcan nodes replay from a worker thread, repeated frames may be sent by the kernel (CAN_BCM)
+        self.socketCanReplayer = None
+        self.bcmSender = None
+        self.use_bcm = False
+        self.bcm_interval = 10  # ms between the repetitions of a frame sent by the kernel
+        self.socketCanPollTimer = QTimer(self)
+        self.socketCanPollTimer.timeout.connect(self.checkSocketCanReplay)
+
+        # optionally the running logger is watched for reactions to the replayed frames
+        self.correlate_responses = False
+        self.response_window = 1000  # ms after a stimulus in which responses are matched
+        self.correlator = None
 
     def connect_signals(self):
         self.mainwindow.mainInitDone.connect(self.setup_gui)
@@ -62,6 +107,91 @@ class ReplayHandler(QObject):
         self.selectionModel = self.mainwindow.replayFramesTableView.selectionModel()
         self.selectionModel.currentRowChanged.connect(self.onCurrentRowChanged)
 
+        # button to add frames from a saved capture
+        self.loadFromCaptureBtn = QPushButton("Load from Capture", self.mainwindow)
+        self.mainwindow.horizontalLayout_8.addWidget(self.loadFromCaptureBtn)
+        self.loadFromCaptureBtn.clicked.connect(self.onLoadFramesFromCapture)
+
+        # button to stream a capture file to the bus without loading it
+        self.replayFromCaptureBtn = QPushButton("Replay Capture File", self.mainwindow)
+        self.mainwindow.horizontalLayout_8.addWidget(self.replayFromCaptureBtn)
+        self.replayFromCaptureBtn.clicked.connect(self.onReplayFromCapture)
+
+        # replay options above the start button
+        self.replayOptionsLayout = QHBoxLayout()
+        self.replayOptionsLayout.addWidget(QLabel("In-flight Window", self.mainwindow))
+        self.replayWindowSpinBox = QSpinBox(self.mainwindow)
+        self.replayWindowSpinBox.setRange(1, 1024)
+        self.replayWindowSpinBox.setValue(self.window_size)
+        self.replayWindowSpinBox.valueChanged.connect(self.onReplayWindowSizeChanged)
+        self.replayOptionsLayout.addWidget(self.replayWindowSpinBox)
+        self.replayTimedCheckbox = QCheckBox("Original Timing", self.mainwindow)
+        self.replayTimedCheckbox.stateChanged.connect(self.onReplayTimedChanged)
+        self.replayOptionsLayout.addWidget(self.replayTimedCheckbox)
+        self.replayOptionsLayout.addWidget(QLabel("Speed", self.mainwindow))
+        self.replaySpeedSpinBox = QDoubleSpinBox(self.mainwindow)
+        self.replaySpeedSpinBox.setRange(0.01, 100.0)
+        self.replaySpeedSpinBox.setValue(self.replay_speed)
+        self.replaySpeedSpinBox.setSuffix("x")
+        self.replaySpeedSpinBox.valueChanged.connect(self.onReplaySpeedChanged)
+        self.replayOptionsLayout.addWidget(self.replaySpeedSpinBox)
+        self.replayBcmCheckbox = QCheckBox("Kernel BCM for Repeats", self.mainwindow)
+        self.replayBcmCheckbox.setToolTip("SocketCAN only: frames with a count above 1 are sent cyclically "
+                                          "by the kernel broadcast manager")
+        self.replayBcmCheckbox.stateChanged.connect(self.onReplayBcmChanged)
+        self.replayOptionsLayout.addWidget(self.replayBcmCheckbox)
+        self.replayBcmIntervalSpinBox = QSpinBox(self.mainwindow)
+        self.replayBcmIntervalSpinBox.setRange(1, 60000)
+        self.replayBcmIntervalSpinBox.setValue(self.bcm_interval)
+        self.replayBcmIntervalSpinBox.setSuffix(" ms")
+        self.replayBcmIntervalSpinBox.valueChanged.connect(self.onReplayBcmIntervalChanged)
+        self.replayOptionsLayout.addWidget(self.replayBcmIntervalSpinBox)
+        self.replayOptionsLayout.addStretch()
+        self.mainwindow.verticalLayout_4.insertLayout(
+            self.mainwindow.verticalLayout_4.indexOf(self.mainwindow.startReplayBtn), self.replayOptionsLayout)
+
+        # pacing options, used when the original timing is off
+        self.replayPacingLayout = QHBoxLayout()
+        self.replayPacingLayout.addWidget(QLabel("Pacing", self.mainwindow))
+        self.replayPacingComboBox = QComboBox(self.mainwindow)
+        self.replayPacingComboBox.addItems(["As fast as possible", "Frames/s", "Bus Load %", "Burst"])
+        self.replayPacingComboBox.currentIndexChanged.connect(self.onReplayPacingModeChanged)
+        self.replayPacingLayout.addWidget(self.replayPacingComboBox)
+        self.replayPacingValueSpinBox = QDoubleSpinBox(self.mainwindow)
+        self.replayPacingValueSpinBox.setRange(0.1, 100000.0)
+        self.replayPacingValueSpinBox.setValue(self.pacing_value)
+        self.replayPacingValueSpinBox.setEnabled(False)
+        self.replayPacingValueSpinBox.valueChanged.connect(self.onReplayPacingValueChanged)
+        self.replayPacingLayout.addWidget(self.replayPacingValueSpinBox)
+        self.replayPacingLayout.addWidget(QLabel("Burst Gap", self.mainwindow))
+        self.replayBurstGapSpinBox = QDoubleSpinBox(self.mainwindow)
+        self.replayBurstGapSpinBox.setRange(0.1, 60000.0)
+        self.replayBurstGapSpinBox.setValue(self.burst_gap)
+        self.replayBurstGapSpinBox.setSuffix(" ms")
+        self.replayBurstGapSpinBox.setEnabled(False)
+        self.replayBurstGapSpinBox.valueChanged.connect(self.onReplayBurstGapChanged)
+        self.replayPacingLayout.addWidget(self.replayBurstGapSpinBox)
+        self.replayPacingLayout.addStretch()
+        self.mainwindow.verticalLayout_4.insertLayout(
+            self.mainwindow.verticalLayout_4.indexOf(self.mainwindow.startReplayBtn), self.replayPacingLayout)
+
+        # response correlation options, needs the can logger running
+        self.replayResponseLayout = QHBoxLayout()
+        self.replayCorrelateCheckbox = QCheckBox("Correlate Responses on IDs", self.mainwindow)
+        self.replayCorrelateCheckbox.stateChanged.connect(self.onReplayCorrelateChanged)
+        self.replayResponseLayout.addWidget(self.replayCorrelateCheckbox)
+        self.replayResponseIdsLineEdit = QLineEdit(self.mainwindow)
+        self.replayResponseIdsLineEdit.setPlaceholderText("e.g. 7e8, 3e9")
+        self.replayResponseLayout.addWidget(self.replayResponseIdsLineEdit)
+        self.replayResponseLayout.addWidget(QLabel("Window", self.mainwindow))
+        self.replayResponseWindowSpinBox = QSpinBox(self.mainwindow)
+        self.replayResponseWindowSpinBox.setRange(1, 60000)
+        self.replayResponseWindowSpinBox.setValue(self.response_window)
+        self.replayResponseWindowSpinBox.setSuffix(" ms")
+        self.replayResponseWindowSpinBox.valueChanged.connect(self.onReplayResponseWindowChanged)
+        self.replayResponseLayout.addWidget(self.replayResponseWindowSpinBox)
+        self.mainwindow.verticalLayout_4.insertLayout(
+            self.mainwindow.verticalLayout_4.indexOf(self.mainwindow.startReplayBtn), self.replayResponseLayout)
 
     @Slot(QModelIndex, QModelIndex)
     def onCurrentRowChanged(self, current, prev):
@@ -96,66 +226,314 @@ class ReplayHandler(QObject):
 
     @Slot()
     def onStartReplay(self):
-        if self.mainwindow.selectedNode is None or self.mainwindow.selectedNode["version"] == "socket_can":
+        if self.mainwindow.selectedNode is None:
             return
 
         if len(self.model.getFrames()) < 1:
             return
 
-        connection = self.mainwindow.selectedNode['connection']
+        # frames are formatted lazily while sending, the snapshot keeps edits during the replay out of it
+        # frames loaded from a capture carry their timestamp, others are sent right after their predecessor
+        # rows are edited in place by the model, so each of them is copied
+        rows = [tuple(row) for row in self.model.getFrames()]
+        if self.mainwindow.selectedNode["version"] == "socket_can":
+            self.startSocketCanReplay(rows)
+            return
+
+        self.startReplay(ReplaySource.from_rows(rows))
+
+    # replay the matching frames of a capture file directly, without loading them into the replay list
+    @Slot()
+    def onReplayFromCapture(self):
+        if self.mainwindow.selectedNode is None:
+            return
+
+        filename = QFileDialog.getOpenFileName(self.mainwindow, 'Replay Capture', '.', CAPTURE_FILE_FILTER)
+        if len(filename) < 1 or filename[0] == '':
+            return
+
+        query, ok = QInputDialog.getText(self.mainwindow, 'Replay Capture',
+                                         'IDs (hex) @ time range, e.g. "3e9, 1a0 @ 1830000-1850000":')
+        if not ok:
+            return
+        try:
+            ids, start, end = parse_capture_query(query)
+        except ValueError:
+            return
 
-        # preformat and put frames into queue
-        formatted_frames = []
-        for frame in self.model.getFrames():
-            interface = struct.pack('B', frame[3])
-            id = struct.pack('I', frame[1])
-            frame_payload_raw = frame[2]
-            count = frame[0]
+        if self.mainwindow.selectedNode["version"] == "socket_can":
+            if self.socketCanReplayer is not None and self.socketCanReplayer.is_alive():
+                return
+            source = ReplaySource.from_capture(filename[0], ids=ids, start=start, end=end,
+                                               formatter=format_socketcan_frame)
+            self.startCorrelation(source, parse_socketcan_frame)
+            self.runSocketCanReplay(source)
+            return
 
-            if len(frame_payload_raw) == 0 or count == 0:
-                continue
+        self.startReplay(ReplaySource.from_capture(filename[0], ids=ids, start=start, end=end))
 
-            payload = struct.pack("%ds" % len(frame_payload_raw), frame_payload_raw)
-            formatted_frames.append((count, interface + id + payload))
+    def startReplay(self, source):
+        connection = self.mainwindow.selectedNode['connection']
 
-        # connect signals to trigger next replay on ACK
+        # connect signals to retire sent frames on ACK and refill the window
         # also connect NACK, we want to send later frames even on NACK (can be due to interface etc.)
         gracefullyDisconnectSignal(connection.ackReceived)
         gracefullyDisconnectSignal(connection.nackReceived)
-        connection.ackReceived.connect(self.sendNextReplay)
-        connection.nackReceived.connect(self.sendNextReplay)
+        connection.ackReceived.connect(self.onReplayAck)
+        connection.nackReceived.connect(self.onReplayNack)
 
-        self.replayList = formatted_frames
+        self.replaySource = source
+        self.replayConnection = connection
+        self.replayWindow = ReplayWindow(self.window_size, timeout=self.replay_timeout / 1000,
+                                         retries=self.replay_retries)
+        self.replayScheduler = self.createReplayTiming(parse_replay_command)
+        self.nextDue = None
+        self.startCorrelation(source, parse_replay_command)
 
         self.sendNextReplay()
 
+    # socketcan replay of the replay list rows
+    def startSocketCanReplay(self, rows):
+        if self.socketCanReplayer is not None and self.socketCanReplayer.is_alive():
+            return
+
+        # socketcan frames carry at most 8 bytes, rather refuse the replay than fail in the middle of it
+        too_long = [row for row in rows if len(row[2]) > 8]
+        if too_long:
+            self.mainwindow.statusbar.showMessage("Frame {:X} has more than 8 bytes of payload.".format(too_long[0][1]))
+            return
+
+        interface = self.mainwindow.selectedNode["id"]
+        if self.use_bcm:
+            # closing the bcm socket deletes its cyclic jobs, so the sender lives until the next replay
+            if self.bcmSender is not None:
+                self.bcmSender.close()
+            try:
+                self.bcmSender = BcmCyclicSender(interface)
+            except OSError as e:
+                self.bcmSender = None
+                self.mainwindow.statusbar.showMessage("Could not open CAN_BCM on {}: {}".format(interface, e))
+                return
+            cyclic = [row for row in rows if row[0] > 1 and len(row[2]) > 0]
+            rows = [row for row in rows if row[0] <= 1]
+        else:
+            cyclic = []
+
+        source = ReplaySource.from_rows(rows, formatter=format_socketcan_frame)
+        if self.startCorrelation(source, parse_socketcan_frame):
+            for row in cyclic:
+                self.correlator.add_stimulus(row[1], row[2])
+        for row in cyclic:
+            self.bcmSender.start(row[1], row[2], self.bcm_interval / 1000, count=row[0])
+        self.runSocketCanReplay(source)
+
+    def runSocketCanReplay(self, source):
+        if self.socketCanReplayer is not None and self.socketCanReplayer.is_alive():
+            return
+
+        scheduler = self.createReplayTiming(parse_socketcan_frame)
+        self.socketCanReplayer = SocketCanReplayer(self.mainwindow.selectedNode["id"], source, scheduler=scheduler)
+        self.socketCanReplayer.start()
+        self.socketCanPollTimer.start(100)
+
+    # returns what decides when frames are sent: the capture timing, a pacer or nothing (as fast as possible)
+    def createReplayTiming(self, parse):
+        if self.timed_replay:
+            return ReplayScheduler(self.replay_speed)
+        if self.pacing_mode == PacingMode.NONE:
+            return None
+
+        # the pacer needs the bitrates of the node for the bus load, socketcan nodes have no settings
+        bitrates = None
+        settings = self.mainwindow.selectedNode.get("settings")
+        if settings is not None:
+            bitrates = {1: settings[2], 2: settings[3]}
+        return Pacer(self.pacing_mode, frame_rate=self.pacing_value, bus_load=min(self.pacing_value, 100) / 100,
+                     bitrates=bitrates, burst_size=int(self.pacing_value), burst_gap=self.burst_gap / 1000,
+                     parse=parse)
+
+    @Slot()
+    def checkSocketCanReplay(self):
+        if self.socketCanReplayer is None or self.socketCanReplayer.is_alive():
+            return
+        self.socketCanPollTimer.stop()
+        self.mainwindow.statusbar.showMessage(self.socketCanReplayer.summary())
+        self.scheduleCorrelationReport()
+
+    # registers every sent frame as stimulus and listens to the logger for the responses
+    # returns True if the correlation runs for this replay
+    def startCorrelation(self, source, parse):
+        self.stopCorrelation()
+        if not self.correlate_responses:
+            return False
+
+        try:
+            response_ids = [int(x, 16) for x in self.replayResponseIdsLineEdit.text().replace(',', ' ').split()]
+        except ValueError:
+            response_ids = []
+        if not response_ids:
+            self.mainwindow.statusbar.showMessage("Enter the response IDs to correlate.")
+            return False
+        if not self.mainwindow.canLogger.data_timer.isActive():
+            self.mainwindow.statusbar.showMessage("Start the CAN logger to correlate responses.")
+            return False
+
+        correlator = ResponseCorrelator(response_ids, window=self.response_window * 1000)
+        source.listener = lambda frame: correlator.add_stimulus(*parse(frame)[1:])
+        self.correlator = correlator
+        self.mainwindow.canLogger.framesLogged.connect(self.onFramesLogged)
+        return True
+
+    @Slot(list)
+    def onFramesLogged(self, frames):
+        if self.correlator is not None:
+            self.correlator.add_frames(frames)
+
+    # give late responses the time of one window (and a logger poll) before reporting
+    def scheduleCorrelationReport(self):
+        correlator = self.correlator
+        if correlator is not None:
+            QTimer.singleShot(self.response_window + 200, lambda: self.reportCorrelation(correlator))
+
+    # the report belongs to the replay that scheduled it, a newer replay may have started its own correlator
+    def reportCorrelation(self, correlator):
+        if correlator is self.correlator:
+            self.stopCorrelation()
+        correlator.finish()
+        self.mainwindow.onUpdateDebugLog(correlator.report())
+
+    def stopCorrelation(self):
+        if self.correlator is not None:
+            gracefullyDisconnectSignal(self.mainwindow.canLogger.framesLogged)
+            self.correlator = None
+
+    @Slot()
+    def onReplayAck(self):
+        self.onReplayAnswer(True)
+
+    @Slot()
+    def onReplayNack(self):
+        self.onReplayAnswer(False)
+
+    def onReplayAnswer(self, acked):
+        if self.replayWindow is None:
+            return
+        self.replayWindow.retire(acked)
+        self.sendNextReplay()
+
+    # send frames back to back until the in-flight window is full
+    # with original timing only the frames that are due are sent, the timer wakes us up for the next one
     @Slot()
     def sendNextReplay(self):
-        connection = self.mainwindow.selectedNode['connection']
-        if self.replayList is None or len(self.replayList) == 0:
-            # nothing left to send, disconnect signals
-            self.replayList = None
-            gracefullyDisconnectSignal(connection.ackReceived)
-            gracefullyDisconnectSignal(connection.nackReceived)
+        if self.replayWindow is None:
+            return
+
+        while self.replayWindow.can_send() and not self.replaySource.is_empty():
+            if self.replayScheduler is not None and not self.isReplayDue():
+                break
+            self.sendReplayCommand()
+
+        if self.replaySource.is_empty() and self.replayWindow.is_idle():
+            self.finishReplay()
+        else:
+            self.armReplayExpiry()
+
+    # wake up when the oldest unanswered command times out
+    def armReplayExpiry(self):
+        wait = self.replayWindow.time_to_expiry()
+        if wait is None:
+            self.replayExpiryTimer.stop()
+        else:
+            self.replayExpiryTimer.start(int(wait * 1000) + 1)
+
+    @Slot()
+    def onReplayExpired(self):
+        if self.replayWindow is None:
             return
+        for command in self.replayWindow.expire():
+            self.replayConnection.sendEthernetMessage(
+                EthernetMessage(EthernetMessageType.ACTION, ActionType.START_REPLAY, len(command), command))
+        self.sendNextReplay()
 
-        cnt, command = self.replayList[0]
+    # checks if the next frame has to be sent now, arms the timer for it otherwise
+    def isReplayDue(self):
+        if self.nextDue is None:
+            self.nextDue = self.replayScheduler.due(*self.replaySource.peek())
+        wait = self.replayScheduler.wait_time(self.nextDue)
+        # qt timers have millisecond resolution, frames due within the next half millisecond are sent right away
+        if wait > 0.0005:
+            self.replayTimer.start(int(wait * 1000))
+            return False
+        return True
+
+    def finishReplay(self):
+        # nothing left to send and everything answered, disconnect signals
+        gracefullyDisconnectSignal(self.replayConnection.ackReceived)
+        gracefullyDisconnectSignal(self.replayConnection.nackReceived)
+        self.replayTimer.stop()
+        self.replayExpiryTimer.stop()
+        summary = self.replayWindow.summary()
+        if self.replayScheduler is not None:
+            summary += ", " + self.replayScheduler.summary()
+        self.mainwindow.statusbar.showMessage(summary)
+        self.scheduleCorrelationReport()
+        self.replayConnection = None
+        self.replaySource = None
+        self.replayWindow = None
+        self.replayScheduler = None
+
+    def sendReplayCommand(self):
+        command, timestamp = self.replaySource.pop()
 
         # send one replay command
-        connection.sendEthernetMessage(
+        self.replayConnection.sendEthernetMessage(
             EthernetMessage(EthernetMessageType.ACTION, ActionType.START_REPLAY, len(command), command))
+        self.replayWindow.sent(command)
+        if self.replayScheduler is not None:
+            self.replayScheduler.sent(self.nextDue)
+            self.nextDue = None
 
-        if cnt > 1:
-            if len(self.replayList) > 1:
-                self.replayList = [(cnt - 1, command)] + self.replayList[1:]
-            else:
-                self.replayList = [(cnt - 1, command)]
-        else:
-            if len(self.replayList) > 1:
-                self.replayList = self.replayList[1:]
-            else:
-                # last command was sent, set replayList to None and wait for ACK
-                self.replayList = None
+    @Slot(int)
+    def onReplayWindowSizeChanged(self, value):
+        self.window_size = value
+
+    @Slot(int)
+    def onReplayTimedChanged(self, state):
+        self.timed_replay = state == 2
+
+    @Slot(float)
+    def onReplaySpeedChanged(self, value):
+        self.replay_speed = value
+
+    @Slot(int)
+    def onReplayPacingModeChanged(self, index):
+        self.pacing_mode = PacingMode(index)
+        self.replayPacingValueSpinBox.setEnabled(self.pacing_mode != PacingMode.NONE)
+        self.replayBurstGapSpinBox.setEnabled(self.pacing_mode == PacingMode.BURST)
+
+    @Slot(float)
+    def onReplayPacingValueChanged(self, value):
+        self.pacing_value = value
+
+    @Slot(float)
+    def onReplayBurstGapChanged(self, value):
+        self.burst_gap = value
+
+    @Slot(int)
+    def onReplayCorrelateChanged(self, state):
+        self.correlate_responses = state == 2
+
+    @Slot(int)
+    def onReplayResponseWindowChanged(self, value):
+        self.response_window = value
+
+    @Slot(int)
+    def onReplayBcmChanged(self, state):
+        self.use_bcm = state == 2
+
+    @Slot(int)
+    def onReplayBcmIntervalChanged(self, value):
+        self.bcm_interval = value
 
     @Slot(str)
     def onFrameIdEdited(self, text):
@@ -195,6 +573,30 @@ class ReplayHandler(QObject):
     def onAddReplayFrame(self, frame):
         self.model.addFrame(frame)
 
+    # append the frames of a saved capture that match an id subset and/or a time range
+    @Slot()
+    def onLoadFramesFromCapture(self):
+        if self.mainwindow.selectedNode is None:
+            return
+
+        filename = QFileDialog.getOpenFileName(self.mainwindow, 'Load Frames from Capture', '.',
+                                               CAPTURE_FILE_FILTER)
+        if len(filename) < 1 or filename[0] == '':
+            return
+
+        query, ok = QInputDialog.getText(self.mainwindow, 'Load from Capture',
+                                         'IDs (hex) @ time range, e.g. "3e9, 1a0 @ 1830000-1850000":')
+        if not ok:
+            return
+        try:
+            ids, start, end = parse_capture_query(query)
+        except ValueError:
+            return
+
+        frames = [[1, frame.frame_id, frame.frame_payload, frame.interface_number, frame.timestamp]
+                  for frame in read_capture(filename[0], ids=ids, start=start, end=end)]
+        self.model.setFrames(self.model.getFrames() + frames)
+
     @Slot()
     def onAddReplayFrameClicked(self):
         if self.mainwindow.selectedNode is not None:
@@ -22,12 +22,15 @@
 #####################################################################################
 
 from PySide2.QtCore import *
-from PySide2.QtWidgets import QFileDialog, QListWidgetItem, QAbstractItemView
+from PySide2.QtWidgets import QFileDialog, QListWidgetItem, QAbstractItemView, QLabel, QSpinBox, QPushButton, \
+    QCheckBox, QHBoxLayout, QMessageBox
 
 from libcanbadger import EthernetMessage, EthernetMessageType, ActionType
 from helpers import *
 from models import SD_FS_Model
-import struct
+from sdcard import SdUpload, SdDownload, UploadSource, TransferState, TransferQueue, TransferJob, UPLOAD_CHUNK_SIZE
+import os
+import time
 
 
 class SdHandler(QObject):
@@ -40,23 +43,80 @@ class SdHandler(QObject):
         self.nodehandler = nodehandler
         self.fileBrowser = mainwindow.sdCardTreeView  # the view displaying files and directories
         self.fileModel = SD_FS_Model(self.fileBrowser)  # the model holding directories and files
+        self.fileModels = dict()  # node id -> SD_FS_Model, the sd tree of every node is kept until it disappears
         self.fileBrowser.setModel(self.fileModel)
         self.fileBrowser.setSelectionMode(QAbstractItemView.SingleSelection)
         self.fileBrowser.setPathLineEdit(self.mainwindow.sdCardFolderLineEdit)
         self.fileBrowser.setHandler(self)
-        self.transmissionData = None  # buffer to store data during download or upload
+        self.download = None  # the running download, writes the received data straight to the target file
+        self.last_progress = 0.0  # time of the last progress message while downloading
         self.busy = False  # precaution flag to ensure no commands are sent to the CB while its executing another
-        self.packet_number = 0  # keeps track of numbering the packets when uploading
+        self.upload = None  # the running upload, keeps track of the numbered packets in flight
+        self.upload_window = 8  # packets sent before waiting for an ACK, 1 waits for every packet
         self.stillDownloading = False  # flag to signal the handler is in the middle of a download
         self.monitored_filepath = None  # keeps track of the filepath and name when uploading or deleting,
                                         # so the browser can be updated on ACK
 
+        # transfers interrupted by a disconnect can be resumed from their last confirmed offset
+        self.transfer_state = None  # TransferState of the running transfer
+        self.transfer_node = None  # id of the node the running transfer belongs to
+        self.interrupted = dict()  # node id -> TransferState
+        self.verify_uploads = False  # read uploads back and compare their crc32, resumed uploads are always checked
+        self.verify_crc32 = None  # expected checksum while reading back an upload
+        self.closed_upload = None  # (crc32, size) of an upload whose STOP_CURRENT_ACTION is not answered yet
+
+        # many files are handled by a queue, its jobs start one after the other as the previous one finishes
+        self.queue = None  # the running TransferQueue
+        self.queue_node = None  # id of the node the queue runs on
+
     def connect_signals(self):
+        self.mainwindow.mainInitDone.connect(self.setup_gui)
         self.mainwindow.refreshSdCardBtn.clicked.connect(self.onUpdateSd)
         self.mainwindow.downloadFileBtn.clicked.connect(self.onDownloadFile)
         self.mainwindow.deleteFileBtn.clicked.connect(self.onDeleteFile)
         self.mainwindow.uploadFileBtn.clicked.connect(self.onUploadButton)
         self.mainwindow.sdCardFolderLineEdit.textEdited.connect(self.onPathEdit)
+        self.nodehandler.nodeDisconnected.connect(self.onNodeDisconnected)
+        self.nodehandler.nodeDisappeared.connect(self.onNodeDisappeared)
+
+    @Slot()
+    def setup_gui(self):
+        self.mainwindow.horizontalLayout_10.addWidget(QLabel("Upload Window", self.mainwindow))
+        self.uploadWindowSpinBox = QSpinBox(self.mainwindow)
+        self.uploadWindowSpinBox.setRange(1, 64)
+        self.uploadWindowSpinBox.setValue(self.upload_window)
+        self.uploadWindowSpinBox.setToolTip("Number of upload packets sent before waiting for an ACK.")
+        self.uploadWindowSpinBox.valueChanged.connect(self.onUploadWindowChanged)
+        self.mainwindow.horizontalLayout_10.addWidget(self.uploadWindowSpinBox)
+        self.verifyUploadsCheckbox = QCheckBox("Verify Uploads", self.mainwindow)
+        self.verifyUploadsCheckbox.setToolTip("Read uploaded files back and compare their CRC32.")
+        self.verifyUploadsCheckbox.stateChanged.connect(self.onVerifyUploadsChanged)
+        self.mainwindow.horizontalLayout_10.addWidget(self.verifyUploadsCheckbox)
+        self.resumeTransferBtn = QPushButton("Resume Transfer", self.mainwindow)
+        self.resumeTransferBtn.setToolTip("Continue an upload or download interrupted by a disconnect.")
+        self.resumeTransferBtn.setEnabled(False)
+        self.resumeTransferBtn.clicked.connect(self.onResumeTransfer)
+        self.mainwindow.horizontalLayout_10.addWidget(self.resumeTransferBtn)
+
+        # a second row for transfers of whole folders or many files
+        self.queueLayout = QHBoxLayout()
+        self.downloadFolderBtn = QPushButton("Download Folder", self.mainwindow)
+        self.downloadFolderBtn.setToolTip("Download all files in the selected folder and its subfolders.")
+        self.downloadFolderBtn.clicked.connect(self.onDownloadFolder)
+        self.queueLayout.addWidget(self.downloadFolderBtn)
+        self.uploadFilesBtn = QPushButton("Upload Files", self.mainwindow)
+        self.uploadFilesBtn.setToolTip("Upload several files into the selected folder.")
+        self.uploadFilesBtn.clicked.connect(self.onUploadFiles)
+        self.queueLayout.addWidget(self.uploadFilesBtn)
+        self.deleteFolderBtn = QPushButton("Delete Folder Contents", self.mainwindow)
+        self.deleteFolderBtn.setToolTip("Delete all files in the selected folder and its subfolders.")
+        self.deleteFolderBtn.clicked.connect(self.onDeleteFolder)
+        self.queueLayout.addWidget(self.deleteFolderBtn)
+        self.cancelQueueBtn = QPushButton("Cancel Queue", self.mainwindow)
+        self.cancelQueueBtn.setEnabled(False)
+        self.cancelQueueBtn.clicked.connect(self.onCancelQueue)
+        self.queueLayout.addWidget(self.cancelQueueBtn)
+        self.mainwindow.gridLayout_8.addLayout(self.queueLayout, 6, 0, 1, 1)
 
     # START ACTIONS
 
@@ -70,10 +130,8 @@ class SdHandler(QObject):
         if self.fileModel.is_filled() and caller == "tab":
             return
 
-        # create a new model to hold the new data
-        self.fileModel = SD_FS_Model(self.fileBrowser)
-        self.fileBrowser.setModel(self.fileModel)
-        self.fileBrowser.selectionModel().currentChanged.connect(self.onSelectionChange)
+        # the listing updates the cached tree in place
+        self.fileModel.begin_listing()
 
         # disconnect buttons
         gracefullyDisconnectSignal(self.mainwindow.downloadFileBtn.clicked)
@@ -98,8 +156,29 @@ class SdHandler(QObject):
         if item.dir:
             return
 
-        self.transmissionData = bytes()
+        # the target is chosen first, so the data can go to disk while it arrives
+        filename = QFileDialog.getSaveFileName(self.mainwindow, 'Save file', item.name, "Any files")[0]
+        if len(filename) < 1:
+            return
+        self.downloadTo(connection, item.get_filepath(), filename)
+
+    # download the file at sd_path into local_path, returns False if the local file can not be written
+    def downloadTo(self, connection, sd_path, local_path) -> bool:
+        try:
+            self.download = SdDownload(local_path)
+        except EnvironmentError:
+            self.mainwindow.statusbar.showMessage("Can not write to {}".format(local_path))
+            return False
+        self.transfer_state = TransferState(TransferState.DOWNLOAD, sd_path, local_path=local_path)
+        filepath = (sd_path + '\0').encode('ascii')  # get null terminated filepath
+        self.startDownload(connection, filepath)
+        return True
+
+    # switch signals and send the download command, the data goes to self.download
+    def startDownload(self, connection, request):
+        self.last_progress = time.monotonic()
         self.stillDownloading = True
+        self.transfer_node = self.mainwindow.selectedNode["id"]
 
         # switch signals
         gracefullyDisconnectSignal(connection.newDataMessage)
@@ -114,9 +193,8 @@ class SdHandler(QObject):
 
         # set self busy and send command to canbadger
         self.busy = True
-        filepath = (item.get_filepath() + '\0').encode('ascii')  # get null terminated filepath
         connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.DOWNLOAD_FILE,
-                                               len(filepath), filepath))
+                                               len(request), request))
 
     # send the filepath we want deleted to the canbadger
     @Slot()
@@ -144,7 +222,7 @@ class SdHandler(QObject):
                                                len(filepath), filepath))
 
     @Slot(str)
-    def onUploadFile(self, filename: str, local_filename=None, sd_path=None):
+    def onUploadFile(self, filename: str, local_filename=None, sd_path=None, data=None):
         #######################################################################################################
         # when sd_path is None, the current selection in the SD handler file browser will determine     #
         #                             the file path on the canbadger SD                                       #
@@ -153,6 +231,8 @@ class SdHandler(QObject):
         # local_filename will be used if the filename on the GUI machine and the desired filename on the      #
         #                             canbadger differ, the function will send the file from local_filename  #
         #                             to the canbadger and call it filename                                   #
+        #                                                                                                     #
+        # data (bytes) will be sent instead of a local file, e.g. for content generated in memory             #
         #######################################################################################################
 
         if not self.check_preconditions(command="upload"):
@@ -177,32 +257,74 @@ class SdHandler(QObject):
             filepath += sd_path.encode('ascii')
 
         filepath += b'/' + filename.encode('ascii') + b'\0'
+        self.uploadTo(connection, filepath, filename, local_filename, data)
 
+    # upload to the null terminated filepath on the sd card, from local_filename or data
+    def uploadTo(self, connection, filepath, filename, local_filename=None, data=None):
         # save filepath and name for browser update on success
         self.monitored_filepath = (filepath, filename)
 
-        # get the files content
-        if not local_filename:
-            local_filename = filename
-        try:
-            with open(local_filename, 'r') as file:
-                self.transmissionData = file.read().encode('ascii')
-        except EnvironmentError:
-            self.onUploadError()
-            return
-
-        # set current packet number to 0
-        self.packet_number = 0
-
-        # switch signals
+        # map the file instead of reading it, any binary file of any size is sent with constant memory
+        if data is not None:
+            source = UploadSource(data)
+        else:
+            if not local_filename:
+                local_filename = filename
+            try:
+                source = UploadSource.from_file(local_filename)
+            except EnvironmentError:
+                self.onUploadError()
+                return
+
+        self.upload = SdUpload(source, window_size=self.upload_window)
+        self.transfer_state = TransferState(TransferState.UPLOAD, filepath[:-1].decode('ascii'),
+                                            local_path=local_filename if data is None else None, data=data,
+                                            name=filename)
+        self.startUpload(connection, filepath)
+
+    # switch signals and send the upload command, the packets come from self.upload
+    def startUpload(self, connection, request):
+        self.transfer_node = self.mainwindow.selectedNode["id"]
+
+        # switch signals, the first ACK accepts the filepath
         gracefullyDisconnectSignal(connection.ackReceived)
         gracefullyDisconnectSignal(connection.nackReceived)
-        connection.ackReceived.connect(self.onUploadAck)
+        connection.ackReceived.connect(self.onUploadStarted)
         connection.nackReceived.connect(self.onUploadError)
 
         self.busy = True
         connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.UPDATE_SD,
-                                               len(filepath), filepath))
+                                               len(request), request))
+
+    # continue the transfer of the selected node that was interrupted by a disconnect
+    @Slot()
+    def onResumeTransfer(self):
+        if not self.check_preconditions():
+            return
+        node = self.mainwindow.selectedNode
+        state = self.interrupted.pop(node["id"], None)
+        self.resumeTransferBtn.setEnabled(False)
+        if state is None:
+            return
+
+        connection = node["connection"]
+        try:
+            if state.direction == TransferState.DOWNLOAD:
+                self.download = SdDownload(state.local_path, resume=state)
+                self.transfer_state = state
+                self.startDownload(connection, state.resume_request(self.download.request_position()))
+                return
+
+            source = UploadSource(state.data) if state.data is not None else UploadSource.from_file(state.local_path)
+        except EnvironmentError:
+            self.mainwindow.statusbar.showMessage("Can not resume, {} is not available.".format(state.local_path))
+            return
+
+        self.upload = SdUpload(source, window_size=self.upload_window, start_packet=state.offset // UPLOAD_CHUNK_SIZE,
+                               start_crc32=state.crc32)
+        self.transfer_state = state
+        self.monitored_filepath = (state.sd_path.encode('ascii') + b'\0', state.name)
+        self.startUpload(connection, state.resume_request())
 
     @Slot()
     def onUploadButton(self):
@@ -227,8 +349,188 @@ class SdHandler(QObject):
         connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.EEPROM_WRITE, len(name),
                                                name.encode('ascii')))
 
+    # QUEUED TRANSFERS
+
+    # the selected directory, the parent of a selected file or the root
+    def selectedDirectory(self):
+        if not self.fileBrowser.selectedIndexes():
+            return self.fileModel.root
+        item = self.fileBrowser.selectedIndexes()[0].internalPointer()
+        return item if item.dir else item.parent()
+
+    # download all files below the selected directory, the directory tree is recreated locally
+    @Slot()
+    def onDownloadFolder(self):
+        if not self.check_preconditions():
+            return
+        directory = self.selectedDirectory()
+        files = [item for item in directory.walk() if not item.dir]
+        if not files:
+            self.mainwindow.statusbar.showMessage("No files in {}".format(directory.get_filepath()))
+            return
+        target = QFileDialog.getExistingDirectory(self.mainwindow, 'Download into', '.')
+        if not target:
+            return
+
+        if directory.parent() is not None:
+            target = os.path.join(target, directory.name)
+        base = len(directory.get_filepath().rstrip('/')) + 1
+        queue = TransferQueue()
+        for item in files:
+            queue.add_download(item.get_filepath(), os.path.join(target, *item.get_filepath()[base:].split('/')))
+        self.startQueue(queue)
+
+    # upload several files into the selected directory
+    @Slot()
+    def onUploadFiles(self):
+        if not self.check_preconditions():
+            return
+        filenames = QFileDialog.getOpenFileNames(self.mainwindow, 'Select files for upload', '.')[0]
+        if not filenames:
+            return
+
+        directory = self.selectedDirectory().get_filepath().rstrip('/')
+        queue = TransferQueue()
+        for local_path in filenames:
+            queue.add_upload(local_path, directory + '/' + os.path.basename(local_path),
+                             size=os.path.getsize(local_path))
+        self.startQueue(queue)
+
+    # delete all files below the selected directory, the canbadger deletes files only
+    @Slot()
+    def onDeleteFolder(self):
+        if not self.check_preconditions():
+            return
+        directory = self.selectedDirectory()
+        files = [item for item in directory.walk() if not item.dir]
+        if not files:
+            return
+        answer = QMessageBox.question(self.mainwindow, 'Delete files',
+                                      "Delete {} files in {}?".format(len(files), directory.get_filepath()))
+        if answer != QMessageBox.Yes:
+            return
+
+        queue = TransferQueue()
+        for item in files:
+            queue.add_delete(item.get_filepath())
+        self.startQueue(queue)
+
+    @Slot()
+    def onCancelQueue(self):
+        if self.queue is None:
+            return
+        self.queue.cancel()
+        if self.queue.is_done():
+            self.finishQueue()
+        else:
+            self.mainwindow.statusbar.showMessage("Cancelling, waiting for the running transfer to finish.")
+
+    def startQueue(self, queue):
+        self.queue = queue
+        self.queue_node = self.mainwindow.selectedNode["id"]
+        self.cancelQueueBtn.setEnabled(True)
+        self.runQueue()
+
+    # start the next job of the queue, deletes are sent until the window is full
+    @Slot()
+    def runQueue(self):
+        queue = self.queue
+        if queue is None:
+            return
+        connection = self.mainwindow.selectedNode["connection"]
+
+        deletes = queue.deletes_to_send()
+        if deletes:
+            if len(queue.in_flight) == len(deletes):
+                # nothing else in flight yet, switch signals
+                gracefullyDisconnectSignal(connection.ackReceived)
+                gracefullyDisconnectSignal(connection.nackReceived)
+                connection.ackReceived.connect(self.onQueueDeleteAck)
+                connection.nackReceived.connect(self.onQueueDeleteNack)
+                self.busy = True
+            for job in deletes:
+                filepath = (job.sd_path + '\0').encode('ascii')
+                connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.DELETE_FILE,
+                                                               len(filepath), filepath))
+            return
+
+        job = queue.next_job()
+        if job is None:
+            if queue.is_done():
+                self.finishQueue()
+            return
+
+        if job.kind == TransferJob.DOWNLOAD:
+            try:
+                os.makedirs(os.path.dirname(job.local_path), exist_ok=True)
+            except EnvironmentError:
+                pass
+            if not self.downloadTo(connection, job.sd_path, job.local_path):
+                self.queueJobDone(False)
+        else:
+            name = job.sd_path[job.sd_path.rfind('/') + 1:]
+            self.uploadTo(connection, (job.sd_path + '\0').encode('ascii'), name, local_filename=job.local_path)
+
+    # the running download or upload of the queue ended, the next job starts from the event loop
+    def queueJobDone(self, result, transferred=None):
+        if self.queue is None or self.queue.current is None:
+            return
+        self.queue.finish_current(result, transferred)
+        self.mainwindow.statusbar.showMessage(self.queue.summary())
+        QTimer.singleShot(0, self.runQueue)
+
+    # an ACK answers the oldest delete in flight
+    @Slot()
+    def onQueueDeleteAck(self):
+        job = self.queue.on_delete_result(True)
+        if job is not None:
+            index = self.fileModel.index_for_path(job.sd_path)
+            if index is not None:
+                self.fileModel.remove_item(index)
+        self.afterQueueDelete()
+
+    @Slot()
+    def onQueueDeleteNack(self):
+        self.queue.on_delete_result(False)
+        self.afterQueueDelete()
+
+    def afterQueueDelete(self):
+        if not self.queue.in_flight:
+            connection = self.mainwindow.selectedNode["connection"]
+            gracefullyDisconnectSignal(connection.ackReceived)
+            gracefullyDisconnectSignal(connection.nackReceived)
+            self.busy = False
+        self.mainwindow.statusbar.showMessage(self.queue.summary())
+        self.runQueue()
+
+    def finishQueue(self):
+        summary = self.queue.summary()
+        self.queue = None
+        self.queue_node = None
+        self.cancelQueueBtn.setEnabled(False)
+        self.mainwindow.statusbar.showMessage(summary)
+        self.mainwindow.onUpdateDebugLog(summary)
+
     # HANDLE GUI
 
+    # show the cached sd tree of the node, a new node starts with an empty one
+    def showNodeTree(self, node):
+        if node is None:
+            model = SD_FS_Model(self.fileBrowser)
+        else:
+            model = self.fileModels.get(node["id"])
+            if model is None:
+                model = SD_FS_Model(self.fileBrowser)
+                self.fileModels[node["id"]] = model
+        self.fileModel = model
+        self.fileBrowser.setModel(self.fileModel)
+        self.fileBrowser.selectionModel().currentChanged.connect(self.onSelectionChange)
+
+    # a node that is gone may come back with a different sd card
+    @Slot(dict)
+    def onNodeDisappeared(self, node):
+        self.fileModels.pop(node["id"], None)
+
     # keep the path LineEdit updated with the current selection
     @Slot(QModelIndex, QModelIndex)
     def onSelectionChange(self, index, old):
@@ -264,8 +566,9 @@ class SdHandler(QObject):
 
         delim = data.index(b'\x00')
         if delim == 0:
-            # no more sd content incoming
+            # no more sd content incoming, drop what the listing did not contain
             gracefullyDisconnectSignal(connection.newDataMessage)
+            self.fileModel.end_listing()
 
             # reconnect buttons
             self.mainwindow.downloadFileBtn.clicked.connect(self.onDownloadFile)
@@ -282,30 +585,42 @@ class SdHandler(QObject):
 
         if add_index is None:
             print("this subdir is non existent")
+            return
 
-        data = data[delim + 1:]
-
+        # collect the entries of the message, the model adds them in one go
+        entries = []
+        position = delim + 1
         while True:
             try:
-                delim = data.index(b'\x00')
-                if data[0] == 15:
+                delim = data.index(b'\x00', position)
+                if data[position] == 15:
                     content_type = "File"
-                elif data[0] == 240:
+                elif data[position] == 240:
                     content_type = "Dir"
                 else:
                     raise Exception
 
-                name = data[1:delim].decode('ascii')
-                self.fileModel.add_item(add_index, name, True if content_type == "Dir" else False)
-                data = data[delim + 1:]
-            except ValueError:
+                name = data[position + 1:delim].decode('ascii')
+                entries.append((name, True if content_type == "Dir" else False))
+                position = delim + 1
+            except (ValueError, IndexError):
                 break
+        self.fileModel.add_items(add_index, entries)
 
-    # append new download data
+    # write new download data, the first 6 bytes are the message header
     @Slot(object)
     def onNewDownloadData(self, data):
-        if self.stillDownloading:
-            self.transmissionData += data[6:]
+        if not self.stillDownloading:
+            return
+        self.download.write(memoryview(data)[6:])
+
+        now = time.monotonic()
+        if now - self.last_progress >= 0.25:
+            self.last_progress = now
+            if self.queue is not None:
+                self.mainwindow.statusbar.showMessage(self.queue.summary() + " | " + self.download.summary())
+            else:
+                self.mainwindow.statusbar.showMessage(self.download.summary())
 
     # ack while downloading means transmission is done
     @Slot()
@@ -320,15 +635,31 @@ class SdHandler(QObject):
         gracefullyDisconnectSignal(connection.ackReceived)
         gracefullyDisconnectSignal(connection.nackReceived)
 
-        # display file chooser and save file
         self.mainwindow.downloadFileBtn.setText("Download File")
-        filename = QFileDialog.getSaveFileName(self.mainwindow, 'Save file', '.', "Any files")[0]
-        if len(filename) < 1:
+        if self.verify_crc32 is not None:
+            # reading back an upload, compare it with what was sent
+            data = self.download.finish()
+            result = len(data) == self.download.expected_size and self.download.crc32 == self.verify_crc32
+            self.mainwindow.statusbar.showMessage("Upload verified, CRC32 {:08X}".format(self.verify_crc32) if result
+                                                  else "Upload verification failed, CRC32 {:08X} instead of {:08X}"
+                                                  .format(self.download.crc32, self.verify_crc32))
+            self.verify_crc32 = None
+            self.download = None
+            self.finishUpload(result)
             return
-        outfile = open(filename, 'wb')
-        outfile.write(self.transmissionData)
-        outfile.flush()
-        outfile.close()
+
+        # the file is complete on disk, unless a resumed download did not match the partial file
+        self.download.finish()
+        self.mainwindow.statusbar.showMessage(self.download.summary())
+        received = self.download.received
+        result = not self.download.mismatch
+        if not result:
+            os.remove(self.download.path)
+            self.mainwindow.onUpdateDebugLog("Removed {}, download it again.".format(self.download.path))
+        self.download = None
+        self.transfer_state = None
+        self.transfer_node = None
+        self.queueJobDone(result, received)
 
     # nack while downloading signals an error
     @Slot()
@@ -341,6 +672,17 @@ class SdHandler(QObject):
         gracefullyDisconnectSignal(connection.ackReceived)
         gracefullyDisconnectSignal(connection.nackReceived)
         self.mainwindow.downloadFileBtn.setText("Download File")
+        self.transfer_state = None
+        self.transfer_node = None
+        if self.download is not None:
+            self.download.abort()
+            self.mainwindow.statusbar.showMessage("Download failed after {} bytes.".format(self.download.received))
+            self.download = None
+        if self.verify_crc32 is not None:
+            self.verify_crc32 = None
+            self.finishUpload(False)
+        else:
+            self.queueJobDone(False)
 
     # deletion successful
     @Slot()
@@ -368,24 +710,90 @@ class SdHandler(QObject):
         # something must have gone wrong, load the contents new to ensure consistency
         self.mainwindow.downloadFileBtn.click()
 
-    # receiving an ACK while uploading
+    # the canbadger opened the file, fill the window with packets
+    @Slot()
+    def onUploadStarted(self):
+        connection = self.mainwindow.selectedNode["connection"]
+        gracefullyDisconnectSignal(connection.ackReceived)
+        gracefullyDisconnectSignal(connection.nackReceived)
+        connection.ackReceived.connect(self.onUploadAck)
+        connection.nackReceived.connect(self.onUploadNack)
+        self.sendUploadPackets()
+
+    # receiving an ACK while uploading, it answers the oldest packet in flight
     @Slot()
     def onUploadAck(self):
+        self.upload.on_ack()
+        self.sendUploadPackets()
+
+    # a packet was not accepted, it is repeated unless it failed too often
+    @Slot()
+    def onUploadNack(self):
+        self.upload.on_nack()
+        if self.upload.failed:
+            self.mainwindow.statusbar.showMessage(self.upload.summary())
+            self.onUploadError()
+            return
+        self.sendUploadPackets()
+
+    def sendUploadPackets(self):
         connection = self.mainwindow.selectedNode["connection"]
 
         # check if we have data left to send
-        if not self.transmissionData:
+        if self.upload.is_done():
             # no data left to send, send STOP_CURRENT_ACTION, canbadger will close file handle
-            connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.STOP_CURRENT_ACTION, 0, b''))
-            self.busy = False
+            self.mainwindow.statusbar.showMessage(self.upload.summary())
+            self.closed_upload = (self.upload.confirmed_crc32, self.upload.size)
+            self.upload.close()
+            self.upload = None
 
-            # signal success and disconnect signals
-            self.upload_result.emit(True)
+            # nothing else is sent before the STOP is answered, otherwise its ACK is taken for the next command
             gracefullyDisconnectSignal(connection.ackReceived)
             gracefullyDisconnectSignal(connection.nackReceived)
+            connection.ackReceived.connect(self.onUploadClosed)
+            connection.nackReceived.connect(self.onUploadCloseError)
+            connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.STOP_CURRENT_ACTION, 0, b''))
+            return
+
+        for number, message in self.upload.packets_to_send():
+            connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.UPDATE_SD,
+                                                           len(message), message))
+
+    # the canbadger closed the uploaded file
+    @Slot()
+    def onUploadClosed(self):
+        connection = self.mainwindow.selectedNode["connection"]
+        gracefullyDisconnectSignal(connection.ackReceived)
+        gracefullyDisconnectSignal(connection.nackReceived)
+        crc32, size = self.closed_upload
+        self.closed_upload = None
+
+        # a resumed upload is always read back, the canbadger may have ignored the offset
+        if self.verify_uploads or self.transfer_state.offset > 0:
+            self.verify_crc32 = crc32
+            self.download = SdDownload(expected_size=size)
+            self.startDownload(connection, self.monitored_filepath[0])
+            return
 
-            # update fileBrowser with uploaded entry
+        self.finishUpload(True)
 
+    @Slot()
+    def onUploadCloseError(self):
+        connection = self.mainwindow.selectedNode["connection"]
+        gracefullyDisconnectSignal(connection.ackReceived)
+        gracefullyDisconnectSignal(connection.nackReceived)
+        self.closed_upload = None
+        self.mainwindow.statusbar.showMessage("Upload failed, the canbadger could not close the file.")
+        self.finishUpload(False)
+
+    # the upload is over, signal the result and update the fileBrowser with the uploaded entry
+    def finishUpload(self, result):
+        self.busy = False
+        self.transfer_state = None
+        self.transfer_node = None
+        self.upload_result.emit(result)
+        self.queueJobDone(result)
+        if self.monitored_filepath is not None:
             path, name = self.monitored_filepath
             self.monitored_filepath = None
             path = path[:-1].decode('ascii')
@@ -398,35 +806,99 @@ class SdHandler(QObject):
             dir_index = self.fileModel.index_for_path(path)
             self.fileModel.add_item(dir_index, name, is_dir=False)
 
-            return
-
-        # get the data to be sent in the next packet
-        packet_data = self.transmissionData[:120]  # canbadger receiver buffer currently 135 Bytes
-        self.transmissionData = self.transmissionData[120:]
-        if len(self.transmissionData) == 0:
-            self.transmissionData = None
-
-        # combine message and send
-        message = struct.pack('<IB', self.packet_number, len(packet_data)) + packet_data
-        self.packet_number += 1
-        connection.sendEthernetsMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.UPDATE_SD, len(message), message))
-
     # received a NACK while uploading
     def onUploadError(self):
         # upload went wrong, display error
         connection = self.mainwindow.selectedNode["connection"]
         self.busy = False
-        self.transmissionData = None
+        self.transfer_state = None
+        self.transfer_node = None
+        if self.upload is not None:
+            self.upload.close()
+            self.upload = None
         gracefullyDisconnectSignal(connection.ackReceived)
         gracefullyDisconnectSignal(connection.nackReceived)
         self.upload_result.emit(False)
+        self.queueJobDone(False)
+
+    # the connection of a node that is switched away from stays open,
+    # so stop what the sd tab was doing on it and keep the transfer for resuming like on a disconnect
+    @Slot(dict)
+    def onNodeParked(self, node):
+        connection = node.get("connection")
+        if connection is None or (not self.busy and self.queue_node != node["id"]):
+            return
+        if self.busy:
+            connection.sendEthernetMessage(EthernetMessage(EthernetMessageType.ACTION, ActionType.STOP_CURRENT_ACTION, 0, b''))
+        gracefullyDisconnectSignal(connection.newDataMessage)
+        gracefullyDisconnectSignal(connection.ackReceived)
+        gracefullyDisconnectSignal(connection.nackReceived)
+        self.onNodeDisconnected(node)
+        self.busy = False
+
+    # keep what was confirmed of a transfer to the disconnected node, so it can be resumed
+    @Slot(dict)
+    def onNodeDisconnected(self, node):
+        if self.queue is not None and node["id"] == self.queue_node:
+            # the remaining jobs are dropped, an interrupted transfer can still be resumed on its own
+            self.queue.cancel()
+            while self.queue.on_delete_result(False) is not None:
+                pass
+            self.queue.finish_current(False)
+            self.finishQueue()
+
+        if not self.busy or node["id"] != self.transfer_node:
+            return
+
+        state = None
+        if self.upload is not None:
+            state = self.transfer_state
+            state.offset = self.upload.confirmed_offset()
+            state.crc32 = self.upload.confirmed_crc32
+            self.upload.close()
+            self.upload = None
+            self.upload_result.emit(False)
+        elif self.closed_upload is not None:
+            # lost before the file was closed, it may be incomplete on the sd
+            self.closed_upload = None
+            self.upload_result.emit(False)
+        elif self.download is not None and self.verify_crc32 is not None:
+            # lost while reading back an upload, its content is unknown
+            self.download.abort()
+            self.verify_crc32 = None
+            self.upload_result.emit(False)
+        elif self.download is not None and self.download.path is not None:
+            self.download.abort(keep_partial=True)
+            state = self.download.state(self.transfer_state.sd_path)
+        elif self.download is not None:
+            self.download.abort()
+        self.download = None
+
+        self.busy = False
+        self.stillDownloading = False
+        self.transfer_state = None
+        self.transfer_node = None
+        self.monitored_filepath = None
+        self.mainwindow.downloadFileBtn.setText("Download File")
+
+        if state is None:
+            self.mainwindow.statusbar.showMessage("Transfer aborted, the node disconnected.")
+            return
+        self.interrupted[node["id"]] = state
+        self.resumeTransferBtn.setEnabled(True)
+        self.mainwindow.statusbar.showMessage(state.summary() + ", reconnect to resume.")
+        self.mainwindow.onUpdateDebugLog(state.summary())
+
+    @Slot(int)
+    def onVerifyUploadsChanged(self, state):
+        self.verify_uploads = state == Qt.Checked
 
     # HELPER FUNCTIONS
 
     # check if we can send a command or should abort, moving this code here to increase readability of command functions
     def check_preconditions(self, command=None):
         # dont send new command if another one is currently executed
-        if self.busy:
+        if self.busy or self.queue is not None:
             return False
 
         # only send commands for valid connection
@@ -449,6 +921,10 @@ class SdHandler(QObject):
         # all checks passed, we can send command to canbadger
         return True
 
+    @Slot(int)
+    def onUploadWindowChanged(self, value):
+        self.upload_window = value
+
     # VISUAL FEEDBACK
 
     @Slot(bool)
@@ -59,6 +59,6 @@ class SettingsHandler(QObject):
         gracefullyDisconnectSignal(node['connection'].nackReceived)
         self.mainwindow.onUpdateDebugLog("Error saving settings!")
 
-    @Slot(dict)
-    def onSelectedNodeChanged(self, node):
+    @Slot(object, dict)
+    def onSelectedNodeChanged(self, previous, current):
         self.mainwindow.nodeIdLineEdit.setText("")
@@ -66,6 +66,7 @@ class UDSHandler(QObject):
     def connect_signals(self):
         self.mainwindow.mainInitDone.connect(self.setup_gui)
         self.mainwindow.selectedNodeChanged.connect(self.onSelectedNodeChanged)
+        self.nodehandler.nodeConnected.connect(self.onNodeConnected)
 
     def writeUdsLogMsg(self, msg):
         self.mainwindow.udsLogPlainTextEdit.appendPlainText(msg)
@@ -92,11 +93,22 @@ class UDSHandler(QObject):
 
     @Slot(object, object)
     def onSelectedNodeChanged(self, prev_node, new_node):
-        if new_node["version"] != "2":
+        # uds needs an open connection to a v2 canbadger, a node seen for the first time is not connected yet
+        # and onNodeConnected enables the gui once it is, the previous node must not be used in the meantime
+        connection = new_node.get("connection") if new_node is not None else None
+        if new_node is None or new_node["version"] != "2" or connection is None or not connection.isConnected:
+            self.selected_node = None
+            self.setEnableGui(False)
             return
 
         self.setEnableGui(True)
-        self.selected_node = new_node["connection"]
+        self.selected_node = connection
+
+    @Slot(dict)
+    def onNodeConnected(self, node):
+        selected = self.mainwindow.selectedNode
+        if selected is not None and node["id"] == selected["id"]:
+            self.onSelectedNodeChanged(None, node)
 
 
     @Slot(int)
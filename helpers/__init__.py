@@ -1,3 +1,6 @@
 from helpers.can_parser import CanParser
 from helpers.event_processing_thread import EventProcessingThread
-from helpers.helpers import gracefullyDisconnectSignal, buttonFeedback
+from helpers.helpers import gracefullyDisconnectSignal, buttonFeedback, QueuedCall
+from helpers.deadline_queue import DeadlineQueue
+from helpers.interface_monitor import InterfaceMonitor
+from helpers.connection_pool import ConnectionPool
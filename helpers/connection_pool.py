@@ -0,0 +1,106 @@
+#####################################################################################
+# CanBadger Connection Pool                                                         #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# keeps the connections of nodes open while another node is selected, so switching between nodes
+# only changes the view and all of them keep capturing
+# a node that is not selected is parked with an idle deadline, parked nodes that are still busy (e.g. logging)
+# when their deadline passes get a new one, the others are handed out to be disconnected
+
+import time
+
+from helpers.deadline_queue import DeadlineQueue
+
+
+class ConnectionPool:
+    def __init__(self, idle_timeout: float = 300.0, clock=time.monotonic):
+        self.idle_timeout = idle_timeout  # seconds a parked connection stays open without being busy
+        self.nodes = dict()  # node id -> node of every open connection
+        self.active = None  # id of the selected node
+        self.idle = DeadlineQueue(clock=clock)  # parked node ids and their idle deadlines
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    # a new connection was established for the selected node
+    def add(self, node):
+        self.nodes[node["id"]] = node
+        self.activate(node["id"])
+
+    # select a pooled node again, returns it or None if its connection is not pooled
+    def activate(self, node_id):
+        node = self.nodes.get(node_id)
+        if node is not None:
+            self.idle.remove(node_id)
+            self.active = node_id
+        return node
+
+    # the node is not selected anymore, its connection stays open until it was idle for idle_timeout
+    def park(self, node_id) -> bool:
+        if node_id not in self.nodes:
+            return False
+        if self.active == node_id:
+            self.active = None
+        self.idle.touch(node_id, self.idle_timeout)
+        return True
+
+    def is_parked(self, node_id) -> bool:
+        return node_id in self.idle
+
+    def parked(self) -> list:
+        return [self.nodes[node_id] for node_id in self.idle.deadlines]
+
+    def remove(self, node_id):
+        self.idle.remove(node_id)
+        if self.active == node_id:
+            self.active = None
+        return self.nodes.pop(node_id, None)
+
+    def rename(self, old, new):
+        if old not in self.nodes:
+            return
+        self.nodes[new] = self.nodes.pop(old)
+        self.idle.rename(old, new)
+        if self.active == old:
+            self.active = new
+
+    # remove and return the parked nodes that were idle for too long, busy ones are kept for another period
+    def expired(self, is_busy=None) -> list:
+        nodes = []
+        for node_id in self.idle.pop_expired():
+            node = self.nodes[node_id]
+            if is_busy is not None and is_busy(node):
+                self.idle.touch(node_id, self.idle_timeout)
+                continue
+            del self.nodes[node_id]
+            nodes.append(node)
+        return nodes
+
+    # seconds until the next parked node may expire, None if no node is parked
+    def time_to_next(self) -> float:
+        return self.idle.time_to_next()
@@ -0,0 +1,112 @@
+#####################################################################################
+# CanBadger Deadline Queue                                                          #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# keeps one monotonic deadline per key and hands out the keys whose deadline passed
+# the heap holds one entry per key, touching a key only moves its deadline in the dictionary,
+# an entry that reaches the top with an outdated deadline is pushed again with the current one,
+# so a busy network of broadcasting nodes costs a dictionary write per beacon and a timer only has to
+# fire at next_deadline() instead of polling every key
+
+import heapq
+import time
+
+
+class DeadlineQueue:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.deadlines = dict()  # key -> current deadline
+        self.heap = []  # (deadline, sequence, key), every key has an entry no later than its current deadline
+        self.sequence = 0  # keeps the heap from comparing keys
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    # set the deadline of key to timeout seconds from now, returns True if it is the new earliest deadline
+    def touch(self, key, timeout: float) -> bool:
+        deadline = self.clock() + timeout
+        previous = self.deadlines.get(key)
+        self.deadlines[key] = deadline
+        if previous is not None and deadline >= previous:
+            # the heap still holds an earlier entry of the key, it is pushed again when it comes up
+            return False
+        self._push(key, deadline)
+        return self.heap[0][2] == key
+
+    def remove(self, key):
+        # the heap entry is skipped when it comes up
+        self.deadlines.pop(key, None)
+
+    def rename(self, old, new):
+        if old not in self.deadlines:
+            return
+        deadline = self.deadlines.pop(old)
+        self.deadlines[new] = deadline
+        self._push(new, deadline)
+
+    # remove and return the keys whose deadline has passed, earliest first
+    def pop_expired(self, now: float = None) -> list:
+        if now is None:
+            now = self.clock()
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self.heap)
+            current = self.deadlines.get(key)
+            if current is None or current < deadline:
+                # removed, or a newer entry of the key is in the heap
+                continue
+            if current > deadline:
+                self._push(key, current)
+                continue
+            del self.deadlines[key]
+            expired.append(key)
+        return expired
+
+    # the earliest deadline, None if there are no keys
+    def next_deadline(self) -> float:
+        while self.heap:
+            deadline, _, key = self.heap[0]
+            current = self.deadlines.get(key)
+            if current is None or current < deadline:
+                heapq.heappop(self.heap)
+            elif current > deadline:
+                heapq.heapreplace(self.heap, (current, self._next_sequence(), key))
+            else:
+                return deadline
+        return None
+
+    # seconds until the earliest deadline, None if there are no keys
+    def time_to_next(self) -> float:
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        return max(0.0, deadline - self.clock())
+
+    def _push(self, key, deadline):
+        heapq.heappush(self.heap, (deadline, self._next_sequence(), key))
+
+    def _next_sequence(self) -> int:
+        self.sequence += 1
+        return self.sequence
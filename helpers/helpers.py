@@ -40,3 +40,22 @@ def buttonFeedback(result, button):
         button.setStyleSheet("background-color: red")
 
     QTimer.singleShot(300, lambda: button.setStyleSheet(""))
+
+
+##
+# runs callables in the thread of a QObject, e.g. a connection whose socket must not be used from other threads
+# call() can be used from any thread, the signal is queued to the receiving thread
+class QueuedCall(QObject):
+    invoke = Signal(object)
+
+    def __init__(self, owner: QObject):
+        super(QueuedCall, self).__init__()
+        self.moveToThread(owner.thread())
+        self.invoke.connect(self.onInvoke, Qt.QueuedConnection)
+
+    def call(self, function):
+        self.invoke.emit(function)
+
+    @Slot(object)
+    def onInvoke(self, function):
+        function()
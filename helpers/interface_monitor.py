@@ -0,0 +1,194 @@
+#####################################################################################
+# CanBadger SocketCAN Interface Monitor                                             #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# finds socketcan interfaces without polling them: a rtnetlink socket subscribed to link notifications
+# wakes the event loop only when an interface is created, renamed or deleted
+# where netlink is not available, /sys/class/net is listed periodically and only changes are reported
+# interfaces are recognized by their hardware type ARPHRD_CAN, the name is only used when the type is unknown
+
+from PySide2.QtCore import QObject, QSocketNotifier, QTimer, Signal, Slot
+import os
+import re
+import socket
+import struct
+
+ARPHRD_CAN = 280  # if_arp.h
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 1
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+NLMSG_DONE = 3
+IFLA_IFNAME = 3
+
+nlmsghdr = struct.Struct('=IHHII')  # length, type, flags, sequence, port id
+ifinfomsg = struct.Struct('=BxHiII')  # family, device type, index, flags, change mask
+rtattr = struct.Struct('=HH')  # length, type
+
+SYS_CLASS_NET = '/sys/class/net'
+
+
+def can_filter(if_name):
+    match = re.search("[cC][aA][nN]", if_name)
+    return match is not None
+
+
+# walk the messages of one netlink datagram, returns (message type, interface index, name, device type)
+def parse_link_messages(data) -> [(int, int, str, int)]:
+    links = []
+    offset = 0
+    while offset + nlmsghdr.size <= len(data):
+        length, message_type, _, _, _ = nlmsghdr.unpack_from(data, offset)
+        if length < nlmsghdr.size or offset + length > len(data):
+            break
+        if message_type in (RTM_NEWLINK, RTM_DELLINK):
+            position = offset + nlmsghdr.size
+            _, device_type, index, _, _ = ifinfomsg.unpack_from(data, position)
+            position += ifinfomsg.size
+            name = None
+            while position + rtattr.size <= offset + length:
+                attribute_length, attribute_type = rtattr.unpack_from(data, position)
+                if attribute_length < rtattr.size:
+                    break
+                if attribute_type == IFLA_IFNAME:
+                    name = bytes(data[position + rtattr.size:position + attribute_length]).split(b'\0')[0] \
+                        .decode('ascii', 'replace')
+                position += (attribute_length + 3) & ~3
+            links.append((message_type, index, name, device_type))
+        offset += (length + 3) & ~3
+    return links
+
+
+# the can interfaces listed in /sys/class/net and their interface index, None if it can not be read
+def list_can_interfaces(path: str = SYS_CLASS_NET) -> dict:
+    interfaces = dict()
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return interfaces
+    for name in names:
+        try:
+            with open(os.path.join(path, name, 'type'), 'r') as type_file:
+                is_can = int(type_file.read().strip()) == ARPHRD_CAN
+        except (OSError, ValueError):
+            is_can = can_filter(name)
+        if not is_can:
+            continue
+        try:
+            with open(os.path.join(path, name, 'ifindex'), 'r') as index_file:
+                interfaces[name] = int(index_file.read().strip())
+        except (OSError, ValueError):
+            interfaces[name] = None
+    return interfaces
+
+
+class InterfaceMonitor(QObject):
+    interfaceAdded = Signal(str)
+    interfaceRemoved = Signal(str)
+
+    def __init__(self, parent=None, poll_interval: int = 1000, sys_path: str = SYS_CLASS_NET):
+        super(InterfaceMonitor, self).__init__(parent)
+        self.sys_path = sys_path
+        self.poll_interval = poll_interval  # ms between listings when netlink is not available
+        self.interfaces = dict()  # name -> interface index, None if the index is unknown
+        self.socket = None
+        self.notifier = None
+        self.timer = None
+
+    def start(self):
+        try:
+            self.socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            self.socket.bind((0, RTMGRP_LINK))
+            self.socket.setblocking(False)
+        except (AttributeError, OSError):
+            # no netlink on this system, fall back to listing the interfaces
+            self.socket = None
+
+        # subscribe before the first listing, so no interface is missed in between
+        self.update(list_can_interfaces(self.sys_path))
+
+        if self.socket is not None:
+            self.notifier = QSocketNotifier(self.socket.fileno(), QSocketNotifier.Read, self)
+            self.notifier.activated.connect(self.onNetlinkReadable)
+        else:
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self.onPoll)
+            self.timer.start(self.poll_interval)
+
+    def stop(self):
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.notifier = None
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+
+    # report the difference between the known interfaces and the given ones (name -> interface index)
+    def update(self, interfaces: dict):
+        for name in sorted(set(self.interfaces) - set(interfaces)):
+            del self.interfaces[name]
+            self.interfaceRemoved.emit(name)
+        for name in sorted(interfaces):
+            known = name in self.interfaces
+            self.interfaces[name] = interfaces[name]
+            if not known:
+                self.interfaceAdded.emit(name)
+
+    # apply parsed link messages, renamed interfaces are removed and added under the new name
+    def handle_links(self, links: [(int, int, str, int)]):
+        for message_type, index, name, device_type in links:
+            if device_type != ARPHRD_CAN or name is None:
+                continue
+            if message_type == RTM_DELLINK:
+                if name in self.interfaces:
+                    del self.interfaces[name]
+                    self.interfaceRemoved.emit(name)
+                continue
+
+            for known, known_index in list(self.interfaces.items()):
+                if known_index == index and known != name:
+                    del self.interfaces[known]
+                    self.interfaceRemoved.emit(known)
+            if name not in self.interfaces:
+                self.interfaceAdded.emit(name)
+            self.interfaces[name] = index
+
+    @Slot(int)
+    def onNetlinkReadable(self, fd=None):
+        while self.socket is not None:
+            try:
+                data = self.socket.recv(65536)
+            except BlockingIOError:
+                return
+            except OSError:
+                # ENOBUFS: notifications were lost, get in sync with a listing
+                self.update(list_can_interfaces(self.sys_path))
+                return
+            self.handle_links(parse_link_messages(data))
+
+    @Slot()
+    def onPoll(self):
+        self.update(list_can_interfaces(self.sys_path))
@@ -37,17 +37,14 @@ from canbadger import StatusBits
 from multiprocessing import freeze_support
 
 
-def can_filter(if_name):
-    match = re.search("[cC][aA][nN]", if_name)
-    return match is not None
-
-
 class MainWindow(QMainWindow, Ui_MainWindow):
     connectToNode = Signal(dict)
     disconnectNode = Signal(dict)
+    parkNode = Signal(dict)
     nodeIDChange = Signal(str, str)
     selectedNodeChanged = Signal(object, dict)
     socketCanDiscovered = Signal(str)
+    socketCanRemoved = Signal(str)
     exiting = Signal()
     mainInitDone = Signal()
 
@@ -73,8 +70,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.replayHandler = ReplayHandler(self, self.nodeHandler)
         self.settingsHandler = SettingsHandler(self, self.nodeHandler)
 
-        # timer to check for socket can interfaces
-        self.can_check_timer = QTimer(self)
+        # reports socket can interfaces when they are added or removed
+        self.interfaceMonitor = InterfaceMonitor(self)
 
         self.connectSignals()
         self.show()
@@ -83,7 +80,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.selectionFlag = False  # signals that a disconnect was caused by a different selection
 
         if platform.system() == "Linux":  # socket can only available on linux
-            self.can_check_timer.start(500)
+            self.interfaceMonitor.start()
         self.mainInitDone.emit()
 
     def connectSignals(self):
@@ -98,8 +95,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # connect 'command' signals
         self.connectToNode.connect(self.nodeHandler.onConnectToNode)
         self.disconnectNode.connect(self.nodeHandler.onDisconnectNode)
+        self.parkNode.connect(self.nodeHandler.onParkNode)
         self.nodeIDChange.connect(self.nodeHandler.onIDChange)
         self.socketCanDiscovered.connect(self.nodeHandler.onSocketCanDiscovered)
+        self.socketCanRemoved.connect(self.nodeHandler.onSocketCanRemoved)
 
         # connect main functions to node handler signals
         self.nodeHandler.newNodeDiscovered.connect(self.onNewNodeDiscovered)
@@ -123,18 +122,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.replayHandler.connect_signals()
         self.settingsHandler.connect_signals()
 
-        # connect timer to check for socket can interfaces
-        self.can_check_timer.timeout.connect(self.check_socket_can)
-
-    @Slot()
-    def check_socket_can(self):
-        interfaces = list()
-        for line in open('/proc/net/dev', 'r'):
-            if ':' in line:
-                interfaces.append(line.split(':')[0].strip())
-        interfaces = list(filter(can_filter, interfaces))
-        for vcan in interfaces:
-            self.socketCanDiscovered.emit(vcan)
+        # forward socket can interface changes to the node handler
+        self.interfaceMonitor.interfaceAdded.connect(self.socketCanDiscovered)
+        self.interfaceMonitor.interfaceRemoved.connect(self.socketCanRemoved)
+        self.exiting.connect(self.interfaceMonitor.stop)
 
 
     @Slot(int)
@@ -156,16 +147,25 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         prev_node = self.selectedNode
         self.selectedNode = node
 
-        # switch sd_handler model to a new one on new connection
-        self.sdHandler.fileModel = SD_FS_Model(self.sdHandler.fileBrowser)
-        self.sdHandler.fileBrowser.setModel(self.sdHandler.fileModel)
+        # stop sd actions on the old node and switch sd_handler to the sd tree of the new node
+        if prev_node is not None:
+            self.sdHandler.onNodeParked(prev_node)
+        self.sdHandler.showNodeTree(node)
         self.sdHandler.busy = False
 
-        # we want to disconnect from the old node
+        # let the handlers swap their per node state
+        if node is not None:
+            self.selectedNodeChanged.emit(prev_node, node)
+
+        # an open connection to the old node is kept in the pool, so switching back is instant
         if prev_node is not None:
-            if self.selectedNode is not None:
-                self.selectionFlag = True  # set selectionFlag on connection change
-            self.disconnectNode.emit(prev_node)
+            if node is not None and prev_node.get("connection") is not None and prev_node["connection"].isConnected:
+                self.resetNodeDisplays()
+                self.parkNode.emit(prev_node)
+            else:
+                if self.selectedNode is not None:
+                    self.selectionFlag = True  # set selectionFlag on connection change
+                self.disconnectNode.emit(prev_node)
 
         # connect to the newly selected interface
         if node is not None:
@@ -189,6 +189,27 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     @Slot(dict)
     def onNodeDisconnected(self, node):
+        # go through all items, find the matching one and remove it
+        if node["version"] != "socket_can":
+            row = self.interfaceSelection.findText("%s:%s" % (node["id"], node["ip"]), Qt.MatchContains)
+        else:
+            row = self.interfaceSelection.findText("%s:%s" % (node["id"], "SocketCan"), Qt.MatchContains)
+
+        # a pooled connection closing in the background does not touch the displays of the selected node
+        if self.selectedNode is not None and node["id"] != self.selectedNode["id"]:
+            self.interfaceSelection.removeItem(row)
+            self.selectionFlag = False
+            return
+
+        # if we dont connect to a new node and only disconnected, change to None
+        if not self.selectionFlag and self.interfaceSelection.currentText() != "None":
+            self.interfaceSelection.setCurrentIndex(self.interfaceSelection.findText("None", Qt.MatchExactly))
+        self.selectionFlag = False
+
+        self.interfaceSelection.removeItem(row)
+        self.resetNodeDisplays()
+
+    def resetNodeDisplays(self):
         # disconnect settings displays from change functions
         gracefullyDisconnectSignal(self.enableCAN1Checkbox.stateChanged)
         gracefullyDisconnectSignal(self.enableCAN2Checkbox.stateChanged)
@@ -198,19 +219,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         gracefullyDisconnectSignal(self.CAN2SpeedSelection.activated)
 
         # reset all displays
-        if node["version"] != "socket_can":
-            row = self.interfaceSelection.findText("%s:%s" % (node["id"], node["ip"]), Qt.MatchContains)
-        else:
-            row = self.interfaceSelection.findText("%s:%s" % (node["id"], "SocketCan"), Qt.MatchContains)
         self.resetBtn.setEnabled(False)
 
-        # if we dont connect to a new node and only disconnected, change to None
-        if not self.selectionFlag and self.interfaceSelection.currentText() != "None":
-            self.interfaceSelection.setCurrentIndex(self.interfaceSelection.findText("None", Qt.MatchExactly))
-        self.selectionFlag = False
-
         # reset settings displays
-        self.interfaceSelection.removeItem(row)
         self.nodeIdLineEdit.setText("")
         self.enableBRIDGE1Checkbox.setChecked(False)
         self.enableBRIDGE2Checkbox.setChecked(False)
@@ -229,12 +240,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def onNodeConnected(self, node):
         self.nodeIdLineEdit.setText(node["id"])
         selected = self.interfaceSelection.currentIndex()
-        self.interfaceSelection.setItemText(selected, self.interfaceSelection.itemText(selected) + '  -  connected')
-        self.startCanLoggerBtn.setText("Start Logging")
-        self.startCanLoggerBtn.clicked.disconnect()
-        self.startCanLoggerBtn.clicked.connect(self.canLogger.onStartCanLogger)
+        if not self.interfaceSelection.itemText(selected).endswith('  -  connected'):
+            self.interfaceSelection.setItemText(selected, self.interfaceSelection.itemText(selected) + '  -  connected')
+        self.canLogger.updateStartButton(node)
         self.resetBtn.setEnabled(True)
 
+        # a pooled node already sent its settings
+        if node.get("settings") is not None:
+            self.showSettings(node["settings"])
+
         # hide settings elements when using socketCan
         if node["version"] == "socket_can":
             self.canSettingsGrpBox.hide()
@@ -282,9 +296,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if len(msg_data[speeds_start:]) != 6*4:
             return  # rest of the message is wrong length
 
-        # display the recieved settings to the user
+        # keep the settings for the current node and display them to the user
+        self.selectedNode["settings"] = struct.unpack('<IIIIII', msg_data[speeds_start:])
         self.nodeIdLineEdit.setText(self.selectedNode["id"])
-        settings, spi_speed, can1speed, can2speed, kl1spd, kl2spd = struct.unpack('<IIIIII', msg_data[speeds_start:])
+        self.showSettings(self.selectedNode["settings"])
+
+    def showSettings(self, node_settings):
+        settings, spi_speed, can1speed, can2speed, kl1spd, kl2spd = node_settings
         self.CAN1SpeedSelection.setCurrentIndex(self.CAN1SpeedSelection.findText("%d" % can1speed, Qt.MatchContains))
         self.CAN2SpeedSelection.setCurrentIndex(self.CAN2SpeedSelection.findText("%d" % can2speed, Qt.MatchContains))
         self.CAN1SpeedSelection.removeItem(self.CAN1SpeedSelection.findText("", Qt.MatchExactly))
@@ -295,9 +313,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.enableBRIDGE1Checkbox.setChecked((settings >> StatusBits.CAN1_TO_CAN2_BRIDGE) % 2)
         self.enableBRIDGE2Checkbox.setChecked((settings >> StatusBits.CAN2_TO_CAN1_BRIDGE) % 2)
 
-        # keep the settings for the current node
-        self.selectedNode["settings"] = (settings, spi_speed, can1speed, can2speed, kl1spd, kl2spd)
-
         # connect the inputs so setting changes can be handled
         self.enableCAN1Checkbox.stateChanged.connect(self.onSettingsChange)
         self.enableCAN2Checkbox.stateChanged.connect(self.onSettingsChange)
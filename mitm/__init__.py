@@ -0,0 +1,6 @@
+from mitm.mitm_rule import MitmRule, MitmRuleTable, RULE_TYPES, COND_TYPES
+from mitm.mitm_gateway import MitmGateway
+from mitm.rule_compiler import CompiledRules, compile_rules, compile_rows, format_rule_line, parse_rule_line, \
+    read_rule_file
+from mitm.rule_simulation import SimulationResult, simulate_rules, simulate_frames
+from mitm.rule_analysis import RuleAnalysis, RuleIssue, analyze_rules
@@ -0,0 +1,145 @@
+#####################################################################################
+# CanBadger MITM Gateway                                                            #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# host side mitm between two socketcan interfaces, for benches without a canbadger
+# every frame received on one interface is run through the rule table and written to the other one
+# runs in a worker thread with blocking sockets, so a frame only waits for the rule lookup and one send
+
+import errno
+import select
+import socket
+import threading
+import time
+
+from mitm.mitm_rule import MitmRuleTable
+from replay.socketcan_replay import can_frame
+
+# error frames are reported by the driver and never forwarded
+CAN_ERR_FLAG = 0x20000000
+
+
+class MitmGateway(threading.Thread):
+    def __init__(self, interface_a: str, interface_b: str, rules: MitmRuleTable, sockets: tuple = None):
+        super().__init__(daemon=True)
+        self.interfaces = (interface_a, interface_b)
+        self.rules = rules  # applied in both directions
+        self.sockets = sockets
+
+        # per direction: 0 is a -> b, 1 is b -> a
+        self.forwarded = [0, 0]
+        self.modified = [0, 0]
+        self.dropped = [0, 0]
+        self.retries = 0  # sends repeated because the tx queue of the interface was full
+
+        # time from receiving a frame to having it sent, in seconds
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_sockets = self.sockets is None
+        try:
+            if own_sockets:
+                self.sockets = tuple(self.open_socket(interface) for interface in self.interfaces)
+            self.bridge()
+        except OSError as e:
+            self.error = e
+        finally:
+            if own_sockets and self.sockets is not None:
+                for raw_socket in self.sockets:
+                    raw_socket.close()
+
+    @staticmethod
+    def open_socket(interface: str):
+        raw_socket = socket.socket(socket.PF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+        raw_socket.bind((interface,))
+        return raw_socket
+
+    def bridge(self):
+        poller = select.poll()
+        direction_of = dict()
+        for direction, raw_socket in enumerate(self.sockets):
+            poller.register(raw_socket, select.POLLIN)
+            direction_of[raw_socket.fileno()] = direction
+
+        while not self._stop_event.is_set():
+            # the timeout only bounds how long stop() takes
+            for fd, _ in poller.poll(100):
+                direction = direction_of[fd]
+                frame = self.sockets[direction].recv(can_frame.size)
+                self.forward(direction, frame)
+
+    def forward(self, direction: int, frame: bytes):
+        received = time.perf_counter()
+        can_id, length, data = can_frame.unpack(frame)
+        if can_id & CAN_ERR_FLAG:
+            return
+
+        # remote requests carry no payload to change and are forwarded as they are
+        if not can_id & socket.CAN_RTR_FLAG:
+            payload = data[:length]
+            result = self.rules.process(can_id & socket.CAN_EFF_MASK, payload)
+            if result is None:
+                self.dropped[direction] += 1
+                return
+            if result != payload:
+                self.modified[direction] += 1
+                frame = can_frame.pack(can_id, length, result)
+
+        self.write(self.sockets[1 - direction], frame)
+        self.forwarded[direction] += 1
+        latency = time.perf_counter() - received
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    # raw can sockets do not block on a full tx queue but fail with ENOBUFS, wait a little and retry
+    def write(self, raw_socket, frame: bytes):
+        while True:
+            try:
+                raw_socket.send(frame)
+                return
+            except OSError as e:
+                if e.errno != errno.ENOBUFS or self._stop_event.is_set():
+                    raise
+                self.retries += 1
+                time.sleep(0.00005)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def mean_latency(self) -> float:
+        forwarded = sum(self.forwarded)
+        return self.latency_total / forwarded if forwarded else 0.0
+
+    def summary(self) -> str:
+        a, b = self.interfaces
+        if self.error is not None:
+            return "MITM gateway {} <-> {} failed: {}".format(a, b, self.error)
+        return "MITM {} -> {}: {} forwarded, {} modified, {} dropped | {} -> {}: {} forwarded, {} modified, " \
+               "{} dropped | latency mean {:.1f} us, max {:.1f} us".format(
+                   a, b, self.forwarded[0], self.modified[0], self.dropped[0],
+                   b, a, self.forwarded[1], self.modified[1], self.dropped[1],
+                   self.mean_latency() * 1e6, self.latency_max * 1e6)
@@ -0,0 +1,151 @@
+#####################################################################################
+# CanBadger MITM Rule                                                               #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# the mitm rules of the rule table, usable outside of the canbadger firmware
+# rows come from the MITMTableModel: [rule type, condition, target id, cond value, cond mask, argument, action mask]
+# values are hex strings, masks are strings of '0'/'1' where the n-th character selects the n-th payload byte
+# like on the badger, the first rule of an id whose condition matches is applied, byte arithmetic wraps (uint8)
+
+RULE_TYPES = ["Swap Payload", "Swap Specific Bytes", "Add fixed Value to specific bytes",
+              "Substract fixed Value from specific bytes", "Multiply specific bytes", "Divide specific bytes",
+              "Increase specific bytes by fixed percentage", "Decrease specific bytes by fixed percentage",
+              "Drop Frame"]
+COND_TYPES = ["Entire payload matches", "Specific bytes match",
+              "Specific bytes are greater", "Specific bytes are less"]
+
+# indices into RULE_TYPES and COND_TYPES
+SWAP_PAYLOAD, SWAP_BYTES, ADD, SUBTRACT, MULTIPLY, DIVIDE, INCREASE_PERCENT, DECREASE_PERCENT, DROP = range(9)
+PAYLOAD_MATCHES, BYTES_MATCH, BYTES_GREATER, BYTES_LESS = range(4)
+
+
+def parse_hex_bytes(text) -> bytes:
+    # values may be QByteArrays or odd length strings while they are edited
+    text = str(text).strip()
+    if len(text) % 2:
+        text = text[:-1]
+    return bytes.fromhex(text)[:8]
+
+
+def parse_mask(text) -> tuple:
+    return tuple(i for i, char in enumerate(str(text)[:8]) if char == '1')
+
+
+def _wrap(value: int) -> int:
+    return value & 0xFF
+
+
+# byte operations for the arithmetic rule types, taking payload byte and argument byte
+_OPERATIONS = {
+    SWAP_BYTES: lambda value, argument: argument,
+    ADD: lambda value, argument: _wrap(value + argument),
+    SUBTRACT: lambda value, argument: _wrap(value - argument),
+    MULTIPLY: lambda value, argument: _wrap(value * argument),
+    DIVIDE: lambda value, argument: value // argument if argument else value,
+    INCREASE_PERCENT: lambda value, argument: _wrap(value * (100 + argument) // 100),
+    DECREASE_PERCENT: lambda value, argument: max(0, value * (100 - argument) // 100),
+}
+
+
+class MitmRule:
+    __slots__ = ('rule_type', 'condition', 'target_id', 'cond_value', 'cond_mask', 'argument', 'action_mask',
+                 'hits', '_operation')
+
+    def __init__(self, rule_type: int, condition: int, target_id: int, cond_value: bytes = b'',
+                 cond_mask: tuple = (), argument: bytes = b'', action_mask: tuple = ()):
+        self.rule_type = rule_type
+        self.condition = condition
+        self.target_id = target_id
+        # values are padded to the 8 bytes the badger works on
+        self.cond_value = bytes(cond_value).ljust(8, b'\0')
+        self.cond_mask = tuple(cond_mask)
+        self.argument = bytes(argument).ljust(8, b'\0')
+        self.action_mask = tuple(action_mask)
+        self.hits = 0  # frames this rule has been applied to
+        self._operation = _OPERATIONS.get(rule_type)
+
+    @classmethod
+    def from_row(cls, row: list):
+        target_id = str(row[2]).strip()
+        return cls(RULE_TYPES.index(row[0]), COND_TYPES.index(row[1]), int(target_id, 16) if target_id else 0,
+                   parse_hex_bytes(row[3]), parse_mask(row[4]), parse_hex_bytes(row[5]), parse_mask(row[6]))
+
+    def to_row(self) -> list:
+        return [RULE_TYPES[self.rule_type], COND_TYPES[self.condition], "{:X}".format(self.target_id),
+                self.cond_value.hex().upper(), ''.join('1' if i in self.cond_mask else '0' for i in range(8)),
+                self.argument.hex().upper(), ''.join('1' if i in self.action_mask else '0' for i in range(8))]
+
+    def matches(self, payload: bytes) -> bool:
+        if self.condition == PAYLOAD_MATCHES:
+            return payload.ljust(8, b'\0') == self.cond_value
+        # masked bytes behind the end of the payload never match
+        length = len(payload)
+        cond_value = self.cond_value
+        if self.condition == BYTES_MATCH:
+            return all(i < length and payload[i] == cond_value[i] for i in self.cond_mask)
+        if self.condition == BYTES_GREATER:
+            return all(i < length and payload[i] > cond_value[i] for i in self.cond_mask)
+        return all(i < length and payload[i] < cond_value[i] for i in self.cond_mask)
+
+    # returns the new payload or None if the frame is dropped, the length of the frame is kept
+    def apply(self, payload: bytes):
+        if self.rule_type == DROP:
+            return None
+        if self.rule_type == SWAP_PAYLOAD:
+            return self.argument[:len(payload)]
+        data = bytearray(payload)
+        length = len(data)
+        for i in self.action_mask:
+            if i < length:
+                data[i] = self._operation(data[i], self.argument[i])
+        return bytes(data)
+
+
+# rules grouped by target id, so a frame costs one dict lookup no matter how many rules are loaded
+class MitmRuleTable:
+    def __init__(self, rules: [MitmRule] = ()):
+        self.rules = []
+        self.by_id = dict()  # frame id -> tuple of rules in table order
+        for rule in rules:
+            self.add(rule)
+
+    @classmethod
+    def from_rows(cls, rows: [list]):
+        return cls(MitmRule.from_row(row) for row in rows)
+
+    def add(self, rule: MitmRule):
+        self.rules.append(rule)
+        self.by_id[rule.target_id] = self.by_id.get(rule.target_id, ()) + (rule,)
+
+    def __len__(self):
+        return len(self.rules)
+
+    # returns the payload to forward (unchanged if no rule matched) or None for dropped frames
+    def process(self, frame_id: int, payload: bytes):
+        rules = self.by_id.get(frame_id)
+        if rules is None:
+            return payload
+        for rule in rules:
+            if rule.matches(payload):
+                rule.hits += 1
+                return rule.apply(payload)
+        return payload
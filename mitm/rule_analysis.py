@@ -0,0 +1,171 @@
+#####################################################################################
+# CanBadger MITM Rule Analysis                                                      #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# static checks of a rule list, the badger applies the first rule of an id whose condition matches
+# every condition is described as a box: a minimum payload length and a range of allowed values per byte,
+# so two rules can be compared without any frames:
+#   unreachable - the condition can never be true
+#   shadowed    - an earlier rule of the same id matches every frame this rule would match
+#   overlapping - an earlier rule with another action takes part of the frames of this rule
+# the worst case number of rules evaluated for a frame of an id bounds the per-frame mitm latency
+
+from collections import namedtuple
+
+from mitm.mitm_rule import MitmRule, PAYLOAD_MATCHES, BYTES_MATCH, BYTES_GREATER
+from mitm.rule_compiler import rule_key
+
+RuleIssue = namedtuple('RuleIssue', ['kind', 'rule', 'other', 'message'])  # rule/other are positions in the list
+
+UNREACHABLE = 'unreachable'
+SHADOWED = 'shadowed'
+OVERLAPPING = 'overlapping'
+
+# minimum payload length and the inclusive value range of every byte
+ConditionBox = namedtuple('ConditionBox', ['min_length', 'lows', 'highs'])
+
+
+# returns None for conditions no payload can fulfill
+def condition_box(rule: MitmRule):
+    if rule.condition == PAYLOAD_MATCHES:
+        # bytes behind the payload compare as zero, so the payload has to reach the last non zero byte
+        used = [i for i, value in enumerate(rule.cond_value) if value]
+        return ConditionBox(used[-1] + 1 if used else 0, tuple(rule.cond_value), tuple(rule.cond_value))
+
+    min_length = 0
+    lows = [0] * 8
+    highs = [255] * 8
+    for i in rule.cond_mask:
+        min_length = max(min_length, i + 1)
+        value = rule.cond_value[i]
+        if rule.condition == BYTES_MATCH:
+            lows[i] = highs[i] = value
+        elif rule.condition == BYTES_GREATER:
+            lows[i] = value + 1
+        else:
+            highs[i] = value - 1
+        if lows[i] > highs[i]:
+            return None
+    return ConditionBox(min_length, tuple(lows), tuple(highs))
+
+
+# every payload inside b is inside a
+def box_covers(a: ConditionBox, b: ConditionBox) -> bool:
+    return a.min_length <= b.min_length and all(a_low <= b_low and b_high <= a_high for a_low, a_high, b_low, b_high
+                                                in zip(a.lows, a.highs, b.lows, b.highs))
+
+
+# some payload is inside both, a full length payload fulfills the length of both
+def box_intersects(a: ConditionBox, b: ConditionBox) -> bool:
+    return all(max(a_low, b_low) <= min(a_high, b_high) for a_low, a_high, b_low, b_high
+               in zip(a.lows, a.highs, b.lows, b.highs))
+
+
+def is_unconditional(box: ConditionBox) -> bool:
+    return box.min_length == 0 and all(low == 0 and high == 255 for low, high in zip(box.lows, box.highs))
+
+
+class RuleAnalysis:
+    def __init__(self, rules: [MitmRule]):
+        self.rules = list(rules)
+        self.issues = []
+        self.worst_case = dict()  # frame id -> rules evaluated for a frame of this id in the worst case
+
+        by_id = dict()
+        for position, rule in enumerate(self.rules):
+            by_id.setdefault(rule.target_id, []).append(position)
+        for frame_id, positions in by_id.items():
+            self.analyze_id(frame_id, positions)
+        self.issues.sort(key=lambda issue: issue.rule)
+
+    def analyze_id(self, frame_id: int, positions: [int]):
+        boxes = dict()
+        # exact byte matches are indexed by condition mask and masked value, rules with the same mask
+        # and other values can never match the same frame and are not compared pairwise
+        exact = dict()
+        reachable = []  # positions of earlier rules that can still match
+        worst_case = len(positions)
+
+        for count, position in enumerate(positions):
+            rule = self.rules[position]
+            box = condition_box(rule)
+            if box is None:
+                self.issues.append(RuleIssue(UNREACHABLE, position, None, "Rule {} can never match".format(
+                    position + 1)))
+                continue
+
+            key = None
+            if rule.condition == BYTES_MATCH and rule.cond_mask:
+                key = (rule.cond_mask, bytes(rule.cond_value[i] for i in rule.cond_mask))
+                if key in exact:
+                    self.issues.append(RuleIssue(SHADOWED, position, exact[key], "Rule {} is shadowed by rule {} "
+                                                 "with the same condition".format(position + 1, exact[key] + 1)))
+                    continue
+
+            shadowed = False
+            for other in reachable:
+                other_rule = self.rules[other]
+                if key is not None and other_rule.condition == BYTES_MATCH and other_rule.cond_mask == rule.cond_mask:
+                    continue
+                other_box = boxes[other]
+                if box_covers(other_box, box):
+                    self.issues.append(RuleIssue(SHADOWED, position, other, "Rule {} is shadowed by rule {}".format(
+                        position + 1, other + 1)))
+                    shadowed = True
+                    break
+                if box_intersects(other_box, box) and rule_key(other_rule)[4:] != rule_key(rule)[4:]:
+                    self.issues.append(RuleIssue(OVERLAPPING, position, other, "Rule {} overlaps with rule {}, "
+                                                 "frames matching both get the action of rule {}".format(
+                                                     position + 1, other + 1, other + 1)))
+            if shadowed:
+                continue
+
+            boxes[position] = box
+            reachable.append(position)
+            if key is not None:
+                exact[key] = position
+            # nothing behind a rule that matches every frame of the id is ever evaluated
+            if is_unconditional(box):
+                worst_case = count + 1
+                for later in positions[count + 1:]:
+                    self.issues.append(RuleIssue(SHADOWED, later, position, "Rule {} is shadowed by rule {} which "
+                                                 "matches every frame of {:X}".format(later + 1, position + 1,
+                                                                                      frame_id)))
+                break
+        self.worst_case[frame_id] = worst_case
+
+    def issues_of_kind(self, kind: str) -> [RuleIssue]:
+        return [issue for issue in self.issues if issue.kind == kind]
+
+    def max_worst_case(self) -> int:
+        return max(self.worst_case.values(), default=0)
+
+    def summary(self) -> str:
+        lines = ["{} rules for {} ids: {} unreachable, {} shadowed, {} overlapping, at most {} rules per frame".format(
+            len(self.rules), len(self.worst_case), len(self.issues_of_kind(UNREACHABLE)),
+            len(self.issues_of_kind(SHADOWED)), len(self.issues_of_kind(OVERLAPPING)), self.max_worst_case())]
+        lines += [issue.message for issue in self.issues]
+        return "\n".join(lines)
+
+
+def analyze_rules(rules: [MitmRule]) -> RuleAnalysis:
+    return RuleAnalysis(rules)
@@ -0,0 +1,158 @@
+#####################################################################################
+# CanBadger MITM Rule Compiler                                                      #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# turns the rows of the rule table into checked, deduplicated rules
+# the result is written as the badgers ascii rule lines, for rule files and the ADD_RULE transfer
+
+from exceptions import InvalidRuleException
+from mitm.mitm_rule import MitmRule, MitmRuleTable, RULE_TYPES, COND_TYPES, SWAP_PAYLOAD, SWAP_BYTES, DIVIDE, \
+    DROP, PAYLOAD_MATCHES
+
+MAX_FRAME_ID = 0x1FFFFFFF
+
+
+def mask_bits(mask: tuple) -> int:
+    return sum(1 << i for i in mask)
+
+
+def mask_from_bits(bits: int) -> tuple:
+    return tuple(i for i in range(8) if bits >> i & 1)
+
+
+def _masked(value: bytes, mask: tuple) -> bytes:
+    return bytes(value[i] if i in mask else 0 for i in range(8))
+
+
+# rules that behave the same get the same key, bytes outside of the masks do not matter
+def rule_key(rule: MitmRule) -> tuple:
+    if rule.condition == PAYLOAD_MATCHES:
+        condition = (rule.condition, (), rule.cond_value)
+    else:
+        condition = (rule.condition, rule.cond_mask, _masked(rule.cond_value, rule.cond_mask))
+    if rule.rule_type == DROP:
+        action = (rule.rule_type, (), b'')
+    elif rule.rule_type == SWAP_PAYLOAD:
+        action = (rule.rule_type, (), rule.argument)
+    else:
+        action = (rule.rule_type, rule.action_mask, _masked(rule.argument, rule.action_mask))
+    return (rule.target_id,) + condition + action
+
+
+# the line format read by the badger, the same as in rule files on the sd:
+# masks are written lsb first followed by the type, all values as comma separated byte pairs
+def format_rule_line(rule: MitmRule) -> str:
+    values = [
+        "{:02x}0{}".format(mask_bits(rule.cond_mask), rule.condition),
+        "{:X}".format(rule.target_id),
+    ]
+    values += ["{:02X}".format(b) for b in rule.cond_value]
+    values.append("{:02x}0{}".format(mask_bits(rule.action_mask), rule.rule_type))
+    values += ["{:02X}".format(b) for b in rule.argument]
+    return ','.join(values)
+
+
+# counterpart of format_rule_line, raises ValueError for lines that are no rule
+def parse_rule_line(line: str) -> MitmRule:
+    values = [value.strip() for value in line.split(',')]
+    if len(values) != 19:
+        raise ValueError("a rule line has 19 values")
+    if int(values[10][2:], 16) >= len(RULE_TYPES) or int(values[0][2:], 16) >= len(COND_TYPES):
+        raise ValueError("unknown rule type or condition")
+    return MitmRule(int(values[10][2:], 16), int(values[0][2:], 16), int(values[1], 16),
+                    bytes(int(value, 16) for value in values[2:10]), mask_from_bits(int(values[0][:2], 16)),
+                    bytes(int(value, 16) for value in values[11:19]), mask_from_bits(int(values[10][:2], 16)))
+
+
+# rules of a rule file, lines that are no rule are skipped like on the badger
+def read_rule_file(path: str) -> [MitmRule]:
+    rules = []
+    with open(path, 'r') as infile:
+        for line in infile:
+            try:
+                rules.append(parse_rule_line(line))
+            except ValueError:
+                continue
+    return rules
+
+
+# raises InvalidRuleException for rules the badger can not execute, returns warnings for rules without effect
+def validate_rule(row: int, rule: MitmRule) -> [str]:
+    if not 0 <= rule.target_id <= MAX_FRAME_ID:
+        raise InvalidRuleException(row, "target id {:X} is not a valid can id".format(rule.target_id))
+    if not 0 <= rule.rule_type < len(RULE_TYPES) or not 0 <= rule.condition < len(COND_TYPES):
+        raise InvalidRuleException(row, "unknown rule type or condition")
+    if rule.rule_type == DIVIDE and any(rule.argument[i] == 0 for i in rule.action_mask):
+        raise InvalidRuleException(row, "division by zero")
+
+    warnings = []
+    if rule.rule_type not in (SWAP_PAYLOAD, DROP) and not rule.action_mask:
+        warnings.append("Rule {}: no bytes selected in the action mask, the rule has no effect".format(row + 1))
+    return warnings
+
+
+class CompiledRules:
+    def __init__(self, rules: [MitmRule], duplicates: int = 0, warnings: [str] = None):
+        self.rules = rules
+        self.duplicates = duplicates  # rules left out because an identical rule comes first
+        self.warnings = warnings if warnings is not None else []
+
+    def __len__(self):
+        return len(self.rules)
+
+    def lines(self) -> [str]:
+        return [format_rule_line(rule) for rule in self.rules]
+
+    # ADD_RULE payloads, one zero terminated rule line each, the badger takes exactly one rule per message
+    # and receives into a 135 byte buffer, a rule line is at most 66 characters
+    def messages(self) -> [bytes]:
+        return [line.encode('ascii') + b'\0' for line in self.lines()]
+
+    def to_table(self) -> MitmRuleTable:
+        return MitmRuleTable(self.rules)
+
+
+def compile_rules(rules: [MitmRule]) -> CompiledRules:
+    compiled = []
+    seen = set()
+    duplicates = 0
+    warnings = []
+    for row, rule in enumerate(rules):
+        warnings += validate_rule(row, rule)
+        key = rule_key(rule)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        compiled.append(rule)
+    return CompiledRules(compiled, duplicates, warnings)
+
+
+# compile the rows of a MITMTableModel
+def compile_rows(rows: [list]) -> CompiledRules:
+    rules = []
+    for row, values in enumerate(rows):
+        try:
+            rules.append(MitmRule.from_row(values))
+        except ValueError as e:
+            raise InvalidRuleException(row, str(e))
+    return compile_rules(rules)
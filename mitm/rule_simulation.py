@@ -0,0 +1,181 @@
+#####################################################################################
+# CanBadger MITM Rule Simulation                                                    #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# runs a rule set over a recorded capture instead of a car, to see what the rules would do
+# the capture is converted to numpy arrays once and sorted by id, then every rule is evaluated
+# on all frames of its id at once, in table order, so only the first matching rule applies like on the badger
+
+import numpy as np
+
+from datatypes.can_frame import CanFrame, CanFormat
+from analysis.capture_diff import CaptureArrays
+from mitm.mitm_rule import MitmRule, MitmRuleTable, SWAP_PAYLOAD, SWAP_BYTES, ADD, SUBTRACT, MULTIPLY, DIVIDE, \
+    INCREASE_PERCENT, DECREASE_PERCENT, DROP, PAYLOAD_MATCHES, BYTES_MATCH, BYTES_GREATER
+
+RULE_BYTES = 8  # rules work on the first 8 payload bytes
+
+
+def condition_matches(rule: MitmRule, payloads: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    if rule.condition == PAYLOAD_MATCHES:
+        value = np.frombuffer(rule.cond_value, dtype=np.uint8)
+        return (payloads[:, :RULE_BYTES] == value).all(axis=1) & (lengths <= RULE_BYTES)
+
+    matches = np.ones(len(payloads), dtype=bool)
+    for i in rule.cond_mask:
+        column = payloads[:, i]
+        value = rule.cond_value[i]
+        if rule.condition == BYTES_MATCH:
+            matches &= column == value
+        elif rule.condition == BYTES_GREATER:
+            matches &= column > value
+        else:
+            matches &= column < value
+        # masked bytes behind the end of the payload never match
+        matches &= lengths > i
+    return matches
+
+
+# returns the new payloads of the given frames, same semantics as MitmRule.apply (without DROP)
+def apply_action(rule: MitmRule, payloads: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    payloads = payloads.copy()
+    if rule.rule_type == SWAP_PAYLOAD:
+        argument = np.frombuffer(rule.argument, dtype=np.uint8)
+        inside = np.arange(RULE_BYTES)[np.newaxis, :] < lengths[:, np.newaxis]
+        payloads[:, :RULE_BYTES] = np.where(inside, argument, 0)
+        return payloads
+
+    for i in rule.action_mask:
+        inside = lengths > i
+        value = payloads[:, i].astype(np.int64)
+        argument = rule.argument[i]
+        if rule.rule_type == SWAP_BYTES:
+            value = np.full_like(value, argument)
+        elif rule.rule_type == ADD:
+            value = value + argument
+        elif rule.rule_type == SUBTRACT:
+            value = value - argument
+        elif rule.rule_type == MULTIPLY:
+            value = value * argument
+        elif rule.rule_type == DIVIDE:
+            value = value // argument if argument else value
+        elif rule.rule_type == INCREASE_PERCENT:
+            value = value * (100 + argument) // 100
+        elif rule.rule_type == DECREASE_PERCENT:
+            value = np.maximum(0, value * (100 - argument) // 100)
+        payloads[:, i] = np.where(inside, value & 0xFF, payloads[:, i])
+    return payloads
+
+
+class SimulationResult:
+    def __init__(self, capture: CaptureArrays, payloads: np.ndarray, dropped: np.ndarray, modified: np.ndarray,
+                 rules: [MitmRule], rule_hits: np.ndarray, source_frames: [CanFrame] = None):
+        self.capture = capture  # the input capture
+        self.source_frames = source_frames  # the input frames, keep interface and format for the output
+        self.payloads = payloads  # payloads after the rules, in capture order
+        self.dropped = dropped  # per frame
+        self.modified = modified  # per frame, dropped frames are not counted as modified
+        self.rules = rules
+        self.rule_hits = rule_hits  # frames every rule was applied to, in rule order
+
+    def __len__(self):
+        return len(self.capture)
+
+    def dropped_count(self) -> int:
+        return int(self.dropped.sum())
+
+    def modified_count(self) -> int:
+        return int(self.modified.sum())
+
+    # id -> number of dropped frames
+    def dropped_by_id(self) -> dict:
+        ids, counts = np.unique(self.capture.frame_ids[self.dropped], return_counts=True)
+        return dict(zip(ids.tolist(), counts.tolist()))
+
+    # the capture as it would leave the gateway, dropped frames left out
+    def frames(self):
+        capture = self.capture
+        for index in np.flatnonzero(~self.dropped).tolist():
+            if self.source_frames is not None:
+                frame = self.source_frames[index]
+                if not self.modified[index]:
+                    yield frame
+                    continue
+                interface_number, frame_format, speed = frame.interface_number, frame.frame_format, \
+                    frame.interface_speed
+            else:
+                interface_number, speed = 1, 0
+                frame_format = CanFormat.Extended if capture.frame_ids[index] > 0x7FF else CanFormat.Standard
+            length = int(capture.lengths[index])
+            yield CanFrame(interface_number, frame_format, int(capture.timestamps[index]),
+                           int(capture.frame_ids[index]), speed, length, self.payloads[index, :length].tobytes())
+
+    def summary(self) -> str:
+        lines = ["Simulated {} rules on {} frames: {} modified, {} dropped".format(
+            len(self.rules), len(self), self.modified_count(), self.dropped_count())]
+        for number, (rule, hits) in enumerate(zip(self.rules, self.rule_hits.tolist())):
+            row = rule.to_row()
+            lines.append("Rule {} ({} on {}, {}): {} hits".format(number + 1, row[0], row[2], row[1], hits))
+        for frame_id, count in sorted(self.dropped_by_id().items()):
+            lines.append("Dropped {} frames of {:X}".format(count, frame_id))
+        return "\n".join(lines)
+
+
+def simulate_rules(rules: MitmRuleTable, capture: CaptureArrays, source_frames: [CanFrame] = None) \
+        -> SimulationResult:
+    capture = capture.widened(RULE_BYTES)
+    payloads = capture.payloads.copy()
+    dropped = np.zeros(len(capture), dtype=bool)
+    rule_hits = np.zeros(len(rules.rules), dtype=np.int64)
+    rule_number = {id(rule): number for number, rule in enumerate(rules.rules)}
+
+    # frames of one id are a contiguous slice of the stable id order
+    order = np.argsort(capture.frame_ids, kind='stable')
+    sorted_ids = capture.frame_ids[order]
+    for frame_id, id_rules in rules.by_id.items():
+        first, last = np.searchsorted(sorted_ids, [frame_id, frame_id + 1])
+        if first == last:
+            continue
+        frames = order[first:last]
+        frame_payloads = capture.payloads[frames]
+        lengths = capture.lengths[frames]
+        pending = np.ones(len(frames), dtype=bool)
+        for rule in id_rules:
+            matched = pending & condition_matches(rule, frame_payloads, lengths)
+            pending &= ~matched
+            rule_hits[rule_number[id(rule)]] = matched.sum()
+            if not matched.any():
+                continue
+            if rule.rule_type == DROP:
+                dropped[frames[matched]] = True
+            else:
+                payloads[frames[matched]] = apply_action(rule, frame_payloads[matched], lengths[matched])
+            if not pending.any():
+                break
+
+    modified = (payloads != capture.payloads).any(axis=1) & ~dropped
+    return SimulationResult(capture, payloads, dropped, modified, rules.rules, rule_hits, source_frames)
+
+
+def simulate_frames(rules: MitmRuleTable, frames: [CanFrame]) -> SimulationResult:
+    frames = list(frames)
+    return simulate_rules(rules, CaptureArrays.from_frames(frames), source_frames=frames)
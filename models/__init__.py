@@ -3,3 +3,4 @@ from models.can_logger_sort_model import CanLoggerSortModel
 from models.can_logger_table_model import CanLoggerTableModel
 from models.mitm_table_model import MITMTableModel
 from models.sd_fs_model import SD_FS_Model
+from models.signal_statistics_model import SignalStatisticsModel
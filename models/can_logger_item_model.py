@@ -26,6 +26,7 @@ from PySide2.QtGui import *
 from datatypes.can_item import CanItem, ItemType
 from datatypes.can_frame import CanFrame
 from exceptions import PointerlessIndexException
+from analysis.signal_statistics import SignalStatistics
 
 
 # compares two payloads to determine highlighting for the second one
@@ -61,6 +62,9 @@ class CanLoggerItemModel(QAbstractItemModel):
         self.sender_dict = dict()
         self.highlight_dict = dict()
 
+        # running per id statistics, updated with every added frame
+        self.statistics = SignalStatistics()
+
     # return an index for the given row/column pair and the parent element
     # this index is then used by views to access data
     def index(self, row: int, column: int, parent: QModelIndex = None) -> QModelIndex:
@@ -166,6 +170,7 @@ class CanLoggerItemModel(QAbstractItemModel):
         parent_item.append_child(item)
         # add to hashmap
         self.hash_increase(item)
+        self.statistics.add_frame(frame)
         self.endInsertRows()
 
     # retrieve the object stored in the items data at index ## TODO replace return with Union[CanFrame, CanMessage]
@@ -194,6 +199,10 @@ class CanLoggerItemModel(QAbstractItemModel):
             frames.append(item.list_representation())
         return frames
 
+    # get all frames held by the top level items
+    def get_frames(self) -> [CanFrame]:
+        return [item.get_data() for item in self.root.children]
+
     # removes all items except for the root
     # can be used together with add_frames() to achieve the table models set_frames() functionality
     # TODO affect hashmap correctly
@@ -27,10 +27,17 @@ from PySide2.QtWidgets import QFileIconProvider
 
 from datatypes import FS_Item
 
+# the tree of one sd card, items are kept in a path -> item dictionary so lookups do not walk the tree
+# rows are handed to the view lazily, a directory shows its first fetch_batch children when it is expanded
+# and more when the view scrolls to them, so listings with thousands of files stay responsive
+# a refresh updates the existing tree in place, the view keeps its expanded directories and selection
 class SD_FS_Model(QAbstractItemModel):
     def __init__(self, parent=None, *args):
         super().__init__(parent, *args)
         self.root = FS_Item("/")
+        self.items = {"/": self.root}  # full path -> FS_Item
+        self.generation = 0  # number of the current listing
+        self.fetch_batch = 256  # rows inserted into the view at once
         self.header_labels = ['Name', 'Children']
         self.icon_provider = QFileIconProvider()
 
@@ -42,8 +49,8 @@ class SD_FS_Model(QAbstractItemModel):
         else:
             parent_item = parent.internalPointer()
 
-        # check if row is valid
-        if row >= parent_item.child_count():
+        # check if row is valid, rows that were not fetched yet do not exist for the view
+        if row < 0 or row >= parent_item.fetched:
             return QModelIndex()
 
         child_item = parent_item.child(row)
@@ -75,12 +82,27 @@ class SD_FS_Model(QAbstractItemModel):
         if parent is not None and parent.column() > 0:
             return 0
 
-        if not parent or not parent.isValid():
-            parent_item = self.root
-        else:
-            parent_item = parent.internalPointer()
+        return self.item_for_index(parent).fetched
 
-        return parent_item.child_count()
+    # directories with children get an expand arrow before their rows are fetched
+    def hasChildren(self, parent: QModelIndex = None) -> bool:
+        if parent is not None and parent.column() > 0:
+            return False
+        return self.item_for_index(parent).child_count() > 0
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        item = self.item_for_index(parent)
+        return item.fetched < item.child_count()
+
+    # hand the next batch of children to the view
+    def fetchMore(self, parent: QModelIndex):
+        item = self.item_for_index(parent)
+        count = min(self.fetch_batch, item.child_count() - item.fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, item.fetched, item.fetched + count - 1)
+        item.fetched += count
+        self.endInsertRows()
 
     # returns the number of columns available for an index
     def columnCount(self, index: QModelIndex = None) -> int:
@@ -119,90 +141,128 @@ class SD_FS_Model(QAbstractItemModel):
             return self.header_labels[section]
         return QAbstractTableModel.headerData(self, section, orientation, role)
 
-    def add_item(self, index: QModelIndex, name: str, is_dir: bool):
-        # find the parent
+    def item_for_index(self, index: QModelIndex) -> FS_Item:
         if index is None or not index.isValid():
-            parent_item = self.root
-        else:
-            parent_item = index.internalPointer()
-
-        item = FS_Item(name, is_dir=is_dir, parent=parent_item)
+            return self.root
+        return index.internalPointer()
 
-        # send insert signals and append child
-        if index is not None:
-
-            self.beginInsertRows(index, parent_item.child_count(), parent_item.child_count())
-            parent_item.append_child(item)
+    # index of an item, the rows up to it are fetched first so the view knows it
+    def index_for_item(self, item: FS_Item) -> QModelIndex:
+        if item is self.root:
+            return QModelIndex()
+        parent = item.parent()
+        parent_index = self.index_for_item(parent)
+        if item.row() >= parent.fetched:
+            self.beginInsertRows(parent_index, parent.fetched, item.row())
+            parent.fetched = item.row() + 1
             self.endInsertRows()
-        else:
-            print(f"heres the bug: \n {item.name} \n {item.get_filepath()}")
+        return self.createIndex(item.row(), 0, item)
 
+    def add_item(self, index: QModelIndex, name: str, is_dir: bool):
+        if index is None:
+            print(f"no parent directory for {name}")
+            return
+        self.add_items(index, [(name, is_dir)])
+
+    # add the entries of one directory listing, entries that already exist are only marked as seen
+    def add_items(self, index: QModelIndex, entries: [(str, bool)]):
+        parent_item = self.item_for_index(index)
+        # the view only gets rows for directories it already shows completely
+        shown = parent_item.fetched == parent_item.child_count() and \
+            (parent_item is self.root or parent_item.fetched > 0)
+        old_count = parent_item.child_count()
+
+        for name, is_dir in entries:
+            item = parent_item.child_by_name(name)
+            if item is None:
+                item = FS_Item(name, is_dir=is_dir, parent=parent_item)
+                parent_item.append_child(item)
+                self.items[item.path] = item
+            item.generation = self.generation
+
+        if parent_item.child_count() == old_count:
+            return
+        if shown:
+            count = min(parent_item.child_count() - old_count, self.fetch_batch)
+            self.beginInsertRows(index, old_count, old_count + count - 1)
+            parent_item.fetched += count
+            self.endInsertRows()
+        if index is not None and index.isValid():
+            # the number of children is shown in the second column
+            self.dataChanged.emit(index, self.createIndex(index.row(), 1, parent_item))
 
     def remove_item(self, index: QModelIndex):
         # cant remove root
         if index is None or not index.isValid():
             return
-
-        # retrieve parameters fo signal call
-        parent_item = index.internalPointer().parent()
-        parent_index = self.parent(index)
-        row = index.row()
-
-        # remove child from parent
-        self.beginRemoveRows(parent_index, row, row)
-        parent_item.remove_child(row)
-        self.endRemoveRows()
-
-    def child_index_by_name(self, parent_index: QModelIndex, name: str) -> QModelIndex:
-        if not parent_index.isValid():
-            parent = self.root
+        self.remove(index.internalPointer())
+
+    def remove(self, item: FS_Item):
+        parent_item = item.parent()
+        row = item.row()
+        for removed in item.walk():
+            del self.items[removed.path]
+
+        # rows the view never fetched are removed silently
+        if row < parent_item.fetched:
+            self.beginRemoveRows(self.index_for_item(parent_item), row, row)
+            parent_item.remove_child(row)
+            self.endRemoveRows()
         else:
-            parent = parent_index.internalPointer()
+            parent_item.remove_child(row)
 
-        for child in parent.children:
-            if child.name == name:
-                return self.createIndex(child.row(), 0, child)
-        # no child has the name -> return invalid Index
-        return QModelIndex()
+    def child_index_by_name(self, parent_index: QModelIndex, name: str) -> QModelIndex:
+        child = self.item_for_index(parent_index).child_by_name(name)
+        if child is None:
+            # no child has the name -> return invalid Index
+            return QModelIndex()
+        return self.index_for_item(child)
 
-    # search through the items according to the given directory path and return index to end of path
+    # return the index of the item at the given path, None if there is no such item
     def index_for_path(self, path: str) -> QModelIndex:
         # return an invalid index for the root
         if path == "/":
             return QModelIndex()
 
-        slash1 = 0
-        slash2 = path.find("/", slash1+1)
-
-        if slash2 == -1:
-            directory = path[slash1+1:]
-        else:
-            directory = path[slash1+1:slash2]
-
-        path_end_index = self.child_index_by_name(QModelIndex(), directory)
-
-        while True:
-            if not path_end_index.isValid():
-                # subdirectory not found, return None
-                return None
-
-            # go deeper if we have a longer path
-            if slash2 != -1:
-                slash1 = slash2
-                slash2 = path.find("/", slash1+1)
-            else:
-                return path_end_index
-
-            if slash2 == -1:
-                directory = path[slash1 + 1:]
-            else:
-                directory = path[slash1 + 1:slash2]
-
-            path_end_index = self.child_index_by_name(path_end_index, directory)
+        item = self.items.get(path.rstrip("/"))
+        if item is None:
+            return None
+        return self.index_for_item(item)
+
+    # a new listing of the sd card starts, items it does not mention are removed by end_listing
+    def begin_listing(self):
+        self.generation += 1
+        self.root.generation = self.generation
+
+    def end_listing(self):
+        stale = dict()  # parent -> rows of its children the listing did not contain
+        for item in self.items.values():
+            if item.generation != self.generation and item.parent().generation == self.generation:
+                stale.setdefault(item.parent(), []).append(item.row())
+
+        for parent_item, rows in stale.items():
+            for row in rows:
+                for removed in parent_item.child(row).walk():
+                    del self.items[removed.path]
+
+            # remove runs of neighbouring rows at once, from the end so the rows in front stay valid
+            rows.sort(reverse=True)
+            parent_index = self.index_for_item(parent_item)
+            end = 0
+            while end < len(rows):
+                start = end
+                while end + 1 < len(rows) and rows[end + 1] == rows[end] - 1:
+                    end += 1
+                first, last = rows[end], rows[start]
+                shown_last = min(last, parent_item.fetched - 1)
+                if first <= shown_last:
+                    self.beginRemoveRows(parent_index, first, shown_last)
+                    parent_item.remove_rows(first, last - first + 1)
+                    self.endRemoveRows()
+                else:
+                    parent_item.remove_rows(first, last - first + 1)
+                end += 1
+            parent_item.renumber()
 
     def is_filled(self) -> bool:
         return self.root.child_count() > 0
-
-
-
-
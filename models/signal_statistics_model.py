@@ -0,0 +1,129 @@
+#####################################################################################
+# CanBadger Signal Statistics Model                                                 #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+from PySide2.QtCore import *
+from PySide2.QtGui import *
+from analysis.signal_statistics import SignalStatistics, IdSignalStatistics
+
+
+# overview table with one row per id, reads the running statistics of the logger model
+# display data is formatted text, Qt.UserRole returns plain values so a proxy can sort numerically
+class SignalStatisticsModel(QAbstractTableModel):
+    def __init__(self, statistics: SignalStatistics = None, parent=None, *args):
+        QAbstractTableModel.__init__(self, parent, *args)
+        self.statistics = statistics if statistics is not None else SignalStatistics()
+        self.header_labels = ['ID', 'Count', 'Period [ms]', 'Jitter [ms]', 'Min/Max Period [ms]', 'DLC',
+                              'Changing Bytes', 'Distinct Values', 'Byte Min', 'Byte Max', 'Bit Changes']
+        self.row_count = len(self.statistics)
+
+    def rowCount(self, parent=None):
+        return self.row_count
+
+    def columnCount(self, parent=None):
+        return len(self.header_labels)
+
+    def data(self, index, role):
+        if not index.isValid() or index.row() >= self.row_count:
+            return None
+        stats = self.statistics.get(self.statistics.order[index.row()])
+        if role == Qt.DisplayRole:
+            return self.display_value(stats, index.column())
+        elif role == Qt.UserRole:
+            return self.sort_value(stats, index.column())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.header_labels[section]
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    @staticmethod
+    def display_value(stats: IdSignalStatistics, column: int) -> str:
+        if column == 0:
+            return "{:X}".format(stats.frame_id)
+        elif column == 1:
+            return str(stats.count)
+        elif column == 2:
+            return "" if stats.period() is None else "{:.2f}".format(stats.period() / 1000)
+        elif column == 3:
+            return "" if stats.jitter() is None else "{:.2f}".format(stats.jitter() / 1000)
+        elif column == 4:
+            if stats.period_min is None:
+                return ""
+            return "{:.2f} / {:.2f}".format(stats.period_min / 1000, stats.period_max / 1000)
+        elif column == 5:
+            if stats.dlc_min == stats.dlc_max:
+                return str(stats.dlc_min)
+            return "{}-{}".format(stats.dlc_min, stats.dlc_max)
+        elif column == 6:
+            return " ".join(str(position) for position in stats.changing_bytes())
+        elif column == 7:
+            return " ".join(str(distinct) for distinct in stats.byte_distinct())
+        elif column == 8:
+            return " ".join("{:02X}".format(value) for value in stats.byte_min)
+        elif column == 9:
+            return " ".join("{:02X}".format(value) for value in stats.byte_max)
+        elif column == 10:
+            return str(sum(stats.bit_changes))
+        return None
+
+    @staticmethod
+    def sort_value(stats: IdSignalStatistics, column: int):
+        if column == 0:
+            return stats.frame_id
+        elif column == 1:
+            return stats.count
+        elif column == 2:
+            return -1.0 if stats.period() is None else stats.period()
+        elif column == 3:
+            return -1.0 if stats.jitter() is None else stats.jitter()
+        elif column == 4:
+            return -1 if stats.period_min is None else stats.period_min
+        elif column == 5:
+            return stats.dlc_max
+        elif column == 6:
+            return len(stats.changing_bytes())
+        elif column == 7:
+            return sum(stats.byte_distinct())
+        elif column in (8, 9):
+            return SignalStatisticsModel.display_value(stats, column)
+        elif column == 10:
+            return sum(stats.bit_changes)
+        return None
+
+    # use another statistics object, e.g. after the logger model was replaced
+    def setStatistics(self, statistics: SignalStatistics):
+        self.beginResetModel()
+        self.statistics = statistics
+        self.row_count = len(statistics)
+        self.endResetModel()
+
+    # announce ids that showed up since the last refresh and mark all values as changed
+    # called periodically instead of per frame, so the view is not redrawn for every frame
+    def refresh(self):
+        if len(self.statistics) > self.row_count:
+            self.beginInsertRows(QModelIndex(), self.row_count, len(self.statistics) - 1)
+            self.row_count = len(self.statistics)
+            self.endInsertRows()
+        if self.row_count > 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(self.row_count - 1, self.columnCount() - 1))
@@ -0,0 +1,5 @@
+from replay.replay_window import ReplayWindow
+from replay.replay_scheduler import ReplayScheduler, TimingReport
+from replay.replay_source import ReplaySource, format_replay_command
+from replay.replay_pacing import Pacer, PacingMode, can_frame_bits, parse_replay_command
+from replay.socketcan_replay import SocketCanReplayer, BcmCyclicSender, format_socketcan_frame, parse_socketcan_frame
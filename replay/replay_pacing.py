@@ -0,0 +1,192 @@
+#####################################################################################
+# CanBadger Replay Pacing                                                           #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# pacing of replays that do not follow the capture timing: fixed frame rate, target bus load or bursts
+# for the bus load the exact length of every frame on the wire is computed, including stuff bits,
+# and compared against the bitrate of the interface it is sent on
+
+from enum import Enum
+from functools import lru_cache
+import struct
+import time
+
+from replay.replay_scheduler import TimingReport, wait_until
+
+# bits after the crc that are never stuffed: crc delimiter, ack slot, ack delimiter, end of frame, interframe space
+UNSTUFFED_TRAILER_BITS = 1 + 1 + 1 + 7 + 3
+
+# bitrate assumed for interfaces without a known (or with a zero) bitrate
+DEFAULT_BITRATE = 500000
+
+
+class PacingMode(Enum):
+    NONE = 0  # as fast as the connection takes the frames
+    FRAME_RATE = 1  # fixed number of frames per second
+    BUS_LOAD = 2  # share of the bus bandwidth
+    BURST = 3  # bursts of frames sent back to back, separated by a gap
+
+
+def _int_bits(value: int, length: int) -> [int]:
+    return [(value >> shift) & 1 for shift in range(length - 1, -1, -1)]
+
+
+def crc15(bits: [int]) -> int:
+    crc = 0
+    for bit in bits:
+        feedback = bit ^ ((crc >> 14) & 1)
+        crc = (crc << 1) & 0x7FFF
+        if feedback:
+            crc ^= 0x4599
+    return crc
+
+
+# number of bits a classic can data frame occupies on the bus, including stuff bits and interframe space
+@lru_cache(maxsize=4096)
+def can_frame_bits(frame_id: int, payload: bytes, extended: bool = None) -> int:
+    if extended is None:
+        extended = frame_id > 0x7FF
+
+    bits = [0]  # start of frame
+    if extended:
+        # base id, srr, ide, id extension, rtr, r1, r0
+        bits += _int_bits(frame_id >> 18, 11) + [1, 1] + _int_bits(frame_id & 0x3FFFF, 18) + [0, 0, 0]
+    else:
+        # id, rtr, ide, r0
+        bits += _int_bits(frame_id, 11) + [0, 0, 0]
+    bits += _int_bits(len(payload), 4)
+    for byte in payload:
+        bits += _int_bits(byte, 8)
+    bits += _int_bits(crc15(bits), 15)
+
+    # after five equal bits the sender inserts a complementary one, which starts the next run
+    stuff_bits = 0
+    run = 1
+    last = bits[0]
+    for bit in bits[1:]:
+        if bit == last:
+            run += 1
+            if run == 5:
+                stuff_bits += 1
+                last = 1 - bit
+                run = 1
+        else:
+            last = bit
+            run = 1
+
+    return len(bits) + stuff_bits + UNSTUFFED_TRAILER_BITS
+
+
+# decodes a START_REPLAY payload into interface, frame id and payload
+def parse_replay_command(command: bytes) -> (int, int, bytes):
+    return command[0], struct.unpack('I', command[1:5])[0], command[5:]
+
+
+# paces frames like a ReplayScheduler, but by rate instead of the capture timestamps
+class Pacer:
+    def __init__(self, mode: PacingMode, frame_rate: float = 1000.0, bus_load: float = 0.5,
+                 bitrates: dict = None, burst_size: int = 10, burst_gap: float = 0.01,
+                 parse=parse_replay_command, max_lag: float = 0.05, clock=time.perf_counter):
+        if mode == PacingMode.BUS_LOAD and bus_load <= 0:
+            raise ValueError("bus load has to be above 0, got {}".format(bus_load))
+        self.mode = mode
+        self.frame_rate = frame_rate
+        self.bus_load = bus_load  # 0.0 - 1.0
+        self.bitrates = bitrates if bitrates is not None else dict()  # interface -> bit/s
+        self.burst_size = max(1, burst_size)
+        self.burst_gap = burst_gap  # seconds between two bursts
+        self.parse = parse  # turns what is sent into (interface, frame id, payload)
+        self.max_lag = max_lag  # a frame this late moves the schedule instead of sending a catch up burst
+        self.clock = clock
+        self.report = TimingReport()
+
+        self.started = None
+        self.next_time = None
+        self.last_sent = None
+        self.sent_frames = 0
+        self.in_burst = 0
+        self.bits = dict()  # interface -> bits put on the bus
+
+    def bitrate(self, interface: int) -> int:
+        bitrate = self.bitrates.get(interface)
+        return bitrate if bitrate is not None and bitrate > 0 else DEFAULT_BITRATE
+
+    # clock time at which the given frame has to be sent, call once per frame in send order
+    # the timestamp is ignored, it is only there to share the interface with the ReplayScheduler
+    def due(self, frame: bytes, timestamp: int = None) -> float:
+        if self.next_time is None:
+            self.next_time = self.clock()
+            self.started = self.next_time
+        due = self.next_time
+
+        interface, frame_id, payload = self.parse(frame)
+        bits = can_frame_bits(frame_id, bytes(payload))
+        self.bits[interface] = self.bits.get(interface, 0) + bits
+
+        if self.mode == PacingMode.FRAME_RATE:
+            self.next_time += 1 / self.frame_rate
+        elif self.mode == PacingMode.BUS_LOAD:
+            self.next_time += bits / (self.bitrate(interface) * self.bus_load)
+        elif self.mode == PacingMode.BURST:
+            self.in_burst += 1
+            if self.in_burst >= self.burst_size:
+                self.in_burst = 0
+                self.next_time += self.burst_gap
+        return due
+
+    def wait_time(self, due: float) -> float:
+        return due - self.clock()
+
+    def sent(self, due: float) -> float:
+        now = self.clock()
+        self.last_sent = now
+        self.sent_frames += 1
+        error = now - due
+        self.report.add(error)
+        if error > self.max_lag:
+            self.next_time += error
+            self.report.reanchored += 1
+        return error
+
+    def wait_until(self, due: float, spin: float = 0.0005):
+        wait_until(self.clock, due, spin)
+
+    def elapsed(self) -> float:
+        if self.started is None or self.last_sent is None:
+            return 0.0
+        return self.last_sent - self.started
+
+    def achieved_rate(self) -> float:
+        elapsed = self.elapsed()
+        return self.sent_frames / elapsed if elapsed > 0 else 0.0
+
+    # share of the bus bandwidth used per interface
+    def achieved_bus_load(self) -> dict:
+        elapsed = self.elapsed()
+        if elapsed <= 0:
+            return {interface: 0.0 for interface in self.bits}
+        return {interface: bits / (elapsed * self.bitrate(interface)) for interface, bits in self.bits.items()}
+
+    def summary(self) -> str:
+        loads = ", ".join("if{} {:.1f}%".format(interface, load * 100)
+                          for interface, load in sorted(self.achieved_bus_load().items()))
+        return "pacing {}: achieved {:.0f} frames/s, bus load {}".format(self.mode.name, self.achieved_rate(), loads)
@@ -0,0 +1,162 @@
+#####################################################################################
+# CanBadger Replay Scheduler                                                        #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# schedules replayed frames at the gaps they had in the capture
+# every send time is computed from one anchor (first frame <-> start of replay) on a monotonic clock,
+# so late sends do not push the following frames back and the replay does not drift over time
+
+import math
+import time
+
+# canbadger timestamps are 32 bit microseconds and wrap around
+TIMESTAMP_WRAP = 1 << 32
+
+# the timing errors are counted in a log scaled histogram, so a report takes the same memory for any replay length
+# errors below ERROR_RESOLUTION seconds are counted exactly, every doubling above it has ERROR_SUB_BUCKETS buckets,
+# so a percentile is off by at most 1 / ERROR_SUB_BUCKETS of its value
+ERROR_RESOLUTION = 1e-6
+ERROR_SUB_BUCKETS = 16
+
+
+def error_bucket(error: float) -> int:
+    units = int(abs(error) / ERROR_RESOLUTION)
+    if units < ERROR_SUB_BUCKETS:
+        return units
+    octave = units.bit_length() - ERROR_SUB_BUCKETS.bit_length()
+    return (octave + 1) * ERROR_SUB_BUCKETS + ((units >> octave) - ERROR_SUB_BUCKETS)
+
+
+# the largest error that falls into the bucket
+def bucket_limit(bucket: int) -> float:
+    if bucket < ERROR_SUB_BUCKETS:
+        return (bucket + 1) * ERROR_RESOLUTION
+    octave = bucket // ERROR_SUB_BUCKETS - 1
+    return ((bucket % ERROR_SUB_BUCKETS + ERROR_SUB_BUCKETS + 1) << octave) * ERROR_RESOLUTION
+
+
+# blocking helper for replays outside of the qt event loop, sleeps coarse and spins for the last bit
+def wait_until(clock, due: float, spin: float = 0.0005):
+    while True:
+        remaining = due - clock()
+        if remaining <= 0:
+            return
+        if remaining > spin:
+            time.sleep(remaining - spin)
+
+
+# collects the difference between target and actual send time of every frame
+# as running moments and a histogram of the absolute errors
+class TimingReport:
+    def __init__(self):
+        self.count = 0
+        self.error_sum = 0.0  # actual - target in seconds, positive means late
+        self.largest = 0.0  # the error with the largest absolute value
+        self.buckets = dict()  # error_bucket -> number of frames
+        self.reanchored = 0
+
+    def add(self, error: float):
+        self.count += 1
+        self.error_sum += error
+        if abs(error) > abs(self.largest):
+            self.largest = error
+        bucket = error_bucket(error)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def __len__(self):
+        return self.count
+
+    def mean_error(self) -> float:
+        return self.error_sum / self.count if self.count else 0.0
+
+    def max_error(self) -> float:
+        return self.largest
+
+    # error below which the given share of all frames were sent, rounded up to the histogram resolution
+    def percentile(self, share: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = min(self.count - 1, int(share * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return min(bucket_limit(bucket), abs(self.largest))
+        return abs(self.largest)
+
+    def summary(self) -> str:
+        return "timing error mean {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms over {} frames".format(
+            self.mean_error() * 1000, self.percentile(0.99) * 1000, self.max_error() * 1000, len(self))
+
+
+class ReplayScheduler:
+    def __init__(self, speed: float = 1.0, max_lag: float = None, clock=time.perf_counter):
+        self.speed = speed  # 2.0 replays twice as fast as captured
+        self.max_lag = max_lag  # re-anchor if a frame is this many seconds late (None keeps the original grid)
+        self.clock = clock
+        self.report = TimingReport()
+
+        self.anchor_time = None
+        self.anchor_timestamp = None
+        self.last_timestamp = None
+        self.wraps = 0
+
+    # converts a capture timestamp (microseconds) into one that keeps counting over the 32 bit wrap
+    def unwrap(self, timestamp: int) -> int:
+        if self.last_timestamp is not None and timestamp < self.last_timestamp - TIMESTAMP_WRAP // 2:
+            self.wraps += 1
+        self.last_timestamp = timestamp
+        return timestamp + self.wraps * TIMESTAMP_WRAP
+
+    # clock time at which a frame with the given capture timestamp has to be sent
+    # the first frame ever asked for is due immediately and anchors the schedule
+    def due_time(self, timestamp: int) -> float:
+        timestamp = self.unwrap(timestamp)
+        if self.anchor_time is None:
+            self.anchor_time = self.clock()
+            self.anchor_timestamp = timestamp
+        return self.anchor_time + (timestamp - self.anchor_timestamp) / 1000000 / self.speed
+
+    # common interface with the Pacer: clock time at which the frame with the given capture timestamp is due
+    def due(self, frame: bytes, timestamp: int) -> float:
+        return self.due_time(timestamp)
+
+    # seconds until the frame is due, negative if it is late
+    def wait_time(self, due: float) -> float:
+        return due - self.clock()
+
+    # remember when a frame was actually sent, returns the timing error in seconds
+    def sent(self, due: float) -> float:
+        now = self.clock()
+        error = now - due
+        self.report.add(error)
+        if self.max_lag is not None and error > self.max_lag:
+            # we fell too far behind (e.g. the connection stalled), continue the original gaps from here
+            self.anchor_time += error
+            self.report.reanchored += 1
+        return error
+
+    def summary(self) -> str:
+        return self.report.summary()
+
+    def wait_until(self, due: float, spin: float = 0.0005):
+        wait_until(self.clock, due, spin)
@@ -0,0 +1,110 @@
+#####################################################################################
+# CanBadger Replay Source                                                           #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# lazy source of replay commands
+# entries are pulled from an iterator one at a time and repeat counts are expanded on the fly,
+# so replaying huge captures or frames with large repeat counts needs constant memory and time per frame
+
+import struct
+
+from datatypes.can_frame import CanFrame
+from capture import read_capture
+
+
+# builds the payload of a START_REPLAY message: interface, frame id, frame payload
+def format_replay_command(interface: int, frame_id: int, payload: bytes) -> bytes:
+    return struct.pack('B', interface) + struct.pack('I', frame_id) + bytes(payload)
+
+
+class ReplaySource:
+    def __init__(self, entries):
+        # entries yield (count, command, timestamp) tuples, timestamp may be None
+        self.entries = iter(entries)
+        self.remaining = 0
+        self.command = None
+        self.timestamp = None
+        self.sent = 0
+        self.exhausted = False
+        # called with every popped frame, e.g. to register the sent frames as stimuli
+        self.listener = None
+
+    # replay list rows are [count, id, payload, interface(, timestamp)]
+    # rows without payload or count are skipped, rows without timestamp inherit the one of their predecessor
+    # the formatter turns interface, id and payload into what is sent, a START_REPLAY payload by default
+    @classmethod
+    def from_rows(cls, rows: [list], formatter=format_replay_command):
+        def entries():
+            timestamp = 0
+            for row in rows:
+                if len(row) > 4:
+                    timestamp = row[4]
+                if len(row[2]) == 0 or row[0] <= 0:
+                    continue
+                yield row[0], formatter(row[3], row[1], row[2]), timestamp
+        return cls(entries())
+
+    @classmethod
+    def from_frames(cls, frames: [CanFrame], count: int = 1, formatter=format_replay_command):
+        return cls((count, formatter(frame.interface_number, frame.frame_id, frame.frame_payload),
+                    frame.timestamp) for frame in frames if frame.data_length > 0)
+
+    # streams the matching frames of a capture file without loading it
+    @classmethod
+    def from_capture(cls, path: str, ids: [int] = None, start: int = None, end: int = None, count: int = 1,
+                     formatter=format_replay_command):
+        return cls.from_frames(read_capture(path, ids=ids, start=start, end=end), count=count, formatter=formatter)
+
+    # returns (command, timestamp) of the next frame without consuming it, None if the source is exhausted
+    def peek(self):
+        while self.remaining == 0:
+            if self.exhausted:
+                return None
+            try:
+                self.remaining, self.command, self.timestamp = next(self.entries)
+            except StopIteration:
+                self.exhausted = True
+                self.command = None
+                return None
+        return self.command, self.timestamp
+
+    # returns (command, timestamp) of the next frame and consumes it, None if the source is exhausted
+    def pop(self):
+        entry = self.peek()
+        if entry is not None:
+            self.remaining -= 1
+            self.sent += 1
+            if self.listener is not None:
+                self.listener(entry[0])
+        return entry
+
+    def is_empty(self) -> bool:
+        return self.peek() is None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        entry = self.pop()
+        if entry is None:
+            raise StopIteration
+        return entry
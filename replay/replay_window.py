@@ -0,0 +1,140 @@
+#####################################################################################
+# CanBadger Replay Window                                                           #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# keeps track of replay commands that were sent but not yet answered by the canbadger
+# commands are numbered in send order, the connection is a tcp stream, so ACK/NACKs come back in the same order
+# and always retire the oldest outstanding command
+# every command also gets a deadline, a command whose answer got lost is sent again or given up on expiry,
+# otherwise it would hold its slot forever and the replay never finishes
+
+from collections import deque
+import time
+
+from helpers.deadline_queue import DeadlineQueue
+
+
+class ReplayWindow:
+    def __init__(self, size: int = 32, timeout: float = 1.0, retries: int = 1, clock=time.perf_counter):
+        self.size = max(1, size)  # 1 waits for every answer before sending the next command
+        self.timeout = timeout  # seconds to wait for the answer to a command
+        self.retries = retries  # times an unanswered command is sent again before it is given up
+        self.clock = clock
+        self.in_flight = deque()  # (sequence number, command, send time)
+        self.deadlines = DeadlineQueue(clock)  # sequence number -> answer deadline
+        self.attempts = dict()  # sequence number -> times it was sent again
+        self.next_sequence = 0
+        self.acked = 0
+        self.nacked = 0
+        self.lost = 0
+        self.resent = 0
+        self.started = None
+        self.finished = None
+        self.round_trip_total = 0.0
+        self.round_trip_max = 0.0
+
+    # True if another command may be sent without waiting for an answer
+    def can_send(self) -> bool:
+        return len(self.in_flight) < self.size
+
+    def is_idle(self) -> bool:
+        return len(self.in_flight) == 0
+
+    # register a sent command, returns its sequence number
+    def sent(self, command: bytes) -> int:
+        now = self.clock()
+        if self.started is None:
+            self.started = now
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        self.in_flight.append((sequence, command, now))
+        self.deadlines.touch(sequence, self.timeout)
+        return sequence
+
+    # retire the oldest outstanding command, returns its sequence number or None if nothing was outstanding
+    def retire(self, acked: bool = True) -> int:
+        if not self.in_flight:
+            return None
+        sequence, command, sent_at = self.in_flight.popleft()
+        self.deadlines.remove(sequence)
+        self.attempts.pop(sequence, None)
+
+        now = self.clock()
+        round_trip = now - sent_at
+        self.round_trip_total += round_trip
+        self.round_trip_max = max(self.round_trip_max, round_trip)
+        if acked:
+            self.acked += 1
+        else:
+            self.nacked += 1
+        if not self.in_flight:
+            self.finished = now
+        return sequence
+
+    # handle the commands whose deadline passed, returns the commands that have to be sent again
+    # a command sent again is answered after everything already in flight, so it moves to the end
+    def expire(self, now: float = None) -> [bytes]:
+        if now is None:
+            now = self.clock()
+        resend = []
+        for sequence in self.deadlines.pop_expired(now):
+            entry = next((entry for entry in self.in_flight if entry[0] == sequence), None)
+            if entry is None:
+                continue
+            self.in_flight.remove(entry)
+            attempts = self.attempts.pop(sequence, 0)
+            if attempts < self.retries:
+                self.attempts[sequence] = attempts + 1
+                self.in_flight.append((sequence, entry[1], now))
+                self.deadlines.touch(sequence, self.timeout)
+                self.resent += 1
+                resend.append(entry[1])
+            else:
+                self.lost += 1
+        if not self.in_flight and self.started is not None:
+            self.finished = now
+        return resend
+
+    # seconds until the next command times out, None if nothing is outstanding
+    def time_to_expiry(self) -> float:
+        return self.deadlines.time_to_next()
+
+    @property
+    def answered(self) -> int:
+        return self.acked + self.nacked
+
+    # mean time between sending a command and its answer in seconds
+    def mean_round_trip(self) -> float:
+        return self.round_trip_total / self.answered if self.answered else 0.0
+
+    # answered commands per second over the whole replay
+    def rate(self) -> float:
+        if self.started is None or self.finished is None or self.finished <= self.started:
+            return 0.0
+        return self.answered / (self.finished - self.started)
+
+    def summary(self) -> str:
+        summary = "Replayed {} frames ({} NACK) at {:.0f} frames/s, mean round trip {:.2f} ms".format(
+            self.answered, self.nacked, self.rate(), self.mean_round_trip() * 1000)
+        if self.resent or self.lost:
+            summary += ", {} sent again, {} without answer".format(self.resent, self.lost)
+        return summary
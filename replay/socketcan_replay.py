@@ -0,0 +1,190 @@
+#####################################################################################
+# CanBadger SocketCAN Replay                                                        #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# replay backend for socketcan nodes (vcan, usb adapters), no canbadger involved
+# frames are written from a worker thread in batches on a raw can socket, optionally paced by a ReplayScheduler
+# repeated frames can be handed to the kernel broadcast manager (CAN_BCM), which sends them cyclically on its own
+
+import errno
+import socket
+import struct
+import threading
+import time
+
+from replay.replay_source import ReplaySource
+
+# socketcan frame: id (with flags), length, 3 byte padding, 8 byte data
+can_frame = struct.Struct('=IB3x8s')
+# bcm message head: opcode, flags, count, ival1 and ival2 as timevals, can id, number of frames
+bcm_msg_head = struct.Struct('@3I4l2I0q')
+
+
+def socketcan_id(frame_id: int) -> int:
+    # ids that do not fit into 11 bit are sent as extended frames
+    if frame_id > 0x7FF:
+        return frame_id | socket.CAN_EFF_FLAG
+    return frame_id
+
+
+# formatter for ReplaySource, the interface number is given by the socket and ignored
+def format_socketcan_frame(interface: int, frame_id: int, payload: bytes) -> bytes:
+    payload = bytes(payload)
+    if len(payload) > 8:
+        raise ValueError("CAN frame {:X} has {} bytes of payload, at most 8 fit".format(frame_id, len(payload)))
+    return can_frame.pack(socketcan_id(frame_id), len(payload), payload)
+
+
+# counterpart of format_socketcan_frame for the Pacer, every frame counts for interface 1
+def parse_socketcan_frame(frame: bytes) -> (int, int, bytes):
+    can_id, length, data = can_frame.unpack(frame)
+    return 1, can_id & socket.CAN_EFF_MASK, data[:length]
+
+
+# sends frames cyclically from the kernel, the interval is kept by the kernel timer and not by python
+class BcmCyclicSender:
+    def __init__(self, interface: str, bcm_socket=None):
+        if bcm_socket is None:
+            bcm_socket = socket.socket(socket.PF_CAN, socket.SOCK_DGRAM, socket.CAN_BCM)
+            bcm_socket.connect((interface,))
+        self.socket = bcm_socket
+        self.active_ids = set()
+
+    # send the frame count times (0 for forever) every interval seconds
+    def start(self, frame_id: int, payload: bytes, interval: float, count: int = 0):
+        seconds = int(interval)
+        microseconds = int(round((interval - seconds) * 1000000))
+        can_id = socketcan_id(frame_id)
+        if count > 0:
+            # send count frames with ival1, then stop as ival2 is zero
+            head = bcm_msg_head.pack(socket.CAN_BCM_TX_SETUP, socket.CAN_BCM_SETTIMER | socket.CAN_BCM_STARTTIMER,
+                                     count, seconds, microseconds, 0, 0, can_id, 1)
+        else:
+            head = bcm_msg_head.pack(socket.CAN_BCM_TX_SETUP, socket.CAN_BCM_SETTIMER | socket.CAN_BCM_STARTTIMER,
+                                     0, 0, 0, seconds, microseconds, can_id, 1)
+        self.socket.send(head + format_socketcan_frame(0, frame_id, payload))
+        self.active_ids.add(frame_id)
+
+    def stop(self, frame_id: int):
+        if frame_id not in self.active_ids:
+            return
+        self.socket.send(bcm_msg_head.pack(socket.CAN_BCM_TX_DELETE, 0, 0, 0, 0, 0, 0, socketcan_id(frame_id), 0))
+        self.active_ids.discard(frame_id)
+
+    def stop_all(self):
+        for frame_id in list(self.active_ids):
+            self.stop(frame_id)
+
+    def close(self):
+        self.socket.close()
+
+
+class SocketCanReplayer(threading.Thread):
+    def __init__(self, interface: str, source: ReplaySource, scheduler=None,
+                 batch_size: int = 64, raw_socket=None):
+        super().__init__(daemon=True)
+        self.interface = interface
+        self.source = source  # has to be built with format_socketcan_frame
+        self.scheduler = scheduler  # ReplayScheduler or Pacer, None sends as fast as the socket takes the frames
+        self.batch_size = batch_size
+        self.socket = raw_socket
+
+        self.sent = 0
+        self.retries = 0  # sends repeated because the tx queue of the interface was full
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_socket = self.socket is None
+        try:
+            if own_socket:
+                self.socket = socket.socket(socket.PF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+                self.socket.bind((self.interface,))
+            self.started = time.perf_counter()
+            if self.scheduler is None:
+                self.send_batched()
+            else:
+                self.send_scheduled()
+        except (OSError, ValueError) as e:
+            self.error = e
+        finally:
+            self.finished = time.perf_counter()
+            if own_socket and self.socket is not None:
+                self.socket.close()
+
+    # pull frames in batches and write them back to back
+    def send_batched(self):
+        batch = []
+        while not self._stop_event.is_set():
+            batch.clear()
+            for _ in range(self.batch_size):
+                entry = self.source.pop()
+                if entry is None:
+                    break
+                batch.append(entry[0])
+            if not batch:
+                return
+            for frame in batch:
+                self.write(frame)
+
+    # send every frame at the time the scheduler gives for it
+    def send_scheduled(self):
+        while not self._stop_event.is_set():
+            entry = self.source.pop()
+            if entry is None:
+                return
+            frame, timestamp = entry
+            due = self.scheduler.due(frame, timestamp)
+            self.scheduler.wait_until(due)
+            self.write(frame)
+            self.scheduler.sent(due)
+
+    # raw can sockets do not block on a full tx queue but fail with ENOBUFS, wait a little and retry
+    def write(self, frame: bytes):
+        while True:
+            try:
+                self.socket.send(frame)
+                self.sent += 1
+                return
+            except OSError as e:
+                if e.errno != errno.ENOBUFS or self._stop_event.is_set():
+                    raise
+                self.retries += 1
+                time.sleep(0.0001)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def rate(self) -> float:
+        if self.started is None or self.finished is None or self.finished <= self.started:
+            return 0.0
+        return self.sent / (self.finished - self.started)
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return "SocketCAN replay on {} failed after {} frames: {}".format(self.interface, self.sent, self.error)
+        summary = "Replayed {} frames on {} at {:.0f} frames/s".format(self.sent, self.interface, self.rate())
+        if self.scheduler is not None:
+            summary += ", " + self.scheduler.summary()
+        return summary
@@ -0,0 +1,5 @@
+from sdcard.sd_upload import SdUpload, UPLOAD_CHUNK_SIZE
+from sdcard.sd_download import SdDownload
+from sdcard.upload_source import UploadSource
+from sdcard.transfer_state import TransferState
+from sdcard.transfer_queue import TransferQueue, TransferJob
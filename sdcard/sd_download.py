@@ -0,0 +1,178 @@
+#####################################################################################
+# CanBadger SD Download                                                             #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# receives a file from the sd card of a canbadger, DATA messages are written out as they arrive
+# into a file chosen before the download starts, or into a growable buffer when no path is given,
+# so a download never holds more than one message in memory and no data is copied more than once
+# a download can continue an interrupted one from its TransferState, the canbadger is asked to send again
+# the last HEAD_SIZE confirmed bytes, so the first bytes that come back tell if it continued there (they match the
+# tail of the partial file) or ignored the offset and started over (they match the head), the repeated part is
+# skipped and checked by crc32, a resume that fails the check or can not be told apart leaves the download failed
+
+import os
+import time
+import zlib
+
+from sdcard.transfer_state import TransferState
+
+HEAD_SIZE = 64  # bytes kept from the start and the end of a download to recognize where a resume starts
+
+
+class SdDownload:
+    def __init__(self, path: str = None, expected_size: int = None, resume: TransferState = None):
+        self.path = path
+        self.expected_size = expected_size  # for the progress, the canbadger does not send the file size
+        self.buffer = bytearray() if path is None else None
+        self.file = None
+        self.received = 0  # bytes of the file, including a resumed part
+        self.messages = 0
+        self.crc32 = 0
+        self.head = b''
+        self.tail = b''
+
+        # while skipping data the canbadger sent again: bytes left to skip, their checksum and the expected one
+        self.resume = resume
+        self.overlap = 0  # confirmed bytes requested again to recognize the resume position
+        self.probe = b''  # first bytes of a resumed download until the overlap is complete
+        self.skip = 0
+        self.skip_crc32 = 0
+        self.skip_expected = 0
+        self.mismatch = False  # the resent data differs from the partial file or its position is unclear
+
+        if resume is not None:
+            # keep the confirmed part of the partial file, drop anything written behind it
+            self.file = open(path, 'r+b')
+            self.file.truncate(resume.offset)
+            self.file.seek(resume.offset)
+            self.received = resume.offset
+            self.crc32 = resume.crc32
+            self.head = resume.head
+            self.tail = resume.tail
+            self.overlap = min(resume.offset, HEAD_SIZE)
+        elif path is not None:
+            self.file = open(path, 'wb')
+        self.session_start = self.received
+        self.started = time.perf_counter()
+        self.finished = None
+
+    # file position a resumed download is requested from
+    def request_position(self) -> int:
+        return self.received - self.overlap
+
+    def write(self, data):
+        self.messages += 1
+        if self.mismatch:
+            return
+        if self.resume is not None:
+            # the first overlap bytes of a resumed download tell where the canbadger started
+            self.probe += bytes(data)
+            if len(self.probe) < self.overlap:
+                return
+            data = self.probe
+            self.probe = b''
+            self.choose_resume_start(data[:self.overlap])
+            self.resume = None
+            if self.mismatch:
+                return
+        if self.skip > 0:
+            skipped = data[:self.skip]
+            self.skip_crc32 = zlib.crc32(skipped, self.skip_crc32)
+            self.skip -= len(skipped)
+            data = data[len(skipped):]
+            if self.skip == 0 and self.skip_crc32 != self.skip_expected:
+                self.mismatch = True
+            if len(data) == 0 or self.mismatch:
+                return
+
+        if self.file is not None:
+            self.file.write(data)
+        else:
+            self.buffer += data
+        if len(self.head) < HEAD_SIZE:
+            self.head += bytes(data[:HEAD_SIZE - len(self.head)])
+        self.tail = (self.tail + bytes(data[-HEAD_SIZE:]))[-HEAD_SIZE:]
+        self.crc32 = zlib.crc32(data, self.crc32)
+        self.received += len(data)
+
+    def choose_resume_start(self, start: bytes):
+        offset = self.resume.offset
+        if offset == self.overlap:
+            # requested from 0, continuing and starting over are the same
+            self.skip = offset
+            self.skip_expected = self.crc32
+            return
+        continued = start == self.tail[-self.overlap:]
+        restarted = start == self.head[:self.overlap]
+        if continued and not restarted:
+            self.skip = self.overlap
+            self.skip_expected = zlib.crc32(self.tail[-self.overlap:])
+        elif restarted and not continued:
+            self.skip = offset
+            self.skip_expected = self.crc32
+        else:
+            # the file changed, or head and tail are the same (e.g. zero filled) and the position is unclear
+            self.mismatch = True
+
+    # the canbadger signalled the end of the file, returns the path or the received data
+    def finish(self):
+        self.finished = time.perf_counter()
+        if self.resume is not None or self.skip > 0:
+            # the file ended inside the data that was sent again
+            self.mismatch = True
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            return self.path
+        return bytes(self.buffer)
+
+    # stop without a complete file, a partial file is removed unless keep_partial is set
+    def abort(self, keep_partial: bool = False):
+        self.finished = time.perf_counter()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            if not keep_partial:
+                os.remove(self.path)
+
+    # what is needed to continue this download later, only confirmed data is written to the file
+    def state(self, sd_path: str) -> TransferState:
+        return TransferState(TransferState.DOWNLOAD, sd_path, local_path=self.path, offset=self.received,
+                             crc32=self.crc32, head=self.head, tail=self.tail)
+
+    def progress(self) -> float:
+        if not self.expected_size:
+            return 0.0
+        return min(1.0, self.received / self.expected_size)
+
+    # received bytes per second
+    def rate(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (self.received - self.session_start) / (end - self.started) if end > self.started else 0.0
+
+    def summary(self) -> str:
+        state = "done" if self.finished is not None else "running"
+        summary = "Download {}: {:.1f} KB in {} messages at {:.1f} KB/s, CRC32 {:08X}".format(
+            state, self.received / 1024, self.messages, self.rate() / 1024, self.crc32)
+        if self.mismatch:
+            summary += ", failed to continue the interrupted download"
+        return summary
@@ -0,0 +1,147 @@
+#####################################################################################
+# CanBadger SD Upload                                                               #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# sends a file to the sd card of a canbadger in numbered UPDATE_SD packets
+# up to window_size packets are in flight before waiting for an ACK, the connection is a tcp stream,
+# so ACK/NACKs arrive in send order and always answer the oldest packet in flight
+# a NACK only repeats the packet it answers, the file is never copied, packets are cut from an UploadSource
+# packets below confirmed_packets are all acknowledged, an interrupted upload can start again behind them
+
+from collections import deque
+import struct
+import time
+import zlib
+
+from sdcard.upload_source import UploadSource
+
+# packet number and length in front of the data of every packet
+upload_packet_header = struct.Struct('<IB')
+UPLOAD_CHUNK_SIZE = 120  # canbadger receiver buffer currently 135 Bytes
+
+
+class SdUpload:
+    def __init__(self, source, chunk_size: int = UPLOAD_CHUNK_SIZE, window_size: int = 8, max_retries: int = 3,
+                 start_packet: int = 0, start_crc32: int = 0):
+        # an UploadSource (e.g. a memory mapped file) or bytes
+        self.source = source if isinstance(source, UploadSource) else UploadSource(source)
+        self.chunk_size = chunk_size
+        self.window_size = max(1, window_size)  # 1 waits for every ACK like a stop-and-wait transfer
+        self.max_retries = max_retries  # NACKs per packet before the upload fails
+        self.size = len(self.source)
+        self.packet_count = (self.size + chunk_size - 1) // chunk_size
+
+        self.next_packet = start_packet  # next packet that was never sent
+        self.in_flight = deque()  # packet numbers in send order
+        self.resend = deque()  # NACKed packets, sent before any new packet
+        self.acked_packets = 0
+        self.acked_bytes = 0
+        self.acked = set()  # acknowledged packets behind a gap left by a NACK
+        self.confirmed_packets = start_packet  # every packet below is acknowledged
+        self.confirmed_crc32 = start_crc32  # checksum of the confirmed packets
+        self.retries = dict()  # packet number -> NACKs
+        self.retransmits = 0
+        self.failed = False
+        self.started = None
+        self.finished = None
+
+    def chunk_length(self, number: int) -> int:
+        return max(0, min(self.chunk_size, self.size - number * self.chunk_size))
+
+    def packet(self, number: int) -> bytes:
+        # the view is released right away, so the source can be closed at any time
+        with self.source.read(number * self.chunk_size, self.chunk_size) as chunk:
+            return upload_packet_header.pack(number, len(chunk)) + chunk
+
+    # packets that fit into the window now, as (packet number, message payload)
+    def packets_to_send(self) -> [(int, bytes)]:
+        if self.started is None:
+            self.started = time.perf_counter()
+        packets = []
+        while not self.failed and len(self.in_flight) < self.window_size:
+            if self.resend:
+                number = self.resend.popleft()
+            elif self.next_packet < self.packet_count:
+                number = self.next_packet
+                self.next_packet += 1
+            else:
+                break
+            self.in_flight.append(number)
+            packets.append((number, self.packet(number)))
+        return packets
+
+    def on_ack(self):
+        if not self.in_flight:
+            return
+        number = self.in_flight.popleft()
+        self.acked_packets += 1
+        self.acked_bytes += self.chunk_length(number)
+        self.acked.add(number)
+        while self.confirmed_packets in self.acked:
+            self.acked.remove(self.confirmed_packets)
+            with self.source.read(self.confirmed_packets * self.chunk_size, self.chunk_size) as chunk:
+                self.confirmed_crc32 = zlib.crc32(chunk, self.confirmed_crc32)
+            self.confirmed_packets += 1
+        if self.is_done():
+            self.finished = time.perf_counter()
+
+    # the oldest packet in flight failed, it is sent again unless it failed too often
+    def on_nack(self):
+        if not self.in_flight:
+            return
+        number = self.in_flight.popleft()
+        self.retries[number] = self.retries.get(number, 0) + 1
+        if self.retries[number] > self.max_retries:
+            self.failed = True
+            self.finished = time.perf_counter()
+            return
+        self.retransmits += 1
+        self.resend.append(number)
+
+    def close(self):
+        self.source.close()
+
+    def is_done(self) -> bool:
+        return self.confirmed_packets >= self.packet_count
+
+    def confirmed_offset(self) -> int:
+        return min(self.size, self.confirmed_packets * self.chunk_size)
+
+    def progress(self) -> float:
+        return self.confirmed_offset() / self.size if self.size else 1.0
+
+    # checksum of the whole source, to compare with what ends up on the sd card
+    def source_crc32(self) -> int:
+        with self.source.read(0, self.size) as data:
+            return zlib.crc32(data)
+
+    # acknowledged bytes per second
+    def rate(self) -> float:
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return self.acked_bytes / (end - self.started) if end > self.started else 0.0
+
+    def summary(self) -> str:
+        state = "failed" if self.failed else "done" if self.is_done() else "running"
+        return "Upload {}: {} of {} bytes at {:.1f} KB/s, {} packets repeated".format(
+            state, self.confirmed_offset(), self.size, self.rate() / 1024, self.retransmits)
@@ -0,0 +1,174 @@
+#####################################################################################
+# CanBadger SD Transfer Queue                                                       #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# a list of sd card jobs (downloads, uploads and deletes) that run one after the other without user interaction
+# download data carries no file name, so downloads and uploads run strictly one at a time, each upload with its
+# own packet window, deletes only wait for an ACK and up to delete_window of them are sent at once
+# ACK/NACKs answer the oldest delete in flight, like the packets of an upload
+
+from collections import deque
+import time
+
+
+class TransferJob:
+    DOWNLOAD = "download"
+    UPLOAD = "upload"
+    DELETE = "delete"
+
+    WAITING = "waiting"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, kind: str, sd_path: str, local_path: str = None, size: int = None):
+        self.kind = kind
+        self.sd_path = sd_path  # full path on the sd card
+        self.local_path = local_path
+        self.size = size  # bytes, if known before the transfer
+        self.state = TransferJob.WAITING
+        self.transferred = 0
+
+    def __repr__(self):
+        return "TransferJob({}, {}, {})".format(self.kind, self.sd_path, self.state)
+
+
+class TransferQueue:
+    def __init__(self, delete_window: int = 8):
+        self.jobs = []
+        self.position = 0  # index of the first job that was not started
+        self.delete_window = max(1, delete_window)
+        self.in_flight = deque()  # deletes sent and not answered yet, oldest first
+        self.current = None  # the running download or upload
+        self.started = None
+        self.finished = None
+
+    def add(self, job: TransferJob) -> TransferJob:
+        self.jobs.append(job)
+        return job
+
+    def add_download(self, sd_path: str, local_path: str) -> TransferJob:
+        return self.add(TransferJob(TransferJob.DOWNLOAD, sd_path, local_path))
+
+    def add_upload(self, local_path: str, sd_path: str, size: int = None) -> TransferJob:
+        return self.add(TransferJob(TransferJob.UPLOAD, sd_path, local_path, size))
+
+    def add_delete(self, sd_path: str) -> TransferJob:
+        return self.add(TransferJob(TransferJob.DELETE, sd_path))
+
+    def _start(self, job: TransferJob):
+        if self.started is None:
+            self.started = time.perf_counter()
+        job.state = TransferJob.RUNNING
+        self.position += 1
+
+    # the next download or upload, None if there is none or deletes come first
+    def next_job(self) -> TransferJob:
+        if self.current is not None or self.in_flight or self.position >= len(self.jobs):
+            return None
+        job = self.jobs[self.position]
+        if job.kind == TransferJob.DELETE:
+            return None
+        self._start(job)
+        self.current = job
+        return job
+
+    # the deletes that can be sent now, consecutive deletes fill the window
+    def deletes_to_send(self) -> [TransferJob]:
+        jobs = []
+        while self.current is None and self.position < len(self.jobs) and \
+                len(self.in_flight) < self.delete_window and self.jobs[self.position].kind == TransferJob.DELETE:
+            job = self.jobs[self.position]
+            self._start(job)
+            self.in_flight.append(job)
+            jobs.append(job)
+        return jobs
+
+    # an ACK (result True) or NACK answered the oldest delete in flight, returns that job
+    def on_delete_result(self, result: bool) -> TransferJob:
+        if not self.in_flight:
+            return None
+        job = self.in_flight.popleft()
+        self._finish(job, result)
+        return job
+
+    # the running download or upload ended, without transferred a successful job counts its known size
+    def finish_current(self, result: bool, transferred: int = None) -> TransferJob:
+        job = self.current
+        if job is None:
+            return None
+        if transferred is None:
+            transferred = job.size if result and job.size else 0
+        job.transferred = transferred
+        self.current = None
+        self._finish(job, result)
+        return job
+
+    def _finish(self, job: TransferJob, result: bool):
+        job.state = TransferJob.DONE if result else TransferJob.FAILED
+        if self.is_done():
+            self.finished = time.perf_counter()
+
+    # drop all jobs that were not started, running ones are finished normally
+    def cancel(self):
+        for job in self.jobs[self.position:]:
+            job.state = TransferJob.CANCELLED
+        self.position = len(self.jobs)
+        if self.is_done() and self.finished is None:
+            self.finished = time.perf_counter()
+
+    def is_done(self) -> bool:
+        return self.position >= len(self.jobs) and self.current is None and not self.in_flight
+
+    def count(self, state: str) -> int:
+        return sum(1 for job in self.jobs if job.state == state)
+
+    def transferred(self) -> int:
+        return sum(job.transferred for job in self.jobs)
+
+    # finished jobs over all jobs
+    def progress(self) -> float:
+        if not self.jobs:
+            return 1.0
+        return sum(1 for job in self.jobs if job.state not in (TransferJob.WAITING, TransferJob.RUNNING)) \
+            / len(self.jobs)
+
+    # transferred bytes per second
+    def rate(self) -> float:
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return self.transferred() / (end - self.started) if end > self.started else 0.0
+
+    def summary(self) -> str:
+        done = self.count(TransferJob.DONE)
+        failed = self.count(TransferJob.FAILED)
+        cancelled = self.count(TransferJob.CANCELLED)
+        state = "done" if self.is_done() else "running"
+        summary = "Queue {}: {} of {} jobs, {:.1f} KB at {:.1f} KB/s".format(
+            state, done + failed + cancelled, len(self.jobs), self.transferred() / 1024, self.rate() / 1024)
+        if failed:
+            summary += ", {} failed".format(failed)
+        if cancelled:
+            summary += ", {} cancelled".format(cancelled)
+        return summary
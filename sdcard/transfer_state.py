@@ -0,0 +1,57 @@
+#####################################################################################
+# CanBadger SD Transfer State                                                       #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# what is left of an sd transfer that was interrupted, e.g. by a disconnect, so it can be resumed later
+# offset is the number of bytes confirmed from the start of the file, crc32 their checksum
+# a resumed transfer asks the canbadger to continue at the offset by appending it behind the zero terminated
+# path of the UPDATE_SD or DOWNLOAD_FILE command, firmware reading only the path starts over at 0
+
+import struct
+
+# offset of a resumed transfer, behind the path
+resume_offset = struct.Struct('<I')
+
+
+class TransferState:
+    UPLOAD = "upload"
+    DOWNLOAD = "download"
+
+    def __init__(self, direction: str, sd_path: str, local_path: str = None, offset: int = 0, crc32: int = 0,
+                 head: bytes = b'', tail: bytes = b'', data: bytes = None, name: str = None):
+        self.direction = direction
+        self.sd_path = sd_path  # full path of the file on the sd card
+        self.local_path = local_path
+        self.offset = offset
+        self.crc32 = crc32
+        self.head = head  # first bytes of a download, to notice a canbadger sending from the start again
+        self.tail = tail  # last confirmed bytes of a download, to notice a canbadger continuing at the offset
+        self.data = data  # content of uploads from memory
+        self.name = name  # file name for the file browser
+
+    # command payload asking for the rest of the file
+    def resume_request(self, position: int = None) -> bytes:
+        return self.sd_path.encode('ascii') + b'\0' + resume_offset.pack(self.offset if position is None
+                                                                          else position)
+
+    def summary(self) -> str:
+        return "Interrupted {} of {} at {} bytes".format(self.direction, self.sd_path, self.offset)
@@ -0,0 +1,68 @@
+#####################################################################################
+# CanBadger SD Upload Source                                                        #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# binary data source for sd uploads, files are memory mapped instead of read into memory
+# the upload cuts its packets from memoryviews of the map, so any file of any size is sent with constant memory
+# and without text decoding, empty files can not be mapped and are served from an empty buffer
+
+import mmap
+import os
+
+
+class UploadSource:
+    def __init__(self, data=b''):
+        self._file = None
+        self._map = None
+        self.data = memoryview(data)
+
+    @classmethod
+    def from_file(cls, path: str):
+        source = cls()
+        source._file = open(path, 'rb')
+        if os.fstat(source._file.fileno()).st_size > 0:
+            source._map = mmap.mmap(source._file.fileno(), 0, access=mmap.ACCESS_READ)
+            source.data = memoryview(source._map)
+        return source
+
+    def __len__(self):
+        return len(self.data)
+
+    def read(self, offset: int, size: int) -> memoryview:
+        return self.data[offset:offset + size]
+
+    def close(self):
+        # views have to be released before the map can be closed
+        self.data.release()
+        self.data = memoryview(b'')
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
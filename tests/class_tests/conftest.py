@@ -0,0 +1,41 @@
+#####################################################################################
+# CanBadger Test Helpers                                                            #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# frame factories shared by the capture and analysis tests, import them with "from conftest import ..."
+
+import sys
+sys.path.append('.')
+from datatypes.can_frame import CanFrame, CanFormat
+
+
+def make_frame(timestamp, frame_id=0x3E9, payload=b'\x01\x02\x03\x04\x05\x06\x07\x08', interface=1):
+    return CanFrame(interface, CanFormat.Standard, timestamp, frame_id, 500000, len(payload), payload)
+
+
+def make_frames(count):
+    # ids cycle through 0x100-0x10F, 0x3E9 only shows up in the second half of the capture
+    frames = []
+    for i in range(count):
+        frame_id = 0x3E9 if i >= count // 2 and i % 7 == 0 else 0x100 + i % 16
+        frames.append(make_frame(i * 100, frame_id, bytes([i % 256, 0x42])))
+    return frames
@@ -0,0 +1,69 @@
+#####################################################################################
+# CanBadger Block Capture Tests                                                     #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import os
+import sys
+sys.path.append('.')
+from conftest import make_frames
+from capture.block_capture import BlockCaptureReader, BlockCodec, write_block_capture, read_block_capture_frames
+from capture.capture_recorder import CaptureRecorder, FsyncPolicy
+
+
+def as_tuples(frames):
+    return [(f.frame_id, f.timestamp, f.interface_number, f.data_length, bytes(f.frame_payload)) for f in frames]
+
+
+def test_block_capture_round_trip(tmp_path):
+    frames = make_frames(5000)
+    for codec in BlockCodec:
+        capture = str(tmp_path / "capture_{}.cbz".format(codec.name))
+        assert write_block_capture(capture, frames, codec=codec, block_frames=128) == 5000
+
+        # frames come back in capture order, and random access only touches matching blocks
+        assert as_tuples(read_block_capture_frames(capture)) == as_tuples(frames)
+        with BlockCaptureReader(capture) as reader:
+            assert reader.codec == codec
+            assert all(reader.blocks[b].frame_id == 0x3E9 for b in reader.query_blocks(ids=[0x3E9]))
+
+        expected = [f for f in frames if f.frame_id in (0x3E9, 0x101) and 200000 <= f.timestamp <= 300000]
+        assert as_tuples(read_block_capture_frames(capture, ids=[0x3E9, 0x101], start=200000, end=300000)) == \
+            as_tuples(expected)
+
+
+def test_block_capture_recovery(tmp_path):
+    # a recorder that never closed its file leaves no block table, the blocks are found by scanning
+    recorder = CaptureRecorder(str(tmp_path), compression=BlockCodec.ZLIB, fsync_policy=FsyncPolicy.NEVER)
+    recorder.start()
+    frames = make_frames(3000)
+    recorder.record_frames(frames)
+    recorder.flush()
+    capture = recorder.current_path
+    assert capture.endswith('.cbz')
+    assert recorder.bytes_written == os.path.getsize(capture)
+
+    assert as_tuples(read_block_capture_frames(capture)) == as_tuples(frames)
+
+    recorder.stop()
+    assert recorder.finished_files == [capture]
+    with BlockCaptureReader(capture) as reader:
+        assert reader.frame_count == 3000
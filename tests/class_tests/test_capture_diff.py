@@ -0,0 +1,67 @@
+#####################################################################################
+# CanBadger Capture Diff Tests                                                      #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from conftest import make_frame
+from analysis.capture_diff import CaptureDiff, diff_captures
+
+
+def make_frames(count, pressed=False):
+    # 0x100 is a counter, 0x200 is static, 0x300 carries a button bit in byte 1 that is set during the action
+    # 0x7A0 is only sent while the button is pressed
+    frames = []
+    for i in range(count):
+        ts = i * 1000
+        frames.append(make_frame(ts, 0x100, bytes([i % 256, 0])))
+        frames.append(make_frame(ts, 0x200, b'\x11\x22\x33'))
+        button = 0x04 if pressed and (i // 10) % 2 else 0x00
+        frames.append(make_frame(ts, 0x300, bytes([0x80, button])))
+        if pressed and i % 50 == 0:
+            frames.append(make_frame(ts, 0x7A0, b'\x01'))
+    return frames
+
+
+def test_capture_diff():
+    diff = CaptureDiff.from_frames(make_frames(1000), make_frames(1000, pressed=True))
+
+    assert diff.new_ids.tolist() == [0x7A0]
+    assert diff.missing_ids.tolist() == []
+    assert diff.changed_ids().tolist() == [0x300]
+
+    # only bit 2 of byte 1 of 0x300 starts flipping, the counter flips the same in both captures
+    baseline_rates, action_rates = diff.flip_rates(0x300)
+    assert baseline_rates.sum() == 0
+    assert action_rates.nonzero()[0].tolist() == [8 + 5]
+    counter_baseline, counter_action = diff.flip_rates(0x100)
+    assert (counter_baseline == counter_action).all()
+
+    candidates = diff.ranked_candidates()
+    assert [c.frame_id for c in candidates] == [0x7A0, 0x300]
+    assert candidates[0].is_new
+    assert candidates[1].changed_bytes == [1] and candidates[1].new_values == 1
+
+
+def test_capture_diff_min_count():
+    candidates = diff_captures(make_frames(200), make_frames(200, pressed=True), min_count=5)
+    assert [c.frame_id for c in candidates] == [0x300]
@@ -0,0 +1,67 @@
+#####################################################################################
+# CanBadger Capture Index Test                                                      #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import os
+import sys
+sys.path.append('.')
+from conftest import make_frames
+from capture.capture_index import CaptureIndex, read_capture_frames, write_indexed_capture, parse_capture_query, \
+    index_path_for
+
+
+def test_capture_index(tmp_path):
+    capture = str(tmp_path / "capture.csv")
+    frames = make_frames(5000)
+    index = write_indexed_capture(capture, frames, block_size=256)
+
+    assert os.path.exists(index_path_for(capture))
+    assert index.frame_count == 5000
+    assert index.capture_size == os.path.getsize(capture)
+
+    # the sidecar round trips and equals an index built by scanning the capture
+    loaded = CaptureIndex.load(index_path_for(capture))
+    scanned = CaptureIndex.build(capture, block_size=256)
+    for other in (loaded, scanned):
+        assert other.frame_count == index.frame_count
+        assert list(other.block_offsets) == list(index.block_offsets)
+        assert list(other.block_min_ts) == list(index.block_min_ts)
+        assert {k: list(v) for k, v in other.postings.items()} == {k: list(v) for k, v in index.postings.items()}
+
+    # 0x3E9 is only in the blocks of the second half
+    assert min(index.query_blocks(ids=[0x3E9])) >= 2500 // 256
+
+    # id and time queries return exactly the matching frames
+    expected = [f.timestamp for f in frames if f.frame_id == 0x3E9 and 300000 <= f.timestamp <= 310000]
+    result = [f.timestamp for f in read_capture_frames(capture, ids=[0x3E9], start=300000, end=310000)]
+    assert result == expected
+
+    expected = [f.timestamp for f in frames if 1000 <= f.timestamp <= 2000]
+    assert [f.timestamp for f in read_capture_frames(capture, start=1000, end=2000)] == expected
+    assert len(list(read_capture_frames(capture))) == 5000
+
+
+def test_parse_capture_query():
+    assert parse_capture_query("3e9, 1a0 @ 1830000-1850000") == ([0x3E9, 0x1A0], 1830000, 1850000)
+    assert parse_capture_query("3e9") == ([0x3E9], None, None)
+    assert parse_capture_query("@ 100-") == (None, 100, None)
+    assert parse_capture_query("") == (None, None, None)
@@ -0,0 +1,64 @@
+#####################################################################################
+# CanBadger Capture Recorder Test                                                   #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import csv
+import sys
+sys.path.append('.')
+from conftest import make_frame
+from capture.capture_recorder import CaptureRecorder, FsyncPolicy
+from capture.capture_format import row_to_frame
+
+
+def test_capture_recorder(tmp_path):
+    # small limits so we see flushes and rotations
+    recorder = CaptureRecorder(str(tmp_path), max_file_size=512, buffer_size=128, fsync_policy=FsyncPolicy.ON_ROTATE)
+    recorder.start()
+    for i in range(50):
+        recorder.record_frame(make_frame(i * 1000))
+
+    # data has been flushed before stopping
+    assert recorder.bytes_written > 0
+    recorder.stop()
+
+    assert recorder.frames_written == 50
+    assert len(recorder.finished_files) > 1
+
+    # all frames come back in order from the rotated files
+    timestamps = []
+    for path in recorder.finished_files:
+        with open(path, newline='') as infile:
+            for row in csv.reader(infile):
+                frame = row_to_frame(row)
+                assert frame.frame_id == 0x3E9
+                assert frame.frame_payload == b'\x01\x02\x03\x04\x05\x06\x07\x08'
+                timestamps.append(frame.timestamp)
+    assert timestamps == [i * 1000 for i in range(50)]
+
+
+def test_capture_recorder_not_started(tmp_path):
+    recorder = CaptureRecorder(str(tmp_path))
+    recorder.record_frame(make_frame(0))
+    recorder.poll()
+    recorder.stop()
+    assert recorder.frames_written == 0
+    assert recorder.finished_files == []
@@ -0,0 +1,64 @@
+#####################################################################################
+# CanBadger Connection Pool Test                                                    #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from helpers.connection_pool import ConnectionPool
+
+
+def test_connection_pool():
+    now = [0.0]
+    pool = ConnectionPool(idle_timeout=300, clock=lambda: now[0])
+    a = {"id": "a", "logging": False}
+    b = {"id": "b", "logging": True}
+    pool.add(a)
+    pool.add(b)
+    assert pool.active == "b" and len(pool) == 2
+
+    # parking keeps the connection, activating it again takes it out of the idle queue
+    assert pool.park("a") and pool.is_parked("a")
+    assert not pool.park("c")
+    assert pool.activate("a") is a and not pool.is_parked("a")
+    assert pool.activate("c") is None
+
+    pool.park("a")
+    now[0] = 100.0
+    pool.park("b")
+    assert pool.time_to_next() == 200
+    assert pool.parked() == [a, b] or pool.parked() == [b, a]
+
+    # busy nodes get another idle period instead of being closed
+    now[0] = 400.0
+    assert pool.expired(is_busy=lambda node: node["logging"]) == [a]
+    assert "a" not in pool and pool.is_parked("b")
+    assert pool.time_to_next() == 300
+
+    # a renamed node keeps its deadline
+    pool.rename("b", "d")
+    now[0] = 700.0
+    b["logging"] = False
+    assert pool.expired(is_busy=lambda node: node["logging"]) == [b]
+    assert len(pool) == 0 and pool.time_to_next() is None
+
+    pool.add(a)
+    assert pool.remove("a") is a and pool.active is None
@@ -0,0 +1,56 @@
+#####################################################################################
+# CanBadger Deadline Queue Test                                                     #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from helpers.deadline_queue import DeadlineQueue
+
+
+def test_deadline_queue():
+    now = [0.0]
+    queue = DeadlineQueue(clock=lambda: now[0])
+    assert queue.next_deadline() is None and queue.pop_expired() == []
+
+    assert queue.touch("a", 6)
+    assert not queue.touch("b", 10)
+    assert queue.touch("c", 1)
+    assert queue.time_to_next() == 1
+
+    # touching moves the deadline without growing the heap
+    now[0] = 5.0
+    queue.touch("a", 6)
+    assert len(queue.heap) == 3
+    assert queue.pop_expired() == ["c"]
+    assert queue.next_deadline() == 10
+
+    now[0] = 10.0
+    assert queue.pop_expired() == ["b"]
+    assert queue.time_to_next() == 1
+
+    # removed and renamed keys
+    queue.touch("d", 2)
+    queue.remove("d")
+    queue.rename("a", "e")
+    now[0] = 12.0
+    assert queue.pop_expired() == ["e"]
+    assert len(queue) == 0 and queue.next_deadline() is None
@@ -0,0 +1,78 @@
+#####################################################################################
+# CanBadger Interface Monitor Test                                                  #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import os
+import struct
+import sys
+sys.path.append('.')
+from helpers.interface_monitor import InterfaceMonitor, parse_link_messages, list_can_interfaces, \
+    ARPHRD_CAN, RTM_NEWLINK, RTM_DELLINK, IFLA_IFNAME, nlmsghdr, ifinfomsg, rtattr
+
+
+# one netlink message about a link, like the kernel sends them
+def link_message(message_type, index, name, device_type=ARPHRD_CAN):
+    name = name.encode('ascii') + b'\0'
+    attribute = rtattr.pack(rtattr.size + len(name), IFLA_IFNAME) + name
+    attribute += b'\0' * (-len(attribute) % 4)
+    body = ifinfomsg.pack(0, device_type, index, 0, 0) + struct.pack('=HH', 8, 13) + b'\0' * 4 + attribute
+    return nlmsghdr.pack(nlmsghdr.size + len(body), message_type, 0, 0, 0) + body
+
+
+def test_parse_link_messages():
+    data = link_message(RTM_NEWLINK, 4, "vcan0") + link_message(RTM_DELLINK, 5, "eth1", device_type=1)
+    assert parse_link_messages(data) == [(RTM_NEWLINK, 4, "vcan0", ARPHRD_CAN), (RTM_DELLINK, 5, "eth1", 1)]
+    assert parse_link_messages(data[:10]) == []
+
+
+def test_interface_monitor(tmp_path):
+    for name, device_type, index in (("can0", ARPHRD_CAN, 3), ("eth0", 1, 2), ("slcan7", ARPHRD_CAN, 5)):
+        os.mkdir(str(tmp_path / name))
+        with open(str(tmp_path / name / "type"), 'w') as type_file:
+            type_file.write("{}\n".format(device_type))
+        with open(str(tmp_path / name / "ifindex"), 'w') as index_file:
+            index_file.write("{}\n".format(index))
+    assert list_can_interfaces(str(tmp_path)) == {"can0": 3, "slcan7": 5}
+
+    monitor = InterfaceMonitor(sys_path=str(tmp_path))
+    events = []
+    monitor.interfaceAdded.connect(lambda name: events.append(("added", name)))
+    monitor.interfaceRemoved.connect(lambda name: events.append(("removed", name)))
+
+    # only changes are reported
+    monitor.update(list_can_interfaces(str(tmp_path)))
+    monitor.update(list_can_interfaces(str(tmp_path)))
+    assert events == [("added", "can0"), ("added", "slcan7")]
+
+    # link notifications, a renamed interface is removed and added again
+    events.clear()
+    monitor.handle_links([(RTM_NEWLINK, 7, "vcan0", ARPHRD_CAN), (RTM_NEWLINK, 7, "vcan0", ARPHRD_CAN),
+                          (RTM_NEWLINK, 8, "eth1", 1), (RTM_NEWLINK, 7, "vcan1", ARPHRD_CAN),
+                          (RTM_DELLINK, 3, "can0", ARPHRD_CAN)])
+    assert events == [("added", "vcan0"), ("removed", "vcan0"), ("added", "vcan1"), ("removed", "can0")]
+    assert set(monitor.interfaces) == {"slcan7", "vcan1"}
+
+    # an interface found by the listing is recognized when it is renamed
+    events.clear()
+    monitor.handle_links([(RTM_NEWLINK, 5, "can9", ARPHRD_CAN)])
+    assert events == [("removed", "slcan7"), ("added", "can9")]
+    assert monitor.interfaces == {"vcan1": 7, "can9": 5}
@@ -0,0 +1,82 @@
+#####################################################################################
+# CanBadger MITM Test                                                               #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import socket
+import sys
+sys.path.append('.')
+from mitm.mitm_rule import MitmRule, MitmRuleTable
+from mitm.mitm_gateway import MitmGateway
+from replay.socketcan_replay import can_frame
+
+
+def test_mitm_rules():
+    table = MitmRuleTable.from_rows([
+        ["Drop Frame", "Specific bytes match", "100", "FF", "10000000", "", "00000000"],
+        ["Add fixed Value to specific bytes", "Specific bytes are less", "100", "0010", "01000000", "0001F0",
+         "01100000"],
+        ["Swap Payload", "Entire payload matches", "7e0", "0210", "00000000", "AABBCCDDEEFF0011", "00000000"],
+        ["Decrease specific bytes by fixed percentage", "Specific bytes match", "18DAF110", "", "00000000",
+         "0032", "01000000"],
+    ])
+    assert len(table) == 4
+
+    assert table.process(0x100, b'\xff\x00') is None
+    assert table.process(0x100, b'\x01\x0f\x20') == b'\x01\x10\x10'  # 0x20 + 0xf0 wraps
+    assert table.process(0x100, b'\x01\x10\x20') == b'\x01\x10\x20'  # condition not met
+    assert table.process(0x100, b'\x01') == b'\x01'  # masked byte missing
+    assert table.process(0x7E0, b'\x02\x10') == b'\xaa\xbb'  # length is kept
+    assert table.process(0x7E0, b'\x02\x10\x01') == b'\x02\x10\x01'
+    assert table.process(0x18DAF110, b'\x00\x64') == b'\x00\x32'
+    assert table.process(0x200, b'\xff') == b'\xff'
+    assert [rule.hits for rule in table.rules] == [1, 1, 1, 1]
+
+    rule = MitmRule.from_row(["Multiply specific bytes", "Specific bytes are greater", "3e9", "05", "10000000",
+                              "02", "10000000"])
+    assert MitmRule.from_row(rule.to_row()).to_row() == rule.to_row()
+
+
+def test_mitm_gateway():
+    a, bus_a = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    b, bus_b = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    table = MitmRuleTable.from_rows([["Drop Frame", "Specific bytes match", "123", "", "00000000", "", "00000000"],
+                                     ["Swap Specific Bytes", "Specific bytes match", "456", "", "00000000",
+                                      "00AA", "01000000"]])
+    gateway = MitmGateway("a", "b", table, sockets=(a, b))
+    gateway.start()
+
+    bus_a.send(can_frame.pack(0x123, 1, b'\x01'))
+    bus_a.send(can_frame.pack(0x80000456, 2, b'\x01\x02'))
+    bus_b.send(can_frame.pack(0x321, 1, b'\x07'))
+    bus_b.settimeout(2)
+    bus_a.settimeout(2)
+    assert can_frame.unpack(bus_b.recv(16)) == (0x80000456, 2, b'\x01\xaa' + bytes(6))
+    assert can_frame.unpack(bus_a.recv(16)) == (0x321, 1, b'\x07' + bytes(7))
+
+    gateway.stop()
+    gateway.join(2)
+    assert not gateway.is_alive()
+    assert gateway.forwarded == [1, 1]
+    assert gateway.dropped == [1, 0]
+    assert gateway.modified == [1, 0]
+    for s in (a, b, bus_a, bus_b):
+        s.close()
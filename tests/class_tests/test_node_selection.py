@@ -0,0 +1,154 @@
+#####################################################################################
+# CanBadger Node Selection Test                                                     #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+import types
+sys.path.append('.')
+import pytest
+
+pytest.importorskip("libcanbadger")
+from main import MainWindow
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def emit(self, *args):
+        self.calls.append(args)
+
+    def __call__(self, *args):
+        self.calls.append(args)
+
+
+class FakeConnection:
+    def __init__(self, connected):
+        self.isConnected = connected
+
+
+class FakeSelection:
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def itemData(self, index):
+        return self.nodes[index]
+
+
+class FakeSdHandler:
+    def __init__(self):
+        self.busy = False
+        self.onNodeParked = Recorder()
+        self.showNodeTree = Recorder()
+
+
+class FakeWindow:
+    def __init__(self, nodes, selected):
+        self.interfaceSelection = FakeSelection(nodes)
+        self.selectedNode = selected
+        self.selectionFlag = False
+        self.sdHandler = FakeSdHandler()
+        self.selectedNodeChanged = Recorder()
+        self.parkNode = Recorder()
+        self.disconnectNode = Recorder()
+        self.connectToNode = Recorder()
+        self.resetNodeDisplays = Recorder()
+
+
+def test_switch_from_connected_node_parks_it():
+    old = {"id": "a", "connection": FakeConnection(True)}
+    new = {"id": "b"}
+    window = FakeWindow([None, new], old)
+    MainWindow.onNodeItemClicked(window, 1)
+
+    assert window.selectedNode is new
+    assert window.sdHandler.onNodeParked.calls == [(old,)]
+    assert window.selectedNodeChanged.calls == [(old, new)]
+    assert window.parkNode.calls == [(old,)] and window.disconnectNode.calls == []
+    assert window.connectToNode.calls == [(new,)]
+
+
+def test_switch_from_unconnected_node_disconnects_it():
+    old = {"id": "a", "connection": FakeConnection(False)}
+    new = {"id": "b"}
+    window = FakeWindow([None, new], old)
+    MainWindow.onNodeItemClicked(window, 1)
+
+    assert window.parkNode.calls == [] and window.disconnectNode.calls == [(old,)]
+    assert window.selectionFlag and window.connectToNode.calls == [(new,)]
+
+    # selecting none disconnects without connecting anything
+    window = FakeWindow([None, new], new)
+    new["connection"] = FakeConnection(True)
+    MainWindow.onNodeItemClicked(window, 0)
+    assert window.disconnectNode.calls == [(new,)] and window.connectToNode.calls == []
+
+
+class Forwarder:
+    def __init__(self, *slots):
+        self.slots = slots
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class FakeHandler:
+    # runs the selection slots of handler_class without building its widgets
+    def __init__(self, handler_class, mainwindow, connection):
+        self.onSelectedNodeChanged = types.MethodType(handler_class.onSelectedNodeChanged, self)
+        self.onNodeConnected = types.MethodType(handler_class.onNodeConnected, self)
+        self.mainwindow = mainwindow
+        self.selected_node = connection
+        self.enabled = []
+        self.setEnableUi = self.enabled.append
+        self.setEnableGui = self.enabled.append
+
+
+def test_select_never_connected_node():
+    from handlers.hijack_handler import HijackHandler
+    from handlers.uds_handler import UDSHandler
+
+    previous = FakeConnection(True)
+    old = {"id": "a", "version": "2", "connection": previous}
+    new = {"id": "b", "version": "2", "ip": "10.0.0.2"}
+    window = FakeWindow([None, new], old)
+    hijack = FakeHandler(HijackHandler, window, previous)
+    uds = FakeHandler(UDSHandler, window, previous)
+    window.selectedNodeChanged = Forwarder(hijack.onSelectedNodeChanged, uds.onSelectedNodeChanged)
+    MainWindow.onNodeItemClicked(window, 1)
+
+    # the parked connection of the old node must not be used for the new one
+    assert hijack.selected_node is None and hijack.enabled == [False]
+    assert uds.selected_node is None and uds.enabled == [False]
+    assert window.connectToNode.calls == [(new,)]
+
+    # once the new node is connected the handlers pick up its connection
+    new["connection"] = FakeConnection(True)
+    hijack.onNodeConnected(new)
+    uds.onNodeConnected(new)
+    assert hijack.selected_node is new["connection"] and hijack.enabled[-1]
+    assert uds.selected_node is new["connection"] and uds.enabled[-1]
+
+    # a connection of another node does not change the selection
+    hijack.onNodeConnected(dict(old))
+    assert hijack.selected_node is new["connection"]
@@ -0,0 +1,65 @@
+#####################################################################################
+# CanBadger Replay Handler Test                                                     #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+import types
+sys.path.append('.')
+import pytest
+
+pytest.importorskip("PySide2")
+from handlers.replay_handler import ReplayHandler
+from analysis.response_correlation import ResponseCorrelator
+
+
+class FakeMainWindow:
+    def __init__(self):
+        self.log = []
+        self.onUpdateDebugLog = self.log.append
+
+
+class FakeHandler:
+    def __init__(self):
+        self.mainwindow = FakeMainWindow()
+        self.correlator = None
+        self.stopped = 0
+        self.reportCorrelation = types.MethodType(ReplayHandler.reportCorrelation, self)
+
+    def stopCorrelation(self):
+        self.stopped += 1
+        self.correlator = None
+
+
+def test_late_report_keeps_newer_correlator():
+    handler = FakeHandler()
+    old = ResponseCorrelator([0x7E8])
+    new = ResponseCorrelator([0x7E8])
+
+    # the report of the previous replay fires while the next one is running
+    handler.correlator = new
+    handler.reportCorrelation(old)
+    assert handler.correlator is new and handler.stopped == 0
+    assert len(handler.mainwindow.log) == 1
+
+    handler.reportCorrelation(new)
+    assert handler.correlator is None and handler.stopped == 1
+    assert len(handler.mainwindow.log) == 2
@@ -0,0 +1,84 @@
+#####################################################################################
+# CanBadger Replay Pacing Tests                                                     #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+import pytest
+from replay.replay_pacing import Pacer, PacingMode, can_frame_bits, crc15
+from replay.replay_source import format_replay_command
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 10.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_can_frame_bits():
+    # 47 bits without stuffing for an empty standard frame, 131 for a full extended one
+    # 0x555 needs one stuff bit for the seven zeros of rtr, ide, r0 and the length
+    assert can_frame_bits(0x555, b'') == 48
+    assert can_frame_bits(0x000, b'') > 47
+    assert 131 <= can_frame_bits(0x1FFFFFFF, b'\x00' * 8) <= 160
+    assert crc15([]) == 0
+
+
+def run_pacer(pacer, clock, frames):
+    times = []
+    for frame in frames:
+        due = pacer.due(frame)
+        clock.now = max(clock.now, due)
+        times.append(clock.now)
+        pacer.sent(due)
+    return times
+
+
+def test_pacer_modes():
+    frames = [format_replay_command(1, 0x555, b'')] * 10
+
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.FRAME_RATE, frame_rate=100, clock=clock)
+    times = run_pacer(pacer, clock, frames)
+    assert abs(times[-1] - times[0] - 0.09) < 1e-9
+    assert abs(pacer.achieved_rate() - 10 / 0.09) < 1e-6
+
+    # 48 bit frames at 50% of 125 kbit/s
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.BUS_LOAD, bus_load=0.5, bitrates={1: 125000}, clock=clock)
+    times = run_pacer(pacer, clock, frames)
+    assert abs(times[1] - times[0] - 48 / 62500) < 1e-9
+
+    # a bitrate of 0 from the node settings falls back to 500 kbit/s
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.BUS_LOAD, bus_load=0.5, bitrates={1: 0, 2: 0}, clock=clock)
+    times = run_pacer(pacer, clock, frames)
+    assert abs(times[1] - times[0] - 48 / 250000) < 1e-9
+    with pytest.raises(ValueError):
+        Pacer(PacingMode.BUS_LOAD, bus_load=0)
+
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.BURST, burst_size=4, burst_gap=0.5, clock=clock)
+    times = run_pacer(pacer, clock, frames)
+    assert times[:4] == [10.0] * 4 and times[4:8] == [10.5] * 4 and times[8:] == [11.0] * 2
@@ -0,0 +1,84 @@
+#####################################################################################
+# CanBadger Replay Scheduler Tests                                                  #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from replay.replay_scheduler import ReplayScheduler, TimingReport
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_replay_scheduler():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(speed=2.0, clock=clock)
+
+    # the first frame anchors the schedule, gaps are halved by the speed factor
+    due = scheduler.due_time(1000000)
+    assert due == 100.0
+    scheduler.sent(due)
+    due = scheduler.due_time(1200000)
+    assert abs(scheduler.wait_time(due) - 0.1) < 1e-9
+
+    # a late send does not move the following frames
+    clock.now = 100.105
+    assert abs(scheduler.sent(due) - 0.005) < 1e-9
+    assert abs(scheduler.due_time(1400000) - 100.2) < 1e-9
+
+    # timestamps keep counting over the 32 bit wrap
+    assert abs(scheduler.due_time(0xFFFFFF00) - (100.0 + (0xFFFFFF00 - 1000000) / 2000000)) < 1e-6
+    assert abs(scheduler.due_time(0x100) - (100.0 + (0x100000100 - 1000000) / 2000000)) < 1e-6
+
+    assert len(scheduler.report) == 2
+    assert abs(scheduler.report.max_error() - 0.005) < 1e-9
+
+
+def test_replay_scheduler_reanchor():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(max_lag=0.5, clock=clock)
+    scheduler.sent(scheduler.due_time(0))
+    due = scheduler.due_time(1000000)
+    clock.now = 102.0
+    scheduler.sent(due)
+    # the stall is not caught up, the next gap is kept
+    assert scheduler.report.reanchored == 1
+    assert abs(scheduler.due_time(2000000) - 103.0) < 1e-9
+
+
+def test_timing_report():
+    report = TimingReport()
+    for i in range(100000):
+        report.add((i % 1000) * 1e-5 - 0.002)
+    assert len(report) == 100000
+    assert abs(report.mean_error() - 0.002995) < 1e-9
+    assert abs(report.max_error() - 0.00799) < 1e-9
+
+    # percentiles come from a histogram of fixed size, exact to 1/16 of the value
+    assert len(report.buckets) < 200
+    assert 0.0079 <= report.percentile(0.99) <= 0.0079 * (1 + 1 / 16)
+    assert TimingReport().percentile(0.99) == 0.0
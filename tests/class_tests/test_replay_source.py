@@ -0,0 +1,53 @@
+#####################################################################################
+# CanBadger Replay Source Tests                                                     #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import itertools
+import sys
+sys.path.append('.')
+from datatypes.can_frame import CanFrame, CanFormat
+from capture.capture_index import write_indexed_capture
+from replay.replay_source import ReplaySource, format_replay_command
+
+
+def test_replay_source_rows():
+    rows = [[2, 0x100, b'\x01', 1, 500], [0, 0x200, b'\x02', 1], [1, 0x300, b'', 2], [1, 0x400, b'\x04', 2]]
+    source = ReplaySource.from_rows(rows)
+
+    assert source.peek() == (format_replay_command(1, 0x100, b'\x01'), 500)
+    assert list(source) == [(format_replay_command(1, 0x100, b'\x01'), 500)] * 2 + \
+        [(format_replay_command(2, 0x400, b'\x04'), 500)]
+    assert source.sent == 3
+    assert source.is_empty() and source.pop() is None
+
+
+def test_replay_source_streaming(tmp_path):
+    # a huge repeat count is expanded lazily
+    source = ReplaySource.from_rows([[10 ** 9, 0x100, b'\x01', 1]])
+    assert len(list(itertools.islice(source, 1000))) == 1000
+    assert not source.is_empty()
+
+    capture = str(tmp_path / "capture.csv")
+    frames = [CanFrame(2, CanFormat.Standard, i * 10, 0x100 + i % 3, 500000, 1, bytes([i])) for i in range(30)]
+    write_indexed_capture(capture, frames)
+    source = ReplaySource.from_capture(capture, ids=[0x101], start=100)
+    assert list(source) == [(format_replay_command(2, 0x101, bytes([i])), i * 10) for i in range(10, 30, 3)]
@@ -0,0 +1,69 @@
+#####################################################################################
+# CanBadger Replay Window Tests                                                     #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from replay.replay_window import ReplayWindow
+
+
+def test_replay_window():
+    window = ReplayWindow(3)
+    assert window.is_idle() and window.retire() is None
+
+    # fill the window, the fourth command has to wait
+    assert [window.sent(bytes([i])) for i in range(3)] == [0, 1, 2]
+    assert not window.can_send()
+
+    # answers retire the oldest command first, NACKs free the slot as well
+    assert window.retire(True) == 0
+    assert window.can_send()
+    assert window.sent(b'\x03') == 3
+    assert window.retire(False) == 1
+    assert window.retire(True) == 2
+    assert window.retire(True) == 3
+    assert window.is_idle()
+    assert (window.acked, window.nacked, window.answered) == (3, 1, 4)
+    assert window.rate() > 0
+
+
+def test_replay_window_expiry():
+    now = [0.0]
+    window = ReplayWindow(2, timeout=1.0, retries=1, clock=lambda: now[0])
+    window.sent(b'\x00')
+    now[0] = 0.5
+    window.sent(b'\x01')
+    assert window.time_to_expiry() == 0.5
+    assert window.expire() == []
+
+    # the first command was not answered in time, it is sent again and waits behind the second one
+    now[0] = 1.0
+    assert window.expire() == [b'\x00']
+    assert [entry[0] for entry in window.in_flight] == [1, 0]
+    assert window.retire(True) == 1
+
+    # the second attempt is not answered either, the command is given up and frees its slot
+    now[0] = 2.0
+    assert window.expire() == []
+    assert window.is_idle() and window.lost == 1 and window.resent == 1
+    assert window.time_to_expiry() is None
+    assert "1 without answer" in window.summary()
@@ -0,0 +1,68 @@
+#####################################################################################
+# CanBadger Response Correlation Test                                               #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from conftest import make_frame
+from analysis.response_correlation import ResponseCorrelator
+from analysis.timing_statistics import summarize, histogram
+
+
+def test_timing_statistics():
+    summary = summarize([4.0, 1.0, 3.0, 2.0])
+    assert summary.count == 4
+    assert summary.mean == 2.5
+    assert summary.minimum == 1.0 and summary.maximum == 4.0
+
+    counts, edges = histogram([0.0, 1.0, 1.0, 4.0], bins=4)
+    assert counts == [1, 2, 0, 1]
+    assert len(edges) == 5 and edges[0] == 0.0 and edges[-1] == 4.0
+    assert histogram([], bins=4) == ([], [])
+
+
+def test_response_correlation():
+    correlator = ResponseCorrelator([0x7E8, 0x7E9], window=10000)
+    correlator.add_stimulus(0x7E0, b'\x02\x10\x03')
+    correlator.add_stimulus(0x100)
+
+    correlator.add_frames([
+        make_frame(1000, 0x7E0, b'\x02\x10\x03'),
+        make_frame(1200, 0x7E8, b'\x06\x50'),
+        make_frame(1300, 0x7E8, b'\x06\x50'),  # only the first response counts
+        make_frame(1500, 0x7E9, b'\x06\x50'),
+        make_frame(2000, 0x7E0, b'\x02\x10\x01'),  # other payload, no stimulus
+        make_frame(3000, 0x100, b'\x01'),
+        make_frame(50000, 0x100, b'\x02'),  # window of the first 0x100 is over
+        make_frame(0xFFFFFF00, 0x7E0, b'\x02\x10\x03'),
+        make_frame(0x100, 0x7E8, b'\x06\x50'),  # timestamps wrapped
+    ])
+    correlator.finish()
+
+    key = (0x7E0, b'\x02\x10\x03')
+    assert correlator.stimulus_count[key] == 2
+    assert correlator.latencies[(key, 0x7E8)] == [200, 0x200]
+    assert correlator.latencies[(key, 0x7E9)] == [500]
+    assert correlator.stimulus_count[(0x100, None)] == 2
+    assert correlator.unanswered[(0x100, None)] == 2
+    assert correlator.summaries()[(key, 0x7E8)].maximum == 0x200
+    assert "7E0#021003" in correlator.report()
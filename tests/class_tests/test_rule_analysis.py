@@ -0,0 +1,63 @@
+#####################################################################################
+# CanBadger MITM Rule Analysis Test                                                 #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from mitm.mitm_rule import MitmRule
+from mitm.rule_analysis import analyze_rules, UNREACHABLE, SHADOWED, OVERLAPPING
+
+
+def rules_of(rows):
+    return [MitmRule.from_row(row) for row in rows]
+
+
+def test_rule_analysis():
+    analysis = analyze_rules(rules_of([
+        # 0: byte 0 == 01
+        ["Drop Frame", "Specific bytes match", "100", "01", "10000000", "", "00000000"],
+        # 1: same mask, other value, no conflict
+        ["Drop Frame", "Specific bytes match", "100", "02", "10000000", "", "00000000"],
+        # 2: same condition as 0
+        ["Swap Payload", "Specific bytes match", "100", "01", "10000000", "11", "00000000"],
+        # 3: byte 0 > 00, overlaps 0 and 1 with another action
+        ["Swap Payload", "Specific bytes are greater", "100", "00", "10000000", "22", "00000000"],
+        # 4: byte 1 == 05, overlaps 3 with another action
+        ["Drop Frame", "Specific bytes match", "100", "1105", "01000000", "", "00000000"],
+        # 5: byte 0 > 11, inside of 3
+        ["Drop Frame", "Specific bytes are greater", "100", "1105", "10000000", "", "00000000"],
+        # 6: can never match
+        ["Drop Frame", "Specific bytes are less", "200", "00", "10000000", "", "00000000"],
+        # 7: matches every frame of 200, 8 is never evaluated
+        ["Drop Frame", "Specific bytes match", "200", "", "00000000", "", "00000000"],
+        ["Swap Payload", "Entire payload matches", "200", "01", "00000000", "", "00000000"],
+        # 9: the whole payload 01 00 .. with byte 0 == 01 from rule 0 covering it
+        ["Swap Payload", "Entire payload matches", "100", "01", "00000000", "", "00000000"],
+    ]))
+
+    assert [(issue.rule, issue.other) for issue in analysis.issues_of_kind(UNREACHABLE)] == [(6, None)]
+    assert [(issue.rule, issue.other) for issue in analysis.issues_of_kind(SHADOWED)] == \
+        [(2, 0), (5, 3), (8, 7), (9, 0)]
+    assert [(issue.rule, issue.other) for issue in analysis.issues_of_kind(OVERLAPPING)] == [(3, 0), (3, 1), (4, 3)]
+    assert analysis.worst_case == {0x100: 7, 0x200: 2}
+    assert analysis.max_worst_case() == 7
+    assert "1 unreachable, 4 shadowed, 3 overlapping" in analysis.summary()
@@ -0,0 +1,61 @@
+#####################################################################################
+# CanBadger MITM Rule Compiler Test                                                 #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+import pytest
+from exceptions import InvalidRuleException
+from mitm.rule_compiler import compile_rows, format_rule_line, parse_rule_line
+
+
+def test_rule_compiler():
+    compiled = compile_rows([
+        ["Swap Specific Bytes", "Specific bytes match", "3e9", "0102", "01000000", "AABB", "10000000"],
+        # same rule, only bytes outside of the masks differ
+        ["Swap Specific Bytes", "Specific bytes match", "3E9", "FF02", "01000000", "AACC", "10000000"],
+        ["Drop Frame", "Entire payload matches", "100", "01", "00000000", "12", "11000000"],
+        ["Add fixed Value to specific bytes", "Specific bytes match", "200", "", "00000000", "01", "00000000"],
+    ])
+    assert len(compiled) == 3
+    assert compiled.duplicates == 1
+    assert len(compiled.warnings) == 1
+
+    # the line format the badger reads from rule files
+    assert format_rule_line(compiled.rules[0]) == "0201,3E9,01,02,00,00,00,00,00,00,0101,AA,BB,00,00,00,00,00,00"
+    messages = compiled.messages()
+    assert len(messages) == len(compiled)
+    assert all(b'\n' not in message and message.endswith(b'\0') and len(message) <= 120 for message in messages)
+
+    # rule lines read back into the same rules
+    assert [format_rule_line(parse_rule_line(line)) for line in compiled.lines()] == compiled.lines()
+
+
+def test_invalid_rules():
+    with pytest.raises(InvalidRuleException) as e:
+        compile_rows([["Drop Frame", "Specific bytes match", "100", "", "00000000", "", "00000000"],
+                      ["Divide specific bytes", "Specific bytes match", "100", "", "00000000", "0200", "11000000"]])
+    assert e.value.row == 1
+    with pytest.raises(InvalidRuleException):
+        compile_rows([["Drop Frame", "Specific bytes match", "xyz", "", "00000000", "", "00000000"]])
+    with pytest.raises(InvalidRuleException):
+        compile_rows([["Drop Frame", "Specific bytes match", "20000000", "", "00000000", "", "00000000"]])
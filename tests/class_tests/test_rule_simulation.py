@@ -0,0 +1,72 @@
+#####################################################################################
+# CanBadger MITM Rule Simulation Test                                               #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import random
+import sys
+sys.path.append('.')
+from datatypes.can_frame import CanFrame, CanFormat
+from mitm.mitm_rule import MitmRuleTable
+from mitm.rule_simulation import simulate_frames
+from mitm.rule_compiler import parse_rule_line, format_rule_line
+
+
+def test_rule_simulation():
+    rows = [
+        ["Drop Frame", "Specific bytes are greater", "100", "F0", "10000000", "", "00000000"],
+        ["Add fixed Value to specific bytes", "Specific bytes are less", "100", "0080", "01000000", "0001F0",
+         "01100000"],
+        ["Swap Payload", "Entire payload matches", "200", "0102", "00000000", "AABBCCDDEEFF0011", "00000000"],
+        ["Decrease specific bytes by fixed percentage", "Specific bytes match", "300", "", "00000000",
+         "0032", "01000000"],
+        ["Divide specific bytes", "Specific bytes match", "300", "", "00000000", "0003", "01000000"],
+        ["Increase specific bytes by fixed percentage", "Specific bytes match", "400", "10", "10000000",
+         "96", "10000000"],
+    ]
+    random.seed(3)
+    frames = []
+    for timestamp in range(3000):
+        frame_id = random.choice([0x100, 0x200, 0x300, 0x400, 0x500])
+        length = random.randint(0, 8)
+        payload = bytes(random.choice([0x01, 0x02, 0x10, 0xF8, random.randint(0, 255)]) for _ in range(length))
+        frames.append(CanFrame(1, CanFormat.Standard, timestamp, frame_id, 500000, length, payload))
+
+    result = simulate_frames(MitmRuleTable.from_rows(rows), frames)
+
+    # the vectorized simulation behaves like the gateway processing frame by frame
+    table = MitmRuleTable.from_rows(rows)
+    expected = []
+    for frame in frames:
+        payload = table.process(frame.frame_id, bytes(frame.frame_payload))
+        if payload is not None:
+            expected.append((frame.timestamp, frame.frame_id, payload))
+    assert [(f.timestamp, f.frame_id, bytes(f.frame_payload)) for f in result.frames()] == expected
+    assert result.rule_hits.tolist() == [rule.hits for rule in table.rules]
+    assert result.dropped_count() == len(frames) - len(expected)
+    assert result.dropped_by_id() == {0x100: result.dropped_count()}
+    # the second rule for 0x300 always comes too late
+    assert result.rule_hits[4] == 0 and result.rule_hits[3] > 0
+
+
+def test_rule_line():
+    line = "0201,3E9,01,02,00,00,00,00,00,00,0101,AA,BB,00,00,00,00,00,00"
+    assert format_rule_line(parse_rule_line(line)) == line
@@ -0,0 +1,108 @@
+#####################################################################################
+# CanBadger SD Download Test                                                        #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import os
+import zlib
+import sys
+sys.path.append('.')
+from sdcard.sd_download import SdDownload
+
+
+def test_sd_download(tmp_path):
+    path = str(tmp_path / "log.bin")
+    download = SdDownload(path, expected_size=8)
+    download.write(memoryview(b'\x02\x0e\x00\x00\x00\x00\x01\x02\x03')[6:])
+    download.write(b'\x04\x05')
+    assert download.received == 5 and download.messages == 2
+    assert download.progress() == 5 / 8
+    assert download.finish() == path
+    with open(path, 'rb') as infile:
+        assert infile.read() == b'\x01\x02\x03\x04\x05'
+
+    # without a path the data is collected in memory
+    download = SdDownload()
+    download.write(b'ab')
+    download.write(b'cd')
+    assert download.finish() == b'abcd'
+
+    # aborted downloads leave no partial file behind
+    download = SdDownload(path)
+    download.write(b'x')
+    download.abort()
+    assert not os.path.exists(path)
+
+
+def test_resume_download(tmp_path):
+    path = str(tmp_path / "log.bin")
+    data = bytes(range(200))
+    download = SdDownload(path)
+    download.write(data[:80])
+    download.write(data[80:90])
+    download.abort(keep_partial=True)
+    state = download.state("/logs/log.bin")
+    assert state.offset == 90 and state.resume_request()[-5:] == b'\0\x5a\x00\x00\x00'
+
+    # the canbadger continues at the offset, the overlap it sends again is skipped
+    download = SdDownload(path, resume=state)
+    assert download.request_position() == 90 - 64
+    download.write(data[26:40])
+    download.write(data[40:])
+    download.finish()
+    with open(path, 'rb') as infile:
+        assert infile.read() == data
+    assert download.crc32 == zlib.crc32(data) and not download.mismatch
+
+    # the canbadger ignores the offset and sends the whole file again, the known part is skipped
+    download = SdDownload(path, resume=state)
+    download.write(data[:100])
+    download.write(data[100:])
+    download.finish()
+    with open(path, 'rb') as infile:
+        assert infile.read() == data
+    assert download.received == 200 and not download.mismatch
+
+    # a start that differs after the head is noticed
+    changed = data[:70] + b'\xff' + data[71:]
+    download = SdDownload(path, resume=state)
+    download.write(changed)
+    assert download.mismatch
+
+
+def test_resume_download_ambiguous(tmp_path):
+    path = str(tmp_path / "zeros.bin")
+    download = SdDownload(path)
+    download.write(bytes(100))
+    download.abort(keep_partial=True)
+    state = download.state("/logs/zeros.bin")
+
+    # head and tail are the same, it is unclear where the canbadger started
+    download = SdDownload(path, resume=state)
+    download.write(bytes(150))
+    download.finish()
+    assert download.mismatch
+
+    # the file ends inside the data that was sent again
+    download = SdDownload(path, resume=state)
+    download.write(bytes(range(30)))
+    download.finish()
+    assert download.mismatch
@@ -0,0 +1,68 @@
+#####################################################################################
+# CanBadger SD Tree Model Test                                                      #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from PySide2.QtCore import QModelIndex
+from models.sd_fs_model import SD_FS_Model
+
+
+def test_sd_fs_model():
+    model = SD_FS_Model()
+    model.fetch_batch = 100
+    model.begin_listing()
+    model.add_items(QModelIndex(), [("LOGS", True), ("settings.ini", False)])
+    logs = model.index_for_path("/LOGS")
+    model.add_items(logs, [("log{}.csv".format(number), False) for number in range(1000)])
+    model.end_listing()
+    assert model.rowCount(QModelIndex()) == 2
+
+    # the files of a directory are shown when it is expanded, one batch at a time
+    assert model.rowCount(logs) == 0 and model.hasChildren(logs)
+    assert model.canFetchMore(logs)
+    model.fetchMore(logs)
+    assert model.rowCount(logs) == 100
+
+    # lookups go through the path dictionary, rows up to an item are fetched for the view
+    item = model.index_for_path("/LOGS/log500.csv").internalPointer()
+    assert item.row() == 500 and item.get_filepath() == "/LOGS/log500.csv"
+    assert model.rowCount(logs) == 501
+    assert model.index_for_path("/LOGS/missing.csv") is None
+    assert not model.index_for_path("/").isValid()
+
+    # removing keeps the rows of the following items
+    model.remove_item(model.index_for_path("/LOGS/log10.csv"))
+    assert model.index_for_path("/LOGS/log11.csv").row() == 10
+    assert model.rowCount(logs) == 500
+
+    # a refresh updates the tree in place and drops entries that are gone
+    model.begin_listing()
+    model.add_items(QModelIndex(), [("LOGS", True), ("new.bin", False)])
+    model.add_items(model.index_for_path("/LOGS"), [("log1.csv", False), ("log2.csv", False)])
+    model.end_listing()
+    assert model.index_for_path("/LOGS").internalPointer() is logs.internalPointer()
+    assert model.index_for_path("/settings.ini") is None
+    assert model.index_for_path("/new.bin") is not None
+    assert model.index_for_path("/LOGS/log3.csv") is None
+    assert model.index_for_path("/LOGS/log2.csv").row() == 1
+    assert model.rowCount(logs) == 2
@@ -0,0 +1,104 @@
+#####################################################################################
+# CanBadger SD Upload Test                                                          #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+import zlib
+sys.path.append('.')
+from sdcard.sd_upload import SdUpload, upload_packet_header
+from sdcard.upload_source import UploadSource
+
+
+def test_sd_upload():
+    data = bytes(range(256)) * 2
+    upload = SdUpload(data, chunk_size=100, window_size=2, max_retries=1)
+    assert upload.packet_count == 6
+
+    packets = upload.packets_to_send()
+    assert [number for number, _ in packets] == [0, 1]
+    assert packets[1][1] == upload_packet_header.pack(1, 100) + data[100:200]
+    assert upload.packets_to_send() == []
+
+    # the NACK answers packet 0, only that packet is sent again
+    upload.on_nack()
+    assert [number for number, _ in upload.packets_to_send()] == [0]
+    upload.on_ack()
+    upload.on_ack()
+    assert upload.acked_bytes == 200
+    assert [number for number, _ in upload.packets_to_send()] == [2, 3]
+
+    received = dict()
+    while not upload.is_done():
+        for number, packet in upload.packets_to_send():
+            received[number] = packet
+        upload.on_ack()
+    assert upload.retransmits == 1
+    assert upload.progress() == 1.0
+    assert upload_packet_header.unpack(received[5][:5]) == (5, 12)
+    assert received[5][5:] == data[500:]
+
+    # failing the same packet too often ends the upload
+    upload = SdUpload(data, chunk_size=100, window_size=1, max_retries=1)
+    upload.packets_to_send()
+    upload.on_nack()
+    upload.packets_to_send()
+    upload.on_nack()
+    assert upload.failed
+    assert SdUpload(b'').is_done()
+
+
+def test_upload_source(tmp_path):
+    path = str(tmp_path / "firmware.bin")
+    data = bytes(range(256)) * 100
+    with open(path, 'wb') as outfile:
+        outfile.write(data)
+
+    upload = SdUpload(UploadSource.from_file(path), chunk_size=120, window_size=1000)
+    packets = upload.packets_to_send()
+    assert len(packets) == upload.packet_count == 214
+    assert b''.join(packet[5:] for _, packet in packets) == data
+    upload.close()
+
+    # empty files can not be mapped
+    path = str(tmp_path / "empty.bin")
+    open(path, 'wb').close()
+    with UploadSource.from_file(path) as source:
+        assert len(source) == 0
+        assert SdUpload(source).is_done()
+
+
+def test_resume_upload():
+    data = bytes(range(256)) * 2
+    upload = SdUpload(data, chunk_size=100, window_size=3)
+    upload.packets_to_send()
+    upload.on_ack()
+    upload.on_ack()
+    assert upload.confirmed_offset() == 200 and upload.confirmed_crc32 == zlib.crc32(data[:200])
+
+    # continue behind the confirmed packets
+    upload = SdUpload(data, chunk_size=100, start_packet=2, start_crc32=upload.confirmed_crc32)
+    assert [number for number, _ in upload.packets_to_send()][0] == 2
+    while not upload.is_done():
+        upload.packets_to_send()
+        upload.on_ack()
+    assert upload.confirmed_offset() == len(data)
+    assert upload.confirmed_crc32 == upload.source_crc32() == zlib.crc32(data)
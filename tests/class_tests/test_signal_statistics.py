@@ -0,0 +1,67 @@
+#####################################################################################
+# CanBadger Signal Statistics Tests                                                 #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from datatypes.can_frame import CanFrame, CanFormat
+from analysis.signal_statistics import SignalStatistics
+
+
+def test_signal_statistics():
+    statistics = SignalStatistics()
+    # 0x100 every 10ms with 1ms jitter and a counter in byte 0, bit 0x10 of byte 1 toggles every frame
+    for i in range(100):
+        timestamp = i * 10000 + (1000 if i % 2 else 0)
+        statistics.add_frame(CanFrame(1, CanFormat.Standard, timestamp, 0x100, 500000, 2,
+                                      bytes([i, 0x10 if i % 2 else 0x00])))
+    # 0x200 is static but changes its length once
+    statistics.add_frame(CanFrame(1, CanFormat.Standard, 500, 0x200, 500000, 1, b'\x55'))
+    statistics.add_frame(CanFrame(1, CanFormat.Standard, 20500, 0x200, 500000, 3, b'\x55\x00\x01'))
+
+    assert statistics.order == [0x100, 0x200]
+    assert statistics.frame_count == 102
+
+    stats = statistics.get(0x100)
+    assert stats.count == 100
+    assert abs(stats.period() - 10000) < 11
+    assert stats.period_min == 9000 and stats.period_max == 11000
+    assert 990 < stats.jitter() < 1010
+    assert stats.byte_min == [0, 0] and stats.byte_max == [99, 0x10]
+    assert stats.byte_distinct() == [100, 2]
+    assert stats.changing_bytes() == [0, 1]
+    # bit 3 of byte 1 (msb first) flipped between all 99 pairs
+    assert stats.bit_changes[8 + 3] == 99
+    assert stats.bit_change_rates()[8 + 3] == 1.0
+    assert sum(stats.bit_changes[8:]) == 99
+
+    stats = statistics.get(0x200)
+    assert (stats.dlc_min, stats.dlc_max) == (1, 3)
+    assert stats.period() == 20000 and stats.jitter() == 0.0
+    assert stats.changing_bytes() == [] and sum(stats.bit_changes) == 0
+
+
+def test_signal_statistics_timestamp_wrap():
+    statistics = SignalStatistics()
+    statistics.add_frame(CanFrame(1, CanFormat.Standard, 0xFFFFFF00, 0x100, 500000, 0, b''))
+    statistics.add_frame(CanFrame(1, CanFormat.Standard, 0x00000100, 0x100, 500000, 0, b''))
+    assert statistics.get(0x100).period() == 0x200
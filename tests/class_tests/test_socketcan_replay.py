@@ -0,0 +1,90 @@
+#####################################################################################
+# CanBadger SocketCAN Replay Tests                                                  #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import errno
+import socket
+import pytest
+import sys
+sys.path.append('.')
+from replay.replay_source import ReplaySource
+from replay.socketcan_replay import SocketCanReplayer, BcmCyclicSender, format_socketcan_frame, can_frame, \
+    bcm_msg_head
+
+
+class FakeSocket:
+    def __init__(self, full_every=0):
+        self.frames = []
+        self.full_every = full_every
+        self.calls = 0
+
+    def send(self, data):
+        # pretend the tx queue is full on every n-th call
+        self.calls += 1
+        if self.full_every and self.calls % self.full_every == 0:
+            raise OSError(errno.ENOBUFS, "No buffer space available")
+        self.frames.append(data)
+        return len(data)
+
+
+def test_socketcan_replayer():
+    rows = [[3, 0x123, b'\x01\x02', 1], [1, 0x1ABCDE, b'\xff', 1]]
+    fake = FakeSocket(full_every=3)
+    replayer = SocketCanReplayer("vcan0", ReplaySource.from_rows(rows, formatter=format_socketcan_frame),
+                                 batch_size=2, raw_socket=fake)
+    replayer.start()
+    replayer.join(5)
+
+    assert replayer.error is None
+    assert replayer.sent == 4 and replayer.retries > 0
+    frames = [can_frame.unpack(frame) for frame in fake.frames]
+    assert frames[:3] == [(0x123, 2, b'\x01\x02' + b'\x00' * 6)] * 3
+    assert frames[3] == (0x1ABCDE | socket.CAN_EFF_FLAG, 1, b'\xff' + b'\x00' * 7)
+
+
+def test_bcm_cyclic_sender():
+    fake = FakeSocket()
+    sender = BcmCyclicSender("vcan0", bcm_socket=fake)
+    sender.start(0x100, b'\xaa', 0.0105, count=5)
+    sender.stop(0x100)
+    sender.stop(0x100)
+
+    assert len(fake.frames) == 2
+    head = bcm_msg_head.unpack(fake.frames[0][:bcm_msg_head.size])
+    assert head[0] == socket.CAN_BCM_TX_SETUP and head[2] == 5
+    assert head[3:5] == (0, 10500) and head[7:] == (0x100, 1)
+    assert can_frame.unpack(fake.frames[0][bcm_msg_head.size:])[:2] == (0x100, 1)
+    assert bcm_msg_head.unpack(fake.frames[1])[0] == socket.CAN_BCM_TX_DELETE
+
+
+def test_socketcan_frame_too_long():
+    with pytest.raises(ValueError):
+        format_socketcan_frame(1, 0x123, b'\x00' * 9)
+
+    # the worker reports the bad frame instead of dying with it
+    rows = [[1, 0x123, b'\x01', 1], [1, 0x124, b'\x00' * 9, 1]]
+    fake = FakeSocket()
+    replayer = SocketCanReplayer("vcan0", ReplaySource.from_rows(rows, formatter=format_socketcan_frame),
+                                 raw_socket=fake)
+    replayer.start()
+    replayer.join(5)
+    assert isinstance(replayer.error, ValueError)
@@ -0,0 +1,67 @@
+#####################################################################################
+# CanBadger SD Transfer Queue Test                                                  #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import sys
+sys.path.append('.')
+from sdcard.transfer_queue import TransferQueue, TransferJob
+
+
+def test_transfer_queue():
+    queue = TransferQueue(delete_window=2)
+    first = queue.add_download("/LOGS/a.csv", "a.csv")
+    queue.add_delete("/LOGS/b.csv")
+    queue.add_delete("/LOGS/c.csv")
+    queue.add_delete("/LOGS/d.csv")
+    upload = queue.add_upload("e.bin", "/e.bin", size=100)
+
+    # one transfer at a time, deletes wait until it is done
+    assert queue.next_job() is first
+    assert queue.next_job() is None and queue.deletes_to_send() == []
+    queue.finish_current(True, 500)
+
+    # deletes fill the window and are answered in order
+    deletes = queue.deletes_to_send()
+    assert [job.sd_path for job in deletes] == ["/LOGS/b.csv", "/LOGS/c.csv"]
+    assert queue.next_job() is None
+    assert queue.on_delete_result(False).sd_path == "/LOGS/b.csv"
+    assert [job.sd_path for job in queue.deletes_to_send()] == ["/LOGS/d.csv"]
+    queue.on_delete_result(True)
+    queue.on_delete_result(True)
+
+    assert queue.next_job() is upload
+    assert queue.progress() == 0.8
+    queue.finish_current(True)
+    assert queue.is_done()
+    assert queue.transferred() == 600
+    assert queue.count(TransferJob.FAILED) == 1
+    assert "5 of 5 jobs" in queue.summary()
+
+    # cancelling drops the jobs that did not start
+    queue = TransferQueue()
+    queue.add_download("/a", "a")
+    queue.add_download("/b", "b")
+    queue.next_job()
+    queue.cancel()
+    assert not queue.is_done()
+    queue.finish_current(False)
+    assert queue.is_done() and queue.count(TransferJob.CANCELLED) == 1
@@ -0,0 +1,113 @@
+#####################################################################################
+# CanBadger UDS Client Test                                                         #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+import queue
+import sys
+import threading
+sys.path.append('.')
+import struct
+import pytest
+from canbadger_messages.uds_response import UdsResponse
+from exceptions.uds_exception import UdsNegativeResponseException, UdsTimeoutException
+from uds.uds_client import UdsClient
+
+
+def response(sid, positive, payload):
+    return struct.pack('<H?I', sid, positive, len(payload)) + payload
+
+
+def test_uds_client_pipelining():
+    sent = []
+    client = UdsClient(sent.append, max_in_flight=2, run_timer=False)
+    first = client.read_data_by_id(0xF190)
+    second = client.request(0x22, b'\xf1\x87')
+    third = client.request(0x23, b'\x12\x00\x10\x04')
+    assert len(sent) == 2 and not third.running()
+
+    # same sid responses resolve in request order and free a slot for the queued request
+    client.on_data(response(0x22, True, b'\x62\xf1\x90VIN'))
+    assert isinstance(first.result(0), UdsResponse) and first.result(0).payload.endswith(b'VIN')
+    assert len(sent) == 3 and sent[2].sid == 0x23
+    client.on_data(response(0x23, False, b'\x7f\x23\x31'))
+    with pytest.raises(UdsNegativeResponseException) as error:
+        third.result(0)
+    assert error.value.nrc == 0x31 and error.value.reason == "REQUEST_OUT_OF_RANGE"
+    assert not second.done()
+
+    # responses nobody waits for are counted and dropped
+    client.on_data(response(0x10, True, b'\x50\x03'))
+    client.on_data(b'\x01')
+    assert client.unmatched == 1
+    client.close()
+    assert isinstance(second.exception(0), RuntimeError)
+
+
+def test_uds_client_timeouts():
+    now = [0.0]
+    sent = []
+    client = UdsClient(sent.append, timeout=1.0, pending_timeout=5.0, clock=lambda: now[0], run_timer=False)
+    slow = client.request(0x31, b'\x01\xff\x00')
+    lost = client.request(0x22, b'\xf1\x90')
+    assert len(sent) == 1
+
+    # response pending extends the deadline of the request
+    now[0] = 0.5
+    client.on_data(response(0x31, False, b'\x7f\x31\x78'))
+    now[0] = 4.0
+    client.poll()
+    assert not slow.done()
+    client.on_data(response(0x31, True, b'\x71\x01\xff\x00'))
+    assert slow.result(0).is_positive_reply
+    assert len(sent) == 2
+
+    now[0] = 5.5
+    client.poll()
+    with pytest.raises(UdsTimeoutException):
+        lost.result(0)
+    assert client.in_flight_count == 0 and not client.in_flight
+
+
+def test_uds_client_timer():
+    client = UdsClient(lambda message: None, timeout=0.05)
+    with client:
+        with pytest.raises(UdsTimeoutException):
+            client.request(0x3E, b'\x00').result(2)
+
+
+def test_uds_client_timeout_releases_queued_request():
+    sent = []
+    dispatched = queue.Queue()
+    client = UdsClient(lambda message: sent.append((message, threading.current_thread())), timeout=0.05,
+                       dispatch=dispatched.put)
+    with client:
+        lost = client.request(0x22, b'\xf1\x90')
+        queued = client.request(0x22, b'\xf1\x87')
+        with pytest.raises(UdsTimeoutException):
+            lost.result(2)
+
+        # the timer thread failed the first request but leaves sending the next one to the owner of send
+        send = dispatched.get(timeout=2)
+        assert len(sent) == 1 and not queued.running()
+        send()
+        assert len(sent) == 2 and sent[1][1] is threading.current_thread()
+        assert queued.running()
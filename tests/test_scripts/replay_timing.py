@@ -27,7 +27,8 @@ import struct
 import sys
 import time
 import matplotlib.pyplot as plt
-import statistics
+sys.path.append('.')
+from analysis.timing_statistics import format_statistics
 
 
 class BroadcastDeafSocket(socket):
@@ -58,32 +59,6 @@ def print_formatted_log(data, count):
     else:
         print('Interface ERROR!\n')
 
-def print_statistics(values, name, ns = None, bins = None):
-    print(f"\n{name} stats:\n-----------------------")
-
-    # print median and mean
-    mean = statistics.mean(values)
-    print(f"Median: {statistics.median(values)}")
-    print(f"Mean: {mean}")
-
-    # biggest buckets
-    if ns is not None and bins is not None:
-        biggest = [i for i, j in enumerate(ns) if j == max(ns)]
-        print(f"\nBiggest bucket(s) for {name} (measured {len(values)} times):")
-        for i in biggest:
-            print(f"{ns[i]:.0f} in {bins[i]:.3f}-{bins[i+1]:.3f}")
-
-    # outliers
-    if ns is not None and bins is not None:
-        bucket_indices = [i for i, j in enumerate(ns) if j > 0]
-        leftmost = bucket_indices[0]
-        rightmost = bucket_indices[-1]
-        print(f"Outliers: {ns[leftmost]:.0f}  in {bins[leftmost]:.3f}-{bins[leftmost+1]:.3f} "
-              f"(> {(mean - bins[leftmost+1]):.3f} from mean) || "
-              f"{ns[rightmost]:.0f} in {bins[rightmost]:.3f}-{bins[rightmost+1]:.3f} "
-              f"(> {(bins[rightmost] - mean):.3f} from mean)")
-
-
 # script vars
 canbadger_ip = '10.0.0.125'
 
@@ -193,15 +168,15 @@ for i, x in enumerate(replay_frame_time):
 plt.subplot(131)
 n, bins, patches = plt.hist(settings_timing, bins=40)
 plt.title('Delay settings')
-print_statistics(settings_timing, "settings", ns=n, bins=bins)
+print(format_statistics(settings_timing, "settings", ns=n, bins=bins))
 plt.subplot(132)
 n, bins, patches = plt.hist(receive_delays, bins=40)
 plt.title('Delay interfaces')
-print_statistics(receive_delays, "interface", ns=n, bins=bins)
+print(format_statistics(receive_delays, "interface", ns=n, bins=bins))
 plt.subplot(133)
 n, bins, patches = plt.hist(command_delays, bins=40)
 plt.title('Delay replay')
-print_statistics(command_delays, "command", ns=n, bins=bins)
+print(format_statistics(command_delays, "command", ns=n, bins=bins))
 plt.show()
 
 sys.exit(0)
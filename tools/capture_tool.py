@@ -0,0 +1,129 @@
+#####################################################################################
+# CanBadger Capture Tool                                                            #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# command line tool to index saved captures, export parts of them, compare captures, measure response latencies
+# and simulate mitm rule files on captures
+# uses the index sidecar, so exporting a few ids or a short time range does not scan the whole capture
+
+import argparse
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from capture import CaptureIndex, read_capture, write_capture, index_path_for
+from analysis import CaptureDiff, ResponseCorrelator
+from mitm import read_rule_file, compile_rules, simulate_frames
+
+
+def parse_ids(text):
+    if text is None:
+        return None
+    return [int(x, 16) for x in text.replace(',', ' ').split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index, export and compare CANBadger captures.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser('index', help='(Re)build the index sidecar of a capture.')
+    index_parser.add_argument('capture', type=str, help='Capture file (.csv)')
+    index_parser.add_argument('--block-size', dest='block_size', type=int, default=1024,
+                              help='Number of frames per indexed block. Default: 1024')
+
+    export_parser = subparsers.add_parser('export', help='Export matching frames into a new capture.')
+    export_parser.add_argument('capture', type=str, help='Capture file (.csv or .cbz)')
+    export_parser.add_argument('output', type=str, help='Output capture file (.csv or .cbz)')
+    export_parser.add_argument('--ids', dest='ids', type=str, default=None,
+                               help='Comma separated hex ids to export, e.g. 3e9,1a0. Default: all ids')
+    export_parser.add_argument('--start', dest='start', type=int, default=None,
+                               help='First timestamp to export, in capture units')
+    export_parser.add_argument('--end', dest='end', type=int, default=None,
+                               help='Last timestamp to export, in capture units')
+
+    diff_parser = subparsers.add_parser('diff', help='Rank the ids that changed between a baseline and an action '
+                                                     'capture.')
+    diff_parser.add_argument('baseline', type=str, help='Capture without the action (.csv or .cbz)')
+    diff_parser.add_argument('action', type=str, help='Capture with the action (.csv or .cbz)')
+    diff_parser.add_argument('--limit', dest='limit', type=int, default=20,
+                             help='Number of candidates to show. Default: 20')
+    diff_parser.add_argument('--min-count', dest='min_count', type=int, default=1,
+                             help='Ignore ids seen less often in the action capture. Default: 1')
+
+    latency_parser = subparsers.add_parser('latency', help='Measure the response latency to injected frames.')
+    latency_parser.add_argument('capture', type=str, help='Capture containing stimuli and responses (.csv or .cbz)')
+    latency_parser.add_argument('--stimulus', dest='stimulus', type=str, required=True,
+                                help='Comma separated hex ids or id#payload of the injected frames, e.g. 7e0#0210')
+    latency_parser.add_argument('--responses', dest='responses', type=str, required=True,
+                                help='Comma separated hex ids of the responses, e.g. 7e8')
+    latency_parser.add_argument('--window-ms', dest='window', type=int, default=1000,
+                                help='Responses later than this are not matched. Default: 1000')
+    latency_parser.add_argument('--bins', dest='bins', type=int, default=40,
+                                help='Number of histogram buckets. Default: 40')
+
+    mitm_parser = subparsers.add_parser('mitm', help='Apply a MITM rule file to a capture.')
+    mitm_parser.add_argument('rules', type=str, help='Rule file as saved from the MITM tab (.txt)')
+    mitm_parser.add_argument('capture', type=str, help='Capture file (.csv or .cbz)')
+    mitm_parser.add_argument('--output', dest='output', type=str, default=None,
+                             help='Write the modified capture to this file (.csv or .cbz)')
+
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        index = CaptureIndex.build(args.capture, block_size=args.block_size)
+        index.save(index_path_for(args.capture))
+        print(f"Indexed {index.frame_count} frames in {index.block_count()} blocks, {len(index.postings)} ids.")
+    elif args.command == 'export':
+        frames = read_capture(args.capture, ids=parse_ids(args.ids), start=args.start, end=args.end)
+        count = write_capture(args.output, frames)
+        print(f"Exported {count} frames to {args.output}.")
+    elif args.command == 'diff':
+        diff = CaptureDiff.from_frames(read_capture(args.baseline), read_capture(args.action),
+                                       min_count=args.min_count)
+        print(f"{len(diff.new_ids)} new ids, {len(diff.missing_ids)} missing ids, "
+              f"{len(diff.changed_ids())} ids with new values.")
+        for candidate in diff.ranked_candidates(limit=args.limit):
+            state = "new" if candidate.is_new else "changed"
+            print(f"{candidate.frame_id:8X} {state:8} score {candidate.score:8.2f}  frames {candidate.baseline_count}"
+                  f"/{candidate.action_count}  bytes {candidate.changed_bytes}  new values {candidate.new_values}  "
+                  f"flip rate +{candidate.flip_rate_delta:.2f}")
+    elif args.command == 'latency':
+        correlator = ResponseCorrelator(parse_ids(args.responses), window=args.window * 1000)
+        for stimulus in args.stimulus.replace(',', ' ').split():
+            frame_id, _, payload = stimulus.partition('#')
+            correlator.add_stimulus(int(frame_id, 16), bytes.fromhex(payload) if payload else None)
+        correlator.add_frames(read_capture(args.capture))
+        correlator.finish()
+        print(correlator.report(bins=args.bins))
+    elif args.command == 'mitm':
+        compiled = compile_rules(read_rule_file(args.rules))
+        for warning in compiled.warnings:
+            print(warning)
+        result = simulate_frames(compiled.to_table(), read_capture(args.capture))
+        print(result.summary())
+        if args.output is not None:
+            count = write_capture(args.output, result.frames())
+            print(f"Wrote {count} frames to {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+#####################################################################################
+# CanBadger UDS Client                                                              #
+# Copyright (c) 2021 Noelscher Consulting GmbH                                      #
+#                                                                                   #
+# Permission is hereby granted, free of charge, to any person obtaining a copy      #
+# of this software and associated documentation files (the "Software"), to deal     #
+# in the Software without restriction, including without limitation the rights      #
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell         #
+# copies of the Software, and to permit persons to whom the Software is             #
+# furnished to do so, subject to the following conditions:                          #
+#                                                                                   #
+# The above copyright notice and this permission notice shall be included in        #
+# all copies or substantial portions of the Software.                               #
+#                                                                                   #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR        #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,          #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE       #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER            #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,     #
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN         #
+# THE SOFTWARE.                                                                     #
+#####################################################################################
+
+# headless uds client, every request returns a concurrent.futures.Future that resolves to the UdsResponse
+# or fails with a UdsNegativeResponseException or UdsTimeoutException, so scripts can block on result(),
+# await it with request_async() or attach callbacks without going through the uds tab
+# up to max_in_flight requests are sent without waiting for the previous response, the rest is queued,
+# responses are matched to the oldest outstanding request with the same sid
+# a response pending (0x78) answer keeps the request alive for another pending_timeout seconds
+# the client does not own a connection, it sends through a callable taking an EthernetMessage
+# (e.g. NodeConnection.sendEthernetMessage) and is fed the data of DATA messages through on_data()
+# the timer thread only fails requests, when that frees a slot for a queued request the send is handed to
+# dispatch, which has to run it in the thread that owns the connection (for_connection uses a queued qt call),
+# without dispatch the timer thread sends itself and send has to be thread safe
+
+from collections import deque
+from concurrent.futures import Future
+import asyncio
+import struct
+import threading
+import time
+
+from canbadger_messages.ethernet_message import EthernetMessage
+from canbadger_messages.uds_request import UdsRequest
+from canbadger_messages.uds_response import UdsResponse
+from exceptions.uds_exception import UdsNegativeResponseException, UdsTimeoutException
+from helpers.deadline_queue import DeadlineQueue
+from helpers.helpers import QueuedCall
+from uds.read_memory_by_address import ReadMemoryByAddress
+from uds.uds_enums import UdsNegativeResponse, UdsServiceIdentifier
+
+
+# the negative response code of a negative reply payload (7f, requested sid, code), None if there is none
+def negative_response_code(payload: bytes):
+    if len(payload) >= 3 and payload[0] == UdsNegativeResponse.NEGATIVE_RESPONSE:
+        return payload[2]
+    return None
+
+
+class PendingRequest:
+    def __init__(self, sid: int, message: EthernetMessage, timeout: float):
+        self.sid = sid
+        self.message = message
+        self.timeout = timeout
+        self.future = Future()
+        self.pending_count = 0  # number of response pending answers received
+        self.sent = None
+
+
+class UdsClient:
+    def __init__(self, send, timeout: float = 1.0, pending_timeout: float = 5.0, max_in_flight: int = 1,
+                 clock=time.monotonic, run_timer: bool = True, dispatch=None):
+        self.send = send
+        self.dispatch = dispatch  # runs a callable in the thread of send, None if send is thread safe
+        self.timeout = timeout  # default seconds to wait for the first answer to a request
+        self.pending_timeout = pending_timeout  # seconds to wait after a response pending answer
+        self.max_in_flight = max_in_flight
+        self.clock = clock
+
+        self.waiting = deque()  # requests that were not sent yet
+        self.in_flight = dict()  # sid -> deque of sent requests, oldest first
+        self.in_flight_count = 0
+        self.deadlines = DeadlineQueue(clock=clock)  # sent requests and when they time out
+        self.unmatched = 0  # responses that did not belong to an outstanding request
+        self.closed = False
+
+        # the timer thread fails requests on time even if no data comes in,
+        # without it poll() has to be called periodically
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._timer = None
+        if run_timer:
+            self._timer = threading.Thread(target=self._run_timer, daemon=True)
+            self._timer.start()
+
+    # feed the responses of a NodeConnection into a new client
+    @staticmethod
+    def for_connection(connection, **kwargs):
+        # the qtcpsocket of the connection may only be written from the thread the connection lives in
+        queued = QueuedCall(connection)
+        client = UdsClient(connection.sendEthernetMessage, dispatch=queued.call, **kwargs)
+        client._queued_call = queued  # keep the qobject alive as long as the client
+        connection.newDataMessage.connect(client.on_data)
+        return client
+
+    def request(self, sid: int, payload: bytes = b'', timeout: float = None) -> Future:
+        return self.submit(sid, UdsRequest(sid, payload), timeout)
+
+    async def request_async(self, sid: int, payload: bytes = b'', timeout: float = None) -> UdsResponse:
+        return await asyncio.wrap_future(self.request(sid, payload, timeout))
+
+    # send any message whose answer is a uds response with the given sid, e.g. a StartUdsMessage with 0x10
+    def submit(self, sid: int, message: EthernetMessage, timeout: float = None) -> Future:
+        pending = PendingRequest(sid, message, self.timeout if timeout is None else timeout)
+        with self._lock:
+            if self.closed:
+                pending.future.set_exception(RuntimeError("UdsClient was closed."))
+                return pending.future
+            self.waiting.append(pending)
+            self._send_waiting()
+        return pending.future
+
+    def read_data_by_id(self, data_id: int, timeout: float = None) -> Future:
+        payload = struct.pack('>B', data_id) if data_id < 0x100 else struct.pack('>H', data_id)
+        return self.request(UdsServiceIdentifier.READ_DATA_BY_ID, payload, timeout)
+
+    def read_memory_by_address(self, address: int, length: int, timeout: float = None) -> Future:
+        return self.request(UdsServiceIdentifier.READ_MEMORY_BY_ADDRESS,
+                            ReadMemoryByAddress.build_request(address, length), timeout)
+
+    # send the requests back to back and wait for all of them, results are in request order
+    def request_all(self, requests: list, timeout: float = None) -> list:
+        futures = [self.request(sid, payload, timeout) for sid, payload in requests]
+        return [future.result() for future in futures]
+
+    # connect to the newDataMessage signal of a connection
+    def on_data(self, data):
+        try:
+            response = UdsResponse(data)
+        except struct.error:
+            return  # not a uds response
+
+        with self._lock:
+            queue = self.in_flight.get(response.sid)
+            if not queue:
+                self.unmatched += 1
+                return
+            pending = queue[0]
+
+            if not response.is_positive_reply and \
+                    negative_response_code(response.payload) == UdsNegativeResponse.RESPONSE_PENDING:
+                # the ecu needs more time, the request stays in flight
+                pending.pending_count += 1
+                self._set_deadline(pending, self.pending_timeout)
+                return
+
+            self._finish(pending)
+            if response.is_positive_reply:
+                pending.future.set_result(response)
+            else:
+                nrc = negative_response_code(response.payload)
+                if nrc is None:
+                    reason = f"malformed negative response {response.payload.hex()}"
+                    nrc = 0
+                elif nrc in UdsNegativeResponse.__members__.values():
+                    reason = UdsNegativeResponse(nrc).name
+                else:
+                    reason = f"unknown reason: {nrc}"
+                pending.future.set_exception(UdsNegativeResponseException(response.sid, nrc, reason))
+            self._send_waiting()
+
+    # fail the requests whose timeout passed, only needed when the client runs without its timer
+    def poll(self):
+        with self._lock:
+            self._expire()
+            self._send_waiting()
+
+    # cancel everything that is still outstanding and stop the timer
+    def close(self):
+        with self._lock:
+            self.closed = True
+            for pending in list(self.waiting) + [p for queue in self.in_flight.values() for p in queue]:
+                # sent requests can not be cancelled anymore
+                if not pending.future.cancel():
+                    pending.future.set_exception(RuntimeError("UdsClient was closed."))
+            self.waiting.clear()
+            self.in_flight.clear()
+            self.in_flight_count = 0
+            self.deadlines = DeadlineQueue(clock=self.clock)
+            self._wakeup.notify()
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _send_waiting(self):
+        while self.waiting and self.in_flight_count < self.max_in_flight:
+            pending = self.waiting.popleft()
+            # requests cancelled while waiting are not sent at all
+            if not pending.future.set_running_or_notify_cancel():
+                continue
+            self.in_flight.setdefault(pending.sid, deque()).append(pending)
+            self.in_flight_count += 1
+            pending.sent = self.clock()
+            self._set_deadline(pending, pending.timeout)
+            self.send(pending.message)
+
+    def _expire(self):
+        for pending in self.deadlines.pop_expired():
+            self._finish(pending)
+            timeout = pending.timeout if pending.pending_count == 0 else self.pending_timeout
+            pending.future.set_exception(UdsTimeoutException(pending.sid, timeout))
+
+    # runs through dispatch in the thread of send
+    def _send_dispatched(self):
+        with self._lock:
+            if not self.closed:
+                self._send_waiting()
+
+    def _finish(self, pending):
+        queue = self.in_flight[pending.sid]
+        queue.remove(pending)
+        if not queue:
+            del self.in_flight[pending.sid]
+        self.in_flight_count -= 1
+        self.deadlines.remove(pending)
+
+    def _set_deadline(self, pending, timeout):
+        if self.deadlines.touch(pending, timeout):
+            self._wakeup.notify()
+
+    def _run_timer(self):
+        with self._lock:
+            while not self.closed:
+                self._wakeup.wait(self.deadlines.time_to_next())
+                if self.closed:
+                    break
+                self._expire()
+                if self.dispatch is None:
+                    self._send_waiting()
+                elif self.waiting and self.in_flight_count < self.max_in_flight:
+                    self.dispatch(self._send_dispatched)